@@ -0,0 +1,103 @@
+# ai_cache.py
+# Кэш ответов AI в таблице ai_cache: ключ — SHA-256 от модели, системного сообщения,
+# temperature, max_tokens и нормализованного промпта. Записи живут ttl секунд,
+# при превышении max_entries вытесняются давно не использованные (LRU).
+# Одинаковые одновременные запросы объединяются: к API идёт только первый, остальные ждут его ответ
+import hashlib
+import json
+import re
+import threading
+import time
+from db import get_conn, transaction
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 500
+
+
+# Нормализация промпта для ключа: пробелы по краям и повторные пробельные символы не влияют на ответ
+def normalize_prompt(prompt: str) -> str:
+    return re.sub(r'\s+', ' ', (prompt or '').strip())
+
+
+# Ключ кэша для набора параметров генерации
+def make_key(model: str, system: str, temperature: float, max_tokens: int, prompt: str) -> str:
+    raw = json.dumps(
+        [model, system, temperature, max_tokens, normalize_prompt(prompt)],
+        ensure_ascii=False, separators=(',', ':'),
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# Ответ из кэша или None; просроченная запись удаляется, найденная — помечается как использованная
+def get(key: str, ttl: float = DEFAULT_TTL):
+    now = time.time()
+    row = get_conn().execute('SELECT response, created FROM ai_cache WHERE key = ?', (key,)).fetchone()
+    if row is None:
+        return None
+    with transaction() as conn:
+        if row['created'] < now - ttl:
+            conn.execute('DELETE FROM ai_cache WHERE key = ?', (key,))
+            return None
+        conn.execute('UPDATE ai_cache SET lastUsed = ? WHERE key = ?', (now, key))
+    return row['response']
+
+
+# Сохранение ответа в кэш с удалением просроченных и вытеснением лишних записей
+def put(key: str, response: str, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+    now = time.time()
+    with transaction() as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO ai_cache (key, response, created, lastUsed) VALUES (?, ?, ?, ?)',
+            (key, response, now, now),
+        )
+        conn.execute('DELETE FROM ai_cache WHERE created < ?', (now - ttl,))
+        excess = conn.execute('SELECT COUNT(*) FROM ai_cache').fetchone()[0] - max_entries
+        if excess > 0:
+            conn.execute(
+                'DELETE FROM ai_cache WHERE key IN (SELECT key FROM ai_cache ORDER BY lastUsed LIMIT ?)',
+                (excess,),
+            )
+
+
+# Полная очистка кэша
+def clear():
+    with transaction() as conn:
+        conn.execute('DELETE FROM ai_cache')
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+# Регистрация запроса с ключом key: возвращает (leader, inflight).
+# leader=True — вызывающий выполняет запрос сам и обязан вызвать finish();
+# leader=False — такой же запрос уже выполняется, его ответ можно дождаться через wait()
+def begin(key: str):
+    with _inflight_lock:
+        inflight = _inflight.get(key)
+        if inflight is not None:
+            return False, inflight
+        inflight = _InFlight()
+        _inflight[key] = inflight
+        return True, inflight
+
+
+# Завершение запроса-лидера: response=None означает ошибку (ожидающие выполнят запрос сами)
+def finish(key: str, inflight: _InFlight, response):
+    with _inflight_lock:
+        if _inflight.get(key) is inflight:
+            del _inflight[key]
+    inflight.response = response
+    inflight.done.set()
+
+
+# Ожидание ответа запроса-лидера; None — лидер завершился ошибкой или истёк timeout
+def wait(inflight: _InFlight, timeout: float = None):
+    inflight.done.wait(timeout)
+    return inflight.response
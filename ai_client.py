@@ -0,0 +1,172 @@
+# ai_client.py
+# HTTP-клиент DeepSeek: один requests.Session на процесс с пулом keep-alive соединений,
+# раздельные таймауты на соединение и чтение, повторы с экспоненциальной задержкой
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://api.deepseek.com/v1"
+# Коды ответа, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AIClient:
+    # base_url: адрес API без /chat/completions
+    # connect_timeout / read_timeout: таймауты соединения и чтения (для потока — пауза между фрагментами), сек
+    # max_retries: число повторов после первой попытки
+    # backoff_base / backoff_max: база и потолок экспоненциальной задержки между повторами, сек
+    # pool_size: число keep-alive соединений в пуле
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, connect_timeout: float = 10, read_timeout: float = 30,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30, pool_size: int = 4):
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    # Задержка перед повтором номер attempt (с 0): экспонента с полным джиттером
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # Задержка из заголовка Retry-After (секунды или HTTP-дата) или None, если заголовка нет
+    def _retry_after(self, resp):
+        value = resp.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            delay = (when - datetime.now(timezone.utc)).total_seconds()
+        return max(0.0, min(delay, self.backoff_max))
+
+    # POST к API с повторами на 429/5xx и ошибках установки соединения.
+    # После исчерпания повторов бросает requests.exceptions.HTTPError / ConnectionError
+    def post(self, path: str, api_key: str, payload: dict, stream: bool = False):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        }
+        if stream:
+            headers["Accept"] = "text/event-stream"
+        attempt = 0
+        while True:
+            try:
+                resp = self.session.post(
+                    url, headers=headers, json=payload, stream=stream,
+                    timeout=(self.connect_timeout, self.read_timeout),
+                )
+            except requests.exceptions.ConnectionError as e:
+                # повторяем, только если запрос не ушёл на сервер: после отправки (ReadTimeout,
+                # обрыв соединения до ответа) сервер мог уже начать генерацию и списать оплату
+                if attempt >= self.max_retries or not _not_sent(e):
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            if resp.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_after(resp)
+                resp.close()
+                time.sleep(delay if delay is not None else self._backoff(attempt))
+                attempt += 1
+                continue
+            if not resp.ok:
+                resp.close()
+            resp.raise_for_status()
+            return resp
+
+    # Потоковый запрос к /chat/completions: выдаёт фрагменты текста ответа по мере поступления.
+    # При некорректном фрагменте бросает ValueError
+    def stream_chat(self, api_key: str, payload: dict):
+        payload = dict(payload, stream=True)
+        resp = self.post('/chat/completions', api_key, payload, stream=True)
+        with resp:
+            resp.encoding = 'utf-8'
+            yield from iter_sse_deltas(resp.iter_lines(decode_unicode=True))
+
+    # Обычный (не потоковый) запрос к /chat/completions: возвращает текст ответа целиком
+    def chat(self, api_key: str, payload: dict) -> str:
+        payload = dict(payload, stream=False)
+        with self.post('/chat/completions', api_key, payload) as resp:
+            data = resp.json()
+        return data["choices"][0]["message"]["content"]
+
+
+# Ошибка соединения возникла до отправки запроса: таймаут соединения или отказ в соединении
+# (urllib3 NewConnectionError, в том числе ошибка DNS) в цепочке причин
+def _not_sent(error) -> bool:
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    stack, seen = [error], set()
+    while stack:
+        e = stack.pop()
+        if e is None or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if isinstance(e, NewConnectionError):
+            return True
+        # requests заворачивает MaxRetryError в args, причина urllib3 — в reason
+        stack.extend(a for a in getattr(e, 'args', ()) if isinstance(a, BaseException))
+        stack.extend((getattr(e, 'reason', None), e.__cause__, e.__context__))
+    return False
+
+
+# Разбор строк потока server-sent events: выдаёт фрагменты текста ответа
+def iter_sse_deltas(lines):
+    for line in lines:
+        if not line or not line.startswith('data:'):
+            # пустые строки разделяют события, строки ':' — keep-alive комментарии
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            break
+        try:
+            chunk = json.loads(data)
+            delta = chunk["choices"][0].get("delta", {}).get("content")
+        except (ValueError, KeyError, IndexError, AttributeError) as e:
+            raise ValueError(f"некорректный фрагмент потока: {e}")
+        if delta:
+            yield delta
+
+
+_client = None
+# Параметры из настроек, с которыми создан _client
+_client_config = None
+_client_lock = threading.Lock()
+
+
+# Общий клиент процесса (создаётся при первом обращении и пересоздаётся, если в настройках
+# изменились адрес API, таймауты, число повторов или число рабочих потоков очереди AI-запросов:
+# соединений в пуле не меньше, чем одновременных запросов)
+def get_client() -> AIClient:
+    global _client, _client_config
+    import settings
+    s = settings.get()
+    config = (s.ai_base_url, s.ai_connect_timeout, s.ai_read_timeout, s.ai_max_retries, max(4, s.ai_workers))
+    if _client is None or _client_config != config:
+        with _client_lock:
+            if _client is None or _client_config != config:
+                base_url, connect_timeout, read_timeout, max_retries, pool_size = config
+                _client = AIClient(base_url, connect_timeout=connect_timeout, read_timeout=read_timeout,
+                                   max_retries=max_retries, pool_size=pool_size)
+                _client_config = config
+    return _client
@@ -0,0 +1,225 @@
+# ai_queue.py
+# Очередь AI-запросов. Задание — сама запись ai_requests со статусом
+# (queued -> running -> done / failed / cancelled), поэтому поставленный запрос не теряется
+# при закрытии приложения: resume(user_id) после входа пользователя возвращает в очередь то,
+# что не успело выполниться. Выполняющееся задание арендовано экземпляром приложения
+# (AIRequest.start_job), аренду продлевает отдельный поток; другой экземпляр подхватит задание
+# только после окончания аренды, поэтому платный запрос к API не выполняется дважды.
+# Задания выполняет пул из AI_WORKERS рабочих потоков; частоту обращений к API ограничивает
+# token bucket (AI_RATE_PER_MINUTE в среднем, не больше AI_BURST подряд).
+# О ходе заданий очередь сообщает сигналами: Qt доставляет их в поток получателя (интерфейса)
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from PyQt6.QtCore import QObject, pyqtSignal
+from db import close_conn
+from models import AIRequest
+
+# Служебные элементы очереди заданий: остановка рабочего потока и подхват заданий из БД
+_STOP = object()
+_RESUME = object()
+
+
+class TokenBucket:
+    # rate: пополнение, токенов в секунду; capacity: наибольший запас токенов (допустимая серия подряд)
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Ожидание и получение токена. False — ожидание прервано событием stop.
+    # rate <= 0 — без ограничения частоты
+    def acquire(self, stop: threading.Event = None) -> bool:
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop is None:
+                time.sleep(wait)
+            elif stop.wait(wait):
+                return False
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class AIJobQueue(QObject):
+    # Запрос поставлен в очередь (AIRequest)
+    job_queued = pyqtSignal(object)
+    # Задание начало выполняться: ID запроса
+    job_started = pyqtSignal(int)
+    # Очередной фрагмент ответа: ID запроса, текст фрагмента
+    job_delta = pyqtSignal(int, str)
+    # Задание завершено: ID запроса, итоговый статус, текст ответа
+    job_finished = pyqtSignal(int, str, str)
+
+    # workers: число рабочих потоков (одновременных запросов к API)
+    # rate_per_minute / burst: параметры ограничения частоты запросов
+    def __init__(self, workers: int = 2, rate_per_minute: float = 20, burst: int = 3):
+        super().__init__()
+        self._jobs = queue.Queue()
+        self._bucket = TokenBucket(rate_per_minute / 60, burst)
+        # ID заданий, отменённых пользователем (проверяются перед запуском и между фрагментами ответа)
+        self._cancelled = set()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        # Идентификатор этого экземпляра приложения для аренды заданий
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Пользователь, чьи оставшиеся задания подхватывает очередь (None — никто не вошёл)
+        self._user_id = None
+        self._threads = [
+            threading.Thread(target=self._run, name=f'ai-worker-{i}', daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+        threading.Thread(target=self._keep_leases, name='ai-leases', daemon=True).start()
+
+    # Выполнение уже записанного в БД запроса со статусом queued (см. AIRequest.enqueue)
+    def submit(self, request: AIRequest):
+        self._jobs.put(request.requestID)
+        self.job_queued.emit(request)
+
+    # Подхват невыполненных заданий пользователя user_id (выполняется в рабочем потоке);
+    # задания, аренда которых истечёт позже, подхватит поток аренды.
+    # None — пользователь вышел, его задания больше не подхватываются
+    def resume(self, user_id):
+        with self._lock:
+            self._user_id = user_id
+        if user_id is not None:
+            self._jobs.put(_RESUME)
+
+    # Отмена задания: ещё не начатое не будет выполнено, выполняющееся прервётся
+    # на следующем фрагменте ответа (полученная часть ответа сохраняется)
+    def cancel(self, request_id: int):
+        with self._lock:
+            self._cancelled.add(request_id)
+
+    def _is_cancelled(self, request_id: int) -> bool:
+        with self._lock:
+            return request_id in self._cancelled
+
+    # Остановка: новые задания не запускаются; выполняющиеся задания не ждём — прерванные
+    # останутся в БД со статусом running и будут выполнены заново по окончании их аренды
+    def stop(self):
+        self._stopping.set()
+        for _ in self._threads:
+            self._jobs.put(_STOP)
+
+    # Цикл рабочего потока
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                item = self._jobs.get()
+                if item is _STOP:
+                    break
+                try:
+                    if item is _RESUME:
+                        with self._lock:
+                            user_id = self._user_id
+                        if user_id is not None:
+                            for request_id in AIRequest.requeue_pending(user_id):
+                                self._jobs.put(request_id)
+                    else:
+                        self._process(item)
+                except Exception as e:
+                    print(f"[ai_queue] Ошибка задания {item}: {e}")
+        finally:
+            # подключение к БД этого потока больше не нужно
+            close_conn()
+
+    # Поток аренды: продление аренды своих выполняющихся заданий и подхват заданий пользователя,
+    # аренда которых истекла (экземпляр, взявший их, завершился или упал)
+    def _keep_leases(self):
+        try:
+            while not self._stopping.wait(AIRequest.JOB_LEASE_SECONDS / 3):
+                try:
+                    AIRequest.renew_jobs(self.owner)
+                    with self._lock:
+                        user_id = self._user_id
+                    if user_id is not None:
+                        for request_id in AIRequest.requeue_pending(user_id, queued=False):
+                            self._jobs.put(request_id)
+                except Exception as e:
+                    print(f"[ai_queue] Ошибка продления аренды заданий: {e}")
+        finally:
+            close_conn()
+
+    # Выполнение одного задания
+    def _process(self, request_id: int):
+        if self._is_cancelled(request_id):
+            self._finish_cancelled_before_start(request_id)
+            return
+        if not self._bucket.acquire(self._stopping):
+            return
+        if self._is_cancelled(request_id):
+            self._finish_cancelled_before_start(request_id)
+            return
+        request = AIRequest.start_job(request_id, self.owner)
+        if request is None:
+            # задание уже выполняется другим потоком, отменено или удалено
+            return
+        self.job_started.emit(request_id)
+
+        parts = []
+
+        def on_delta(delta):
+            if self._is_cancelled(request_id):
+                raise _Cancelled()
+            parts.append(delta)
+            self.job_delta.emit(request_id, delta)
+
+        try:
+            request.send(on_delta=on_delta, use_cache=request.use_cache)
+        except _Cancelled:
+            request.response = ''.join(parts)
+            request.status = AIRequest.CANCELLED
+            request.save()
+        except Exception as e:
+            # Сохраняем ошибку в БД вместо ответа
+            request.response = f"Ошибка при отправке: {e}"
+            request.status = AIRequest.FAILED
+            request.save()
+            print(f"[ai_queue] Ошибка отправки запроса {request_id}: {e}")
+        finally:
+            with self._lock:
+                self._cancelled.discard(request_id)
+        self.job_finished.emit(request_id, request.status, request.response or '')
+
+    def _finish_cancelled_before_start(self, request_id: int):
+        with self._lock:
+            self._cancelled.discard(request_id)
+        if AIRequest.cancel_queued(request_id):
+            self.job_finished.emit(request_id, AIRequest.CANCELLED, '')
+
+
+_queue = None
+
+
+# Общая очередь процесса (создаётся при первом обращении, в потоке интерфейса)
+def get_queue() -> AIJobQueue:
+    global _queue
+    if _queue is None:
+        import settings
+        s = settings.get()
+        _queue = AIJobQueue(s.ai_workers, s.ai_rate_per_minute, s.ai_burst)
+    return _queue
+
+
+# Остановка очереди при выходе из приложения (если она создавалась)
+def shutdown():
+    if _queue is not None:
+        _queue.stop()
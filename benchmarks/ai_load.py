@@ -0,0 +1,219 @@
+# ai_load.py
+# Нагрузочный тест AI-пути без сети: заглушка DeepSeek (mock_deepseek.py) в этом же процессе,
+# временная БД и .env с AI_BASE_URL заглушки. Каждый запрос проходит путь приложения:
+# запись в БД (AIRequest.enqueue), взятие задания (start_job), потоковый ответ через AIClient
+# и запись ответа (_finish). Печатает пропускную способность и перцентили задержек ответа и записей в БД.
+#
+#   python benchmarks/ai_load.py --requests 200 --concurrency 8
+#   python benchmarks/ai_load.py --mode queue --requests 60          # через очередь ai_queue (AI_WORKERS, AI_RATE_PER_MINUTE)
+#   python benchmarks/ai_load.py --error-rate 0.1 --burst-every 20 --burst-length 3 --retry-after 0.2
+#   python benchmarks/ai_load.py --url http://127.0.0.1:8765/v1     # уже запущенная заглушка
+#
+# Код возврата 1, если 95-й перцентиль полного времени запроса превышает бюджет (--budget-ms)
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mock_deepseek import MockDeepSeek, add_arguments, config_from_args
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+# Замеры по именам (мс), пишутся из нескольких потоков
+class Recorder:
+    def __init__(self):
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, ms: float):
+        with self._lock:
+            self.values.setdefault(name, []).append(ms)
+
+    def summary(self):
+        return {
+            name: {
+                'count': len(v), 'p50': percentile(v, 50), 'p95': percentile(v, 95),
+                'p99': percentile(v, 99), 'max': max(v),
+            }
+            for name, v in self.values.items() if v
+        }
+
+
+# Временная БД и .env, указывающий на заглушку; возвращает пользователя для запросов
+def setup(tmp: Path, url: str, args):
+    import db
+    import settings
+    from models import User
+
+    db.DB_PATH = tmp / 'bench.db'
+    settings.ENV_PATH = tmp / '.env'
+    settings.update({
+        'DEEPSEEK_API_KEY': 'bench',
+        'AI_BASE_URL': url,
+        'AI_CACHE_ENABLED': '0',
+        'AI_MAX_RETRIES': str(args.max_retries),
+        'AI_WORKERS': str(args.concurrency),
+        'AI_RATE_PER_MINUTE': str(args.rate_per_minute),
+        'AI_BURST': str(args.burst),
+    })
+    db.init_db()
+    return User.register('bench', 'bench')
+
+
+# Замер записи ответа в БД внутри AIRequest.send
+def instrument_finish(recorder: Recorder):
+    from models import AIRequest
+    original = AIRequest._finish
+
+    def timed_finish(self, ok):
+        started = time.perf_counter()
+        original(self, ok)
+        recorder.add('db_finish', (time.perf_counter() - started) * 1000)
+
+    AIRequest._finish = timed_finish
+
+
+# Запросы из пула потоков напрямую (как рабочие потоки очереди, но без ограничения частоты)
+def run_direct(user, args, recorder: Recorder) -> Counter:
+    from models import AIRequest
+
+    def run_one(i):
+        t0 = time.perf_counter()
+        request = AIRequest.enqueue(user.userID, f'Нагрузочный запрос {i}', False)
+        t1 = time.perf_counter()
+        request = AIRequest.start_job(request.requestID, 'ai_load')
+        t2 = time.perf_counter()
+        recorder.add('db_enqueue', (t1 - t0) * 1000)
+        recorder.add('db_start', (t2 - t1) * 1000)
+        first = []
+
+        def on_delta(delta):
+            if not first:
+                first.append(time.perf_counter())
+
+        try:
+            request.send(on_delta=on_delta, use_cache=False)
+        except Exception as e:
+            print(f"[ai_load] Ошибка запроса {i}: {e}")
+            return 'exception'
+        done = time.perf_counter()
+        if first:
+            recorder.add('first_delta', (first[0] - t2) * 1000)
+        recorder.add('total', (done - t2) * 1000)
+        return request.status
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        return Counter(pool.map(run_one, range(args.requests)))
+
+
+# Запросы через очередь заданий приложения (ai_queue) с её пулом и ограничением частоты.
+# Время считается от постановки в очередь, включая ожидание своей очереди
+def run_queue(user, args, recorder: Recorder) -> Counter:
+    from PyQt6.QtCore import QCoreApplication
+    import ai_queue
+    from models import AIRequest
+
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    queue = ai_queue.get_queue()
+    submitted, first, statuses = {}, set(), Counter()
+
+    def on_delta(request_id, delta):
+        if request_id not in first:
+            first.add(request_id)
+            recorder.add('first_delta', (time.perf_counter() - submitted[request_id]) * 1000)
+
+    def on_finished(request_id, status, response):
+        recorder.add('total', (time.perf_counter() - submitted[request_id]) * 1000)
+        statuses[status] += 1
+        if sum(statuses.values()) == args.requests:
+            app.quit()
+
+    queue.job_delta.connect(on_delta)
+    queue.job_finished.connect(on_finished)
+    for i in range(args.requests):
+        t0 = time.perf_counter()
+        request = AIRequest.enqueue(user.userID, f'Нагрузочный запрос {i}', False)
+        recorder.add('db_enqueue', (time.perf_counter() - t0) * 1000)
+        submitted[request.requestID] = time.perf_counter()
+        queue.submit(request)
+    app.exec()
+    ai_queue.shutdown()
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест AI-запросов на локальной заглушке DeepSeek')
+    parser.add_argument('--mode', choices=('direct', 'queue'), default='direct',
+                        help='direct — пул потоков без ограничения частоты; queue — очередь заданий ai_queue')
+    parser.add_argument('--requests', type=int, default=100, help='число запросов')
+    parser.add_argument('--concurrency', type=int, default=8, help='одновременных запросов (AI_WORKERS в режиме queue)')
+    parser.add_argument('--rate-per-minute', type=float, default=0, help='AI_RATE_PER_MINUTE в режиме queue (0 — без ограничения)')
+    parser.add_argument('--burst', type=int, default=3, help='AI_BURST в режиме queue')
+    parser.add_argument('--max-retries', type=int, default=3, help='AI_MAX_RETRIES')
+    parser.add_argument('--url', help='адрес уже запущенной заглушки (иначе запускается своя)')
+    parser.add_argument('--budget-ms', type=float, default=2000.0, help='бюджет на p95 полного времени запроса, мс')
+    parser.add_argument('--json', metavar='PATH', help='сохранить результаты в JSON')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = args.url
+    else:
+        server = MockDeepSeek(config=config_from_args(args)).start()
+        url = server.url
+
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as tmp:
+        user = setup(Path(tmp), url, args)
+        instrument_finish(recorder)
+        started = time.perf_counter()
+        if args.mode == 'queue':
+            statuses = run_queue(user, args, recorder)
+        else:
+            statuses = run_direct(user, args, recorder)
+        elapsed = time.perf_counter() - started
+        from db import close_conn
+        close_conn()
+
+    mock_stats = None
+    if server is not None:
+        mock_stats = dict(server.stats)
+        server.stop()
+
+    summary = recorder.summary()
+    total_p95 = summary.get('total', {}).get('p95', 0.0)
+    print(f"Режим: {args.mode}, запросов: {args.requests}, одновременно: {args.concurrency}, заглушка: {url}")
+    print(f"Итоги: {dict(statuses)}, за {elapsed:.2f} с — {args.requests / elapsed:.1f} запросов/с")
+    print("Задержки, мс:")
+    for name, s in summary.items():
+        print(f"  {name:12} n={s['count']:<5} p50={s['p50']:8.2f} p95={s['p95']:8.2f} "
+              f"p99={s['p99']:8.2f} max={s['max']:8.2f}")
+    if mock_stats is not None:
+        print(f"Заглушка: {mock_stats}")
+    ok = total_p95 <= args.budget_ms
+    print('OK' if ok else 'ПРЕВЫШЕН БЮДЖЕТ')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'mode': args.mode, 'requests': args.requests, 'concurrency': args.concurrency,
+                'elapsed_s': elapsed, 'throughput_rps': args.requests / elapsed,
+                'statuses': dict(statuses), 'latency_ms': summary, 'mock': mock_stats,
+            }, f, ensure_ascii=False, indent=2)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# mock_deepseek.py
+# Локальная заглушка DeepSeek API: POST /v1/chat/completions в потоковом (server-sent events)
+# и обычном режиме, с настраиваемой задержкой, долей ошибок 5xx, обрывами потока и сериями 429.
+# Нужна для замеров и проверки AI-пути без сети и без оплаты запросов:
+#
+#   python benchmarks/mock_deepseek.py --port 8765 --latency-ms 300 --error-rate 0.05
+#   # в .env приложения: AI_BASE_URL=http://127.0.0.1:8765/v1
+#
+# GET /stats — счётчики ответов заглушки (JSON). Нагрузочный тест (benchmarks/ai_load.py)
+# запускает заглушку в своём процессе через MockDeepSeek
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = "ответ модель текст пример заметка запрос данные строка слово результат".split()
+
+
+class MockConfig:
+    # latency_ms / jitter_ms: задержка до первого байта ответа и её случайный разброс, мс
+    # chunks / chunk_delay_ms: число фрагментов ответа и пауза между ними в потоке, мс
+    # error_rate: доля ответов 500; drop_rate: доля потоков, оборванных на середине
+    # burst_every / burst_length: после каждых burst_every запросов следующие burst_length
+    # получают 429 с заголовком Retry-After (retry_after, с); 0 — без серий 429
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, chunks: int = 20,
+                 chunk_delay_ms: float = 20, error_rate: float = 0.0, drop_rate: float = 0.0,
+                 burst_every: int = 0, burst_length: int = 0, retry_after: float = 1, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.chunks = chunks
+        self.chunk_delay_ms = chunk_delay_ms
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+class MockDeepSeek(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # port=0 — свободный порт (см. url)
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, config: MockConfig = None, verbose: bool = False):
+        super().__init__((host, port), _Handler)
+        self.config = config or MockConfig()
+        self.verbose = verbose
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self.stats = {'requests': 0, 'ok': 0, 'stream': 0, 'rate_limited': 0, 'errors': 0, 'dropped': 0,
+                      'unauthorized': 0}
+        self._thread = None
+
+    # Адрес API для AI_BASE_URL / AIClient
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    # Запуск в фоновом потоке (для тестов и нагрузочного скрипта)
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='mock-deepseek', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Клиент закрыл keep-alive соединение (например, лишнее для своего пула) — не ошибка заглушки
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    # Исход очередного запроса: '429', '500', 'drop' (оборвать поток) или 'ok', и задержка ответа, с
+    def next_outcome(self):
+        c = self.config
+        with self._lock:
+            n = self._requests
+            self._requests += 1
+            self.stats['requests'] += 1
+            delay = max(0.0, c.latency_ms + self._random.uniform(-c.jitter_ms, c.jitter_ms)) / 1000
+            if c.burst_every > 0 and c.burst_length > 0 and n % (c.burst_every + c.burst_length) >= c.burst_every:
+                return '429', delay
+            roll = self._random.random()
+        if roll < c.error_rate:
+            return '500', delay
+        if roll < c.error_rate + c.drop_rate:
+            return 'drop', delay
+        return 'ok', delay
+
+    # Текст ответа: фрагменты из слов, зависящие от промпта (одинаковый промпт — одинаковый ответ)
+    def answer(self, prompt: str):
+        rnd = random.Random(prompt)
+        return [' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 4))) + ' ' for _ in range(self.config.chunks)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, как у настоящего API: клиент переиспользует соединения пула
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.server._lock:
+                stats = dict(self.server.stats)
+            self._send_json(200, stats)
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+        if not (self.headers.get('Authorization') or '').startswith('Bearer '):
+            self.server.count('unauthorized')
+            self._send_json(401, {'error': {'message': 'Authentication Fails'}})
+            return
+        try:
+            payload = json.loads(body)
+            prompt = payload['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send_json(400, {'error': {'message': 'invalid request'}})
+            return
+
+        outcome, delay = self.server.next_outcome()
+        time.sleep(delay)
+        if outcome == '429':
+            self.server.count('rate_limited')
+            self._send_json(429, {'error': {'message': 'Rate limit reached'}},
+                            {'Retry-After': f'{self.server.config.retry_after:g}'})
+            return
+        if outcome == '500':
+            self.server.count('errors')
+            self._send_json(500, {'error': {'message': 'Internal server error'}})
+            return
+
+        parts = self.server.answer(prompt)
+        model = payload.get('model', 'deepseek-chat')
+        if not payload.get('stream'):
+            self.server.count('ok')
+            self._send_json(200, {
+                'id': 'mock', 'object': 'chat.completion', 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(parts)},
+                             'finish_reason': 'stop'}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        drop_at = len(parts) // 2 if outcome == 'drop' else None
+        for i, part in enumerate(parts):
+            if i == drop_at:
+                # обрыв соединения посреди ответа (без завершающего фрагмента)
+                self.server.count('dropped')
+                self.close_connection = True
+                return
+            chunk = {'id': 'mock', 'object': 'chat.completion.chunk', 'model': model,
+                     'choices': [{'index': 0, 'delta': {'content': part}, 'finish_reason': None}]}
+            self._send_chunk(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            if self.server.config.chunk_delay_ms:
+                time.sleep(self.server.config.chunk_delay_ms / 1000)
+        self._send_chunk(b'data: [DONE]\n\n')
+        self._send_chunk(b'')
+        self.server.count('ok')
+        self.server.count('stream')
+
+
+# Параметры заглушки из командной строки (общие с benchmarks/ai_load.py)
+def add_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=200, help='задержка до первого байта ответа, мс')
+    parser.add_argument('--jitter-ms', type=float, default=50, help='случайный разброс задержки, мс')
+    parser.add_argument('--chunks', type=int, default=20, help='число фрагментов ответа')
+    parser.add_argument('--chunk-delay-ms', type=float, default=20, help='пауза между фрагментами потока, мс')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 500')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='доля потоков, оборванных на середине')
+    parser.add_argument('--burst-every', type=int, default=0, help='после скольких запросов начинается серия 429')
+    parser.add_argument('--burst-length', type=int, default=0, help='длина серии ответов 429')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After в ответах 429, с')
+    parser.add_argument('--seed', type=int, default=1, help='зерно случайных ошибок и задержек')
+
+
+def config_from_args(args) -> MockConfig:
+    return MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, chunks=args.chunks,
+        chunk_delay_ms=args.chunk_delay_ms, error_rate=args.error_rate, drop_rate=args.drop_rate,
+        burst_every=args.burst_every, burst_length=args.burst_length, retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальная заглушка DeepSeek API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--verbose', action='store_true', help='печатать каждый запрос')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockDeepSeek(args.host, args.port, config_from_args(args), verbose=args.verbose)
+    print(f"Заглушка DeepSeek: {server.url} (AI_BASE_URL), статистика: {server.url[:-3]}/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+# model_bench.py
+# Замеры модели данных (models.py) на больших объёмах, без Qt: списки и постраничная загрузка,
+# сохранение и загрузка заметок (в том числе правка блока в заметке на LONG_NOTE_BLOCKS блоков), CRUD напоминаний, запросы планировщика (ближайшее время и захват
+# сработавших), запись и загрузка AI-запросов. Для каждой операции — p50/p95/p99 и максимум, мс.
+# БД создаётся генератором synth_data.py (во временной папке или в --db, чтобы переиспользовать
+# между запусками: генерация миллиона напоминаний занимает около минуты).
+# Операции записи убирают за собой созданные строки, так что повторные запуски на одной БД сравнимы.
+#
+#   python benchmarks/model_bench.py --db /tmp/bench.db --json base.json          # базовый замер
+#   python benchmarks/model_bench.py --db /tmp/bench.db --compare base.json       # после изменения
+#   python benchmarks/model_bench.py --notes 10000 --reminders 100000 --iterations 50   # быстрый прогон
+#
+# Код возврата 1, если при --compare p95 какой-либо операции вырос больше чем в --max-regression раз
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synth_data import BENCH_USER, WORDS, add_arguments, generate, volumes_from_args
+
+# Строк на странице списка (как PagedListModel)
+PAGE = 200
+# Сколько случайных ID каждой таблицы выбирается для операций над существующими записями
+SAMPLE = 2000
+# Блоков в длинной заметке: цена правки одного блока не должна зависеть от размера заметки
+LONG_NOTE_BLOCKS = 500
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+# Замеры по именам операций, мс
+class Timings:
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def measure(self, name: str):
+        started = time.perf_counter()
+        yield
+        self.samples.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+
+    def summary(self):
+        return {
+            name: {
+                'count': len(v), 'p50': percentile(v, 50), 'p95': percentile(v, 95),
+                'p99': percentile(v, 99), 'max': max(v), 'mean': sum(v) / len(v),
+            }
+            for name, v in self.samples.items()
+        }
+
+
+def _text(rnd, lo: int, hi: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(lo, hi)))
+
+
+# Случайная выборка строк таблицы основного пользователя
+def _sample(conn, sql: str, user_id: int):
+    return [tuple(r) for r in conn.execute(f'{sql} WHERE userID = ? ORDER BY random() LIMIT {SAMPLE}', (user_id,))]
+
+
+def bench_notes(t: Timings, user, rnd, n: int):
+    from db import get_conn
+    from models import Note
+
+    rows = _sample(get_conn(), 'SELECT noteID, created FROM notes', user.userID)
+    words = [w for w in WORDS if len(w) > 3]
+    for _ in range(n):
+        with t.measure('notes.list_first_page'):
+            user.get_notes_list(PAGE)
+        note_id, created = rnd.choice(rows)
+        with t.measure('notes.list_page_after'):
+            user.get_notes_list(PAGE, (created, note_id))
+        with t.measure('notes.load_by_id'):
+            note = Note.load_by_id(rnd.choice(rows)[0])
+
+        # правка одного текстового блока открытой заметки (как автосохранение редактора)
+        block = next((b for b in note.content if b['type'] == 'text'), None)
+        if block is not None:
+            block['content'] += ' ' + rnd.choice(WORDS)
+            with t.measure('notes.save_edit_block'):
+                note.save(dirty={block['id']})
+        note.title = _text(rnd, 1, 5)
+        with t.measure('notes.save_all_blocks'):
+            note.save()
+        with t.measure('notes.search'):
+            user.search_notes(rnd.choice(words))
+
+    # правка одного блока в длинной заметке
+    long_note = Note(user.userID, 'long', [{'type': 'text', 'content': _text(rnd, 5, 80)}
+                                           for _ in range(LONG_NOTE_BLOCKS)])
+    long_note.save()
+    for _ in range(n):
+        block = rnd.choice(long_note.content)
+        block['content'] += ' ' + rnd.choice(WORDS)
+        with t.measure('notes.save_edit_block_long'):
+            long_note.save(dirty={block['id']})
+
+    created_ids = [long_note.noteID]
+    for _ in range(n):
+        content = [{'type': 'text', 'content': _text(rnd, 5, 80)} for _ in range(4)]
+        note = Note(user.userID, _text(rnd, 1, 5), content)
+        with t.measure('notes.save_new'):
+            note.save()
+        created_ids.append(note.noteID)
+    with t.measure('notes.delete_many'):
+        Note.delete_many(user.userID, created_ids)
+
+
+def bench_reminders(t: Timings, user, rnd, n: int):
+    from db import get_conn
+    from models import Reminder
+
+    rows = _sample(get_conn(), 'SELECT remindID, startTime FROM reminders', user.userID)
+    future = datetime.now() + timedelta(days=30)
+    for _ in range(n):
+        with t.measure('reminders.list_first_page'):
+            user.get_reminders_list(PAGE)
+        remind_id, start = rnd.choice(rows)
+        with t.measure('reminders.list_page_after'):
+            user.get_reminders_list(PAGE, (start, remind_id))
+        with t.measure('reminders.load_by_id'):
+            Reminder.load_by_id(rnd.choice(rows)[0])
+
+    created = []
+    for i in range(n):
+        r = Reminder(user.userID, _text(rnd, 1, 8), (future + timedelta(minutes=i)).isoformat())
+        with t.measure('reminders.save_new'):
+            r.save()
+        created.append(r)
+    for r in created:
+        r.text = _text(rnd, 1, 8)
+        with t.measure('reminders.update'):
+            r.save()
+    for r in created:
+        with t.measure('reminders.delete'):
+            r.delete()
+
+
+# Запросы планировщика напоминаний: ближайшее время срабатывания и захват сработавших
+# (перед каждым захватом добавляется одно сработавшее напоминание, вне замера)
+def bench_scheduler(t: Timings, user, rnd, n: int):
+    from models import Reminder
+
+    owner = 'bench'
+    for _ in range(n):
+        with t.measure('scheduler.next_start_time'):
+            Reminder.get_next_start_time(user.userID)
+        Reminder(user.userID, 'due', (datetime.now() - timedelta(seconds=1)).isoformat()).save()
+        with t.measure('scheduler.claim_due'):
+            due = Reminder.claim_due(user.userID, owner)
+        with t.measure('scheduler.complete_claimed'):
+            Reminder.complete_claimed(user.userID, [r.remindID for r in due], owner)
+
+
+def bench_ai(t: Timings, user, rnd, n: int):
+    from db import get_conn
+    from models import AIRequest
+
+    rows = _sample(get_conn(), 'SELECT requestID, created FROM ai_requests', user.userID)
+    for _ in range(n):
+        with t.measure('ai.history_first_page'):
+            user.get_ai_history(PAGE)
+        request_id, created = rnd.choice(rows)
+        with t.measure('ai.history_page_after'):
+            user.get_ai_history(PAGE, (created, request_id))
+        with t.measure('ai.load_by_id'):
+            AIRequest.load_by_id(rnd.choice(rows)[0])
+
+    created_ids = []
+    for _ in range(n):
+        r = AIRequest(user.userID, _text(rnd, 3, 30), _text(rnd, 40, 200))
+        with t.measure('ai.save'):
+            r.save()
+        created_ids.append(r.requestID)
+
+        # путь задания очереди: постановка, захват, запись ответа
+        with t.measure('ai.enqueue'):
+            r = AIRequest.enqueue(user.userID, _text(rnd, 3, 30), False)
+        created_ids.append(r.requestID)
+        with t.measure('ai.start_job'):
+            r = AIRequest.start_job(r.requestID, 'model_bench')
+        r.response = _text(rnd, 40, 200)
+        with t.measure('ai.finish'):
+            r._finish(True)
+        with t.measure('ai.requeue_pending'):
+            AIRequest.requeue_pending(user.userID)
+    AIRequest.delete_many(user.userID, created_ids)
+
+
+SUITES = {
+    'notes': bench_notes,
+    'reminders': bench_reminders,
+    'scheduler': bench_scheduler,
+    'ai': bench_ai,
+}
+
+
+# Фактические объёмы данных основного пользователя
+def _counts(user_id: int):
+    from db import get_conn
+    conn = get_conn()
+    return {
+        table: conn.execute(f'SELECT COUNT(*) FROM {table} WHERE userID = ?', (user_id,)).fetchone()[0]
+        for table in ('notes', 'reminders', 'ai_requests')
+    }
+
+
+# Сравнение с сохранённым замером; возвращает имена операций, у которых p95 вырос больше допустимого
+def compare(summary: dict, base_path: str, max_regression: float, noise_ms: float):
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)['results']
+    regressions = []
+    print(f"Сравнение с {base_path} (p95, мс):")
+    for name, s in summary.items():
+        b = base.get(name)
+        if b is None:
+            continue
+        ratio = s['p95'] / b['p95'] if b['p95'] > 0 else float('inf')
+        bad = s['p95'] > b['p95'] * max_regression and s['p95'] - b['p95'] > noise_ms
+        if bad:
+            regressions.append(name)
+        print(f"  {name:28} {b['p95']:9.3f} -> {s['p95']:9.3f}  x{ratio:5.2f}{'  РЕГРЕССИЯ' if bad else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замеры модели данных на синтетической БД')
+    parser.add_argument('--db', help='БД для замеров: создаётся генератором, если её нет, иначе переиспользуется')
+    parser.add_argument('--iterations', type=int, default=200, help='повторов каждой операции')
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), help='только эти группы (можно несколько)')
+    parser.add_argument('--json', metavar='PATH', help='сохранить результаты в JSON')
+    parser.add_argument('--compare', metavar='PATH', help='сравнить с результатами из JSON')
+    parser.add_argument('--max-regression', type=float, default=1.5, help='допустимый рост p95 при --compare, раз')
+    parser.add_argument('--noise-ms', type=float, default=0.5, help='рост p95 меньше этого не считается регрессией, мс')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    import db
+    from models import User
+
+    tmp = None
+    if args.db:
+        path = Path(args.db)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        path = Path(tmp.name) / 'bench.db'
+    db.DB_PATH = path
+    if path.exists():
+        db.init_db()
+        print(f"БД: {path} (переиспользуется)")
+    else:
+        print(f"Генерация БД {path}...")
+        started = time.perf_counter()
+        generate(volumes_from_args(args))
+        print(f"Сгенерирована за {time.perf_counter() - started:.1f} с")
+    user = User.login(BENCH_USER, BENCH_USER)
+    if user is None:
+        parser.error(f'в {path} нет пользователя {BENCH_USER}: БД создана не synth_data.py')
+
+    counts = _counts(user.userID)
+    print(f"Объёмы: {counts}, повторов: {args.iterations}")
+    rnd = random.Random(args.seed)
+    timings = Timings()
+    for name in args.suite or SUITES:
+        started = time.perf_counter()
+        SUITES[name](timings, user, rnd, args.iterations)
+        print(f"  {name}: {time.perf_counter() - started:.1f} с")
+
+    summary = timings.summary()
+    print("Задержки, мс:")
+    for name, s in summary.items():
+        print(f"  {name:28} p50={s['p50']:8.3f} p95={s['p95']:8.3f} p99={s['p99']:8.3f} max={s['max']:8.3f}")
+    if 'PyQt6' in sys.modules:
+        print("Внимание: при замерах был импортирован PyQt6")
+
+    regressions = compare(summary, args.compare, args.max_regression, args.noise_ms) if args.compare else []
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({
+                'meta': {
+                    'counts': counts, 'iterations': args.iterations, 'db_size_mb': path.stat().st_size / 2**20,
+                    'sqlite': sqlite3.sqlite_version, 'python': platform.python_version(),
+                    'platform': platform.platform(), 'timestamp': datetime.now().isoformat(timespec='seconds'),
+                },
+                'results': summary,
+            }, f, ensure_ascii=False, indent=2)
+    db.close_conn()
+    if tmp is not None:
+        tmp.cleanup()
+    if regressions:
+        print(f"Регрессии: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+# startup_time.py
+# Замер холодного старта: несколько запусков main.py --profile-startup --profile-quit в отдельных
+# процессах, время от старта процесса до готовности окна входа к вводу (см. startup_profile.py).
+#
+#   python benchmarks/startup_time.py --runs 10
+#   QT_QPA_PLATFORM=offscreen python benchmarks/startup_time.py   # без окна
+#
+# Код возврата 1, если медиана превышает бюджет (--budget-ms)
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+# Один запуск приложения; возвращает (профиль из JSON, полное время жизни процесса в мс)
+def run_once(timeout: float):
+    fd, out = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, str(ROOT / 'main.py'), '--profile-startup', '--profile-quit', '--profile-output', out],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=timeout, check=True,
+        )
+        wall_ms = (time.perf_counter() - started) * 1000
+        with open(out, encoding='utf-8') as f:
+            return json.load(f), wall_ms
+    finally:
+        os.unlink(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Время холодного старта до готовности окна входа')
+    parser.add_argument('--runs', type=int, default=5, help='число запусков')
+    parser.add_argument('--budget-ms', type=float, default=300.0, help='бюджет на медиану, мс')
+    parser.add_argument('--timeout', type=float, default=60.0, help='предельное время одного запуска, с')
+    parser.add_argument('--json', metavar='PATH', help='сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    ready, walls, last = [], [], None
+    for _ in range(args.runs):
+        profile, wall_ms = run_once(args.timeout)
+        ready.append(profile['time_to_interactive_ms'])
+        walls.append(wall_ms)
+        last = profile
+
+    median = statistics.median(ready)
+    print(f"Запусков: {args.runs}")
+    print(f"До готовности окна входа, мс: медиана={median:.1f} min={min(ready):.1f} max={max(ready):.1f}")
+    print(f"Время жизни процесса (с запуском интерпретатора), мс: медиана={statistics.median(walls):.1f}")
+    print("Этапы последнего запуска, мс:")
+    for m in last['marks']:
+        print(f"  {m['ms']:8.1f}  {m['name']}")
+    print('OK' if median <= args.budget_ms else 'ПРЕВЫШЕН БЮДЖЕТ')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'runs': ready, 'median_ms': median, 'process_ms': walls, 'last': last}, f,
+                      ensure_ascii=False, indent=2)
+    return 0 if median <= args.budget_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
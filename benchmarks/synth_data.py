@@ -0,0 +1,200 @@
+# synth_data.py
+# Генератор синтетической БД для замеров модели данных: пользователь с большим объёмом данных
+# (по умолчанию 100 тыс. заметок с текстовыми блоками и изображениями, 1 млн напоминаний,
+# 50 тыс. AI-запросов) и несколько «соседей» с небольшими объёмами — чтобы запросы
+# с фильтром по userID работали на общей таблице, как в реальной БД.
+# Строки пишутся пакетами через executemany в обход моделей: иначе генерация заняла бы часы.
+# Индексы поиска (notes_fts, note_blocks_fts, ai_requests_fts) и ссылки на изображения (image_refs) заполняются
+# так же, как при сохранении через модели. Файлы изображений не создаются — только ссылки на них.
+#
+#   python benchmarks/synth_data.py bench.db --notes 100000 --reminders 1000000 --ai 50000
+import argparse
+import hashlib
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Имя пользователя с основным объёмом данных
+BENCH_USER = 'bench'
+# Строк в одной транзакции генерации
+BATCH = 10000
+
+WORDS = (
+    "заметка текст абзац строка список задача встреча проект отчёт идея план покупка звонок письмо "
+    "документ книга статья вопрос ответ пример данные модель запрос результат неделя месяц"
+).split()
+
+
+class Volumes:
+    # notes / reminders / ai: объём данных основного пользователя;
+    # blocks: среднее число блоков в заметке; image_share: доля заметок с изображением;
+    # neighbours: число других пользователей, у каждого — neighbour_share от объёмов основного
+    def __init__(self, notes: int = 100000, reminders: int = 1000000, ai: int = 50000, blocks: int = 4,
+                 image_share: float = 0.2, neighbours: int = 3, neighbour_share: float = 0.01, seed: int = 1):
+        self.notes = notes
+        self.reminders = reminders
+        self.ai = ai
+        self.blocks = blocks
+        self.image_share = image_share
+        self.neighbours = neighbours
+        self.neighbour_share = neighbour_share
+        self.seed = seed
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def _text(rnd, lo: int, hi: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(lo, hi)))
+
+
+# Путь изображения в хранилище (формат image_store: storage/images/<2 символа хэша>/<хэш>.png)
+def _image_path(n: int) -> str:
+    digest = hashlib.sha256(str(n).encode()).hexdigest()
+    return f'storage/images/{digest[:2]}/{digest}.png'
+
+
+def _batches(total: int):
+    for start in range(0, total, BATCH):
+        yield start, min(total, start + BATCH)
+
+
+# Заметки пользователя с блоками, записями notes_fts / note_blocks_fts и image_refs
+def _fill_notes(user_id: int, count: int, volumes: Volumes, rnd, base: datetime, image_pool: int):
+    from db import transaction
+    from models import Note
+
+    for start, stop in _batches(count):
+        with transaction() as conn:
+            note_ids = []
+            for i in range(start, stop):
+                # created растёт с номером: новые заметки — в начале списка
+                created = (base + timedelta(seconds=i * 30)).isoformat()
+                title = _text(rnd, 1, 5)
+                cur = conn.execute(
+                    'INSERT INTO notes (userID, title, created, updated) VALUES (?, ?, ?, ?)',
+                    (user_id, title, created, created),
+                )
+                note_id = cur.lastrowid
+                note_ids.append(note_id)
+                content = [{'type': 'text', 'content': _text(rnd, 5, 80)}
+                           for _ in range(max(1, rnd.randint(1, 2 * volumes.blocks - 1)))]
+                if rnd.random() < volumes.image_share:
+                    # изображения общие для нескольких заметок, как после копирования
+                    image = {'type': 'image', 'content': _image_path(rnd.randrange(image_pool))}
+                    content.insert(rnd.randint(0, len(content)), image)
+                conn.executemany(
+                    'INSERT INTO note_blocks (noteID, position, type, content) VALUES (?, ?, ?, ?)',
+                    [(note_id, (k + 1) * Note.BLOCK_GAP, b['type'], b['content']) for k, b in enumerate(content)],
+                )
+                Note._index_images(conn, note_id, content)
+            Note._index_new(conn, note_ids)
+
+
+# Напоминания пользователя: все в будущем (в течение двух лет), чтобы планировщику нечего было доставлять
+def _fill_reminders(user_id: int, count: int, rnd, now: datetime):
+    from db import transaction
+
+    span = 2 * 365 * 24 * 3600
+    for start, stop in _batches(count):
+        with transaction() as conn:
+            conn.executemany(
+                'INSERT INTO reminders (userID, text, startTime) VALUES (?, ?, ?)',
+                [
+                    (user_id, _text(rnd, 1, 8), (now + timedelta(seconds=60 + rnd.randrange(span))).isoformat())
+                    for _ in range(start, stop)
+                ],
+            )
+
+
+# История AI-запросов пользователя (ai_requests_fts заполняют триггеры)
+def _fill_ai(user_id: int, count: int, rnd, base: datetime):
+    from db import transaction
+
+    for start, stop in _batches(count):
+        with transaction() as conn:
+            conn.executemany(
+                'INSERT INTO ai_requests (userID, prompt, response, created, status, useCache) '
+                "VALUES (?, ?, ?, ?, 'done', 1)",
+                [
+                    (user_id, _text(rnd, 3, 30), _text(rnd, 40, 200), (base + timedelta(seconds=i * 60)).isoformat())
+                    for i in range(start, stop)
+                ],
+            )
+
+
+# Заполнение БД по текущему db.DB_PATH (схема создаётся init_db). Возвращает ID основного пользователя
+def generate(volumes: Volumes, progress=print) -> int:
+    from db import get_conn, init_db
+    from models import User
+
+    init_db()
+    rnd = random.Random(volumes.seed)
+    now = datetime.now()
+    base = now - timedelta(days=365 * 3)
+    image_pool = max(1, volumes.notes // 10)
+
+    users = [(BENCH_USER, 1.0)] + [(f'neighbour{k}', volumes.neighbour_share) for k in range(volumes.neighbours)]
+    bench_id = None
+    for name, share in users:
+        user = User.register(name, name)
+        if user is None:
+            raise RuntimeError(f'Пользователь {name} уже есть: генерируйте в пустую БД')
+        if bench_id is None:
+            bench_id = user.userID
+        for label, count in (('заметки', volumes.notes), ('напоминания', volumes.reminders), ('AI-запросы', volumes.ai)):
+            n = int(count * share)
+            started = time.perf_counter()
+            if label == 'заметки':
+                _fill_notes(user.userID, n, volumes, rnd, base, image_pool)
+            elif label == 'напоминания':
+                _fill_reminders(user.userID, n, rnd, now)
+            else:
+                _fill_ai(user.userID, n, rnd, base)
+            if progress:
+                progress(f"  {name}: {label} {n} — {time.perf_counter() - started:.1f} с")
+    # статистика для планировщика запросов, как после миграций
+    get_conn().execute('ANALYZE')
+    return bench_id
+
+
+def add_arguments(parser):
+    parser.add_argument('--notes', type=int, default=100000, help='заметок у основного пользователя')
+    parser.add_argument('--reminders', type=int, default=1000000, help='напоминаний у основного пользователя')
+    parser.add_argument('--ai', type=int, default=50000, help='AI-запросов у основного пользователя')
+    parser.add_argument('--blocks', type=int, default=4, help='среднее число блоков в заметке')
+    parser.add_argument('--image-share', type=float, default=0.2, help='доля заметок с изображением')
+    parser.add_argument('--neighbours', type=int, default=3, help='число других пользователей')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def volumes_from_args(args) -> Volumes:
+    return Volumes(
+        notes=args.notes, reminders=args.reminders, ai=args.ai, blocks=args.blocks,
+        image_share=args.image_share, neighbours=args.neighbours, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетическая БД для замеров модели данных')
+    parser.add_argument('db', help='путь к новой БД')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    import db
+    path = Path(args.db)
+    if path.exists():
+        parser.error(f'{path} уже существует')
+    db.DB_PATH = path
+    started = time.perf_counter()
+    generate(volumes_from_args(args))
+    db.close_conn()
+    print(f"Готово за {time.perf_counter() - started:.1f} с: {path} ({path.stat().st_size / 2**20:.0f} МБ)")
+
+
+if __name__ == '__main__':
+    main()
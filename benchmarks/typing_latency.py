@@ -0,0 +1,131 @@
+# typing_latency.py
+# Замер задержки «нажатие клавиши → отрисовка» в редакторе заметки с сотнями блоков.
+# Для каждой клавиши: отправка события нажатия, затем обработка событий до тех пор,
+# пока редактируемый блок не перерисован и его высота не пересчитана.
+#
+#   python benchmarks/typing_latency.py --blocks 500 --keys 400
+#   QT_QPA_PLATFORM=offscreen python benchmarks/typing_latency.py   # без окна
+#
+# Код возврата 1, если 95-й перцентиль превышает бюджет кадра (--budget-ms)
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from PyQt6.QtCore import QObject, QEvent, Qt
+from PyQt6.QtGui import QKeyEvent
+from PyQt6.QtWidgets import QApplication
+
+WORDS = "заметка текст абзац строка перенос редактор блок слово пример набор".split()
+
+
+# Синтетическая заметка: текстовые блоки разной длины (от одной строки до длинных абзацев с переносами)
+def make_content(blocks: int, seed: int = 1):
+    rnd = random.Random(seed)
+    content = []
+    for _ in range(blocks):
+        paragraphs = [
+            ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(3, 120)))
+            for _ in range(rnd.randint(1, 4))
+        ]
+        content.append({'type': 'text', 'content': '\n'.join(paragraphs)})
+    return content
+
+
+# Отметки времени отрисовки виджета
+class PaintProbe(QObject):
+    def __init__(self):
+        super().__init__()
+        self.last_paint = 0.0
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint:
+            self.last_paint = time.perf_counter()
+        return False
+
+
+# Нажатие и отпускание клавиши с текстом ch (события доставляются напрямую виджету)
+def type_key(widget, ch: str):
+    key = Qt.Key.Key_Return if ch == '\n' else Qt.Key.Key_unknown
+    text = '\r' if ch == '\n' else ch
+    for kind in (QEvent.Type.KeyPress, QEvent.Type.KeyRelease):
+        QApplication.sendEvent(widget, QKeyEvent(kind, key, Qt.KeyboardModifier.NoModifier, text))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Задержка набора текста в NoteEditor')
+    parser.add_argument('--blocks', type=int, default=300, help='число блоков в заметке')
+    parser.add_argument('--keys', type=int, default=300, help='число нажатий клавиш')
+    parser.add_argument('--budget-ms', type=float, default=16.0, help='бюджет на одно нажатие, мс')
+    parser.add_argument('--timeout-ms', type=float, default=1000.0, help='предельное ожидание отрисовки, мс')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    from models import Note, User
+    from ui.shell import MainWindow
+
+    # редактор открывается так же, как в приложении: в главном окне, после входа
+    win = MainWindow()
+    win.user = User('bench', '', 0)
+    for _ in range(10):
+        app.processEvents()
+    started = time.perf_counter()
+    win.open_note(Note(0, 'bench', make_content(args.blocks)))
+    editor = win.stack.currentWidget()
+    for _ in range(10):
+        app.processEvents()
+    opened_ms = (time.perf_counter() - started) * 1000
+
+    # печатаем в середину видимой части заметки, в конец блока
+    te = editor._live[len(editor._live) // 2].widget
+    win.activateWindow()
+    app.processEvents()
+    te.setFocus()
+    te.moveCursor(te.textCursor().MoveOperation.End)
+    probe = PaintProbe()
+    te.viewport().installEventFilter(probe)
+    app.processEvents()
+
+    rnd = random.Random(2)
+    text = ' '.join(rnd.choice(WORDS) for _ in range(args.keys))
+    latencies, relayouts = [], 0
+    for i in range(args.keys):
+        # время от времени — новая строка: меняется число строк и высота блока
+        ch = '\n' if i % 60 == 59 else text[i]
+        height = te.height()
+        t0 = time.perf_counter()
+        type_key(te, ch)
+        deadline = t0 + args.timeout_ms / 1000
+        while time.perf_counter() < deadline:
+            app.processEvents()
+            if probe.last_paint >= t0 and not te._adjust_pending:
+                break
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if te.height() != height:
+            relayouts += 1
+
+    over = sum(1 for v in latencies if v > args.budget_ms)
+    p95 = percentile(latencies, 95)
+    print(f"Блоков: {args.blocks}, живых виджетов: {len(editor._live)}, открытие: {opened_ms:.1f} мс")
+    print(f"Нажатий: {len(latencies)}, из них с изменением высоты блока: {relayouts}")
+    print(
+        f"Задержка, мс: p50={percentile(latencies, 50):.2f} p95={p95:.2f} "
+        f"p99={percentile(latencies, 99):.2f} max={max(latencies):.2f}"
+    )
+    print(f"Дольше {args.budget_ms:g} мс: {over}")
+    print('OK' if p95 <= args.budget_ms else 'ПРЕВЫШЕН БЮДЖЕТ')
+    win.close()
+    return 0 if p95 <= args.budget_ms else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,500 @@
+# data_transfer.py
+# Потоковый экспорт и импорт данных пользователя: заметки (с блоками), напоминания и AI-запросы.
+# Формат — JSONL: первая строка — заголовок, дальше по одной записи на строку. Архив .zip содержит
+# тот же records.jsonl и файлы изображений заметок (images/<хэш>.<расширение>); в .jsonl
+# изображения не входят, блоки ссылаются на файлы хранилища этой же установки.
+# Записи читаются и пишутся генераторами: в памяти только текущая пачка из BATCH_SIZE записей.
+# Импорт пишет пачку одной транзакцией через executemany и отмечает её записи в imported_records
+# (uid записи вместе с ID созданной строки), поэтому прерванный импорт продолжается с места
+# остановки, а повторный не создаёт дубликатов. Запись, строка которой с тех пор удалена,
+# при повторном импорте восстанавливается. uid — идентификатор установки-источника из заголовка,
+# вид записи и её ID в источнике; у файлов версии 1 (без ID) — хэш содержимого.
+#
+#   python data_transfer.py export USERNAME backup.zip
+#   python data_transfer.py import USERNAME backup.zip
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from db import get_conn, transaction
+
+FORMAT = 'ai-noter-export'
+VERSION = 2
+# Записей в одной транзакции импорта
+BATCH_SIZE = 1000
+RECORDS_NAME = 'records.jsonl'
+IMAGES_PREFIX = 'images/'
+KINDS = ('note', 'reminder', 'ai_request')
+
+
+# Идентификатор записи для журнала импорта: установка-источник (source из заголовка), вид записи
+# и её ID в источнике. Для записей без ID (формат версии 1) — хэш содержимого, см. content_uid
+def record_uid(record: dict, source=None):
+    row_id = record.get('id') if isinstance(record, dict) else None
+    if not source or not isinstance(row_id, int) or isinstance(row_id, bool):
+        return None
+    return f"{source}:{record.get('kind')}:{row_id}"
+
+
+# SHA-256 содержимого записи. Изображения учитываются по имени файла (это хэш содержимого),
+# поэтому запись из .zip и из .jsonl получает один uid
+def content_uid(record: dict) -> str:
+    if isinstance(record, dict) and isinstance(record.get('blocks'), list):
+        blocks = []
+        for b in record['blocks']:
+            if isinstance(b, dict) and b.get('type') == 'image':
+                b = dict(b, content=Path(str(b.get('content') or '')).name)
+            blocks.append(b)
+        record = dict(record, blocks=blocks)
+    raw = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# Идентификатор этой установки (миграция 13)
+def install_id(conn) -> str:
+    return conn.execute("SELECT value FROM app_meta WHERE key = 'installID'").fetchone()[0]
+
+
+# Записи пользователя для экспорта (id — ID строки в этой установке). Блоки заметок читаются одним курсором параллельно
+# с заметками (обе выборки упорядочены по noteID), без отдельного запроса на каждую заметку
+def iter_records(user_id: int):
+    conn = get_conn()
+    blocks = conn.execute(
+        'SELECT b.noteID, b.type, b.content FROM note_blocks b JOIN notes n ON n.noteID = b.noteID '
+        'WHERE n.userID = ? ORDER BY b.noteID, b.position',
+        (user_id,),
+    )
+    block = next(blocks, None)
+    notes = conn.execute(
+        'SELECT noteID, title, created, updated FROM notes WHERE userID = ? ORDER BY noteID', (user_id,)
+    )
+    for row in notes:
+        content = []
+        while block is not None and block['noteID'] <= row['noteID']:
+            if block['noteID'] == row['noteID']:
+                content.append({'type': block['type'], 'content': block['content'] or ''})
+            block = next(blocks, None)
+        yield {
+            'kind': 'note', 'id': row['noteID'], 'title': row['title'] or '', 'created': row['created'],
+            'updated': row['updated'], 'blocks': content,
+        }
+
+    for row in conn.execute(
+        'SELECT remindID, text, startTime, endTime, isDone FROM reminders WHERE userID = ? ORDER BY remindID', (user_id,)
+    ):
+        yield {
+            'kind': 'reminder', 'id': row['remindID'], 'text': row['text'] or '', 'startTime': row['startTime'],
+            'endTime': row['endTime'], 'isDone': row['isDone'] or 0,
+        }
+
+    for row in conn.execute(
+        'SELECT requestID, prompt, response, created FROM ai_requests WHERE userID = ? ORDER BY requestID', (user_id,)
+    ):
+        yield {'kind': 'ai_request', 'id': row['requestID'], 'prompt': row['prompt'] or '', 'response': row['response'] or '', 'created': row['created']}
+
+
+# Замена путей изображений на имена в архиве; images собирает имя в архиве -> путь к файлу.
+# Блок с отсутствующим файлом сохраняет исходный путь (импорт не превратит его в ссылку
+# на несуществующий файл хранилища), такие пути собираются в missing
+def _archive_images(records, images: dict, missing: set):
+    from paths import get_app_data_path
+
+    base = get_app_data_path()
+    for record in records:
+        if record['kind'] == 'note':
+            for b in record['blocks']:
+                if b['type'] != 'image' or not b['content'] or b['content'] in missing:
+                    continue
+                name = IMAGES_PREFIX + Path(b['content']).name
+                if name not in images:
+                    src = base / b['content']
+                    if not src.is_file():
+                        print(f"[data_transfer] Нет файла изображения {b['content']} (заметка «{record['title']}»)")
+                        missing.add(b['content'])
+                        continue
+                    images[name] = src
+                b['content'] = name
+        yield record
+
+
+# Запись заголовка и записей построчно; возвращает число записей каждого вида
+def _write_records(out, records, source: str, on_progress=None) -> dict:
+    counts = dict.fromkeys(KINDS, 0)
+    header = {'kind': 'header', 'format': FORMAT, 'version': VERSION, 'source': source,
+              'exported': datetime.utcnow().isoformat()}
+    out.write(json.dumps(header, ensure_ascii=False) + '\n')
+    for i, record in enumerate(records, 1):
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        counts[record['kind']] += 1
+        if on_progress is not None and i % BATCH_SIZE == 0:
+            on_progress(i)
+    return counts
+
+
+# Экспорт всех данных пользователя в path (.zip — с изображениями, иначе JSONL).
+# Выгрузка идёт из одного снимка БД; файл пишется под временным именем и подменяет path
+# только целиком. on_progress(число записей) вызывается после каждой пачки.
+# Для .zip в результате также число изображений и missing_images — пути отсутствующих файлов
+def export_user(user_id: int, path, on_progress=None) -> dict:
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    os.close(fd)
+    try:
+        with transaction() as conn:
+            source = install_id(conn)
+            if path.suffix.lower() == '.zip':
+                images, missing = {}, set()
+                with zipfile.ZipFile(tmp, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                    with io.TextIOWrapper(zf.open(RECORDS_NAME, 'w', force_zip64=True), encoding='utf-8') as out:
+                        records = _archive_images(iter_records(user_id), images, missing)
+                        counts = _write_records(out, records, source, on_progress)
+                    for name, src in images.items():
+                        # изображения уже сжаты — кладём без повторного сжатия
+                        zf.write(src, name, compress_type=zipfile.ZIP_STORED)
+                counts['images'] = len(images)
+                counts['missing_images'] = sorted(missing)
+            else:
+                with open(tmp, 'w', encoding='utf-8') as out:
+                    counts = _write_records(out, iter_records(user_id), source, on_progress)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return counts
+
+
+class _ZipImages:
+    # Изображения из архива: файл переносится в хранилище при первом обращении к нему
+    def __init__(self, zf):
+        self.zf = zf
+        self.names = set(zf.namelist())
+        # имя в архиве -> путь в хранилище
+        self.stored = {}
+
+    def store(self, name: str) -> str:
+        import image_store
+
+        rel = self.stored.get(name)
+        if rel is not None:
+            return rel
+        if name not in self.names:
+            print(f"[data_transfer] В архиве нет изображения {name}")
+            return name
+        fd, tmp = tempfile.mkstemp(suffix=Path(name).suffix)
+        try:
+            with os.fdopen(fd, 'wb') as out, self.zf.open(name) as src:
+                while True:
+                    chunk = src.read(image_store.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+            rel = image_store.store(tmp)
+        finally:
+            os.unlink(tmp)
+        self.stored[name] = rel
+        return rel
+
+
+# Время записи: ISO-строка или None (если поле необязательное); ValueError — некорректное значение
+def _iso(record: dict, field: str, required: bool = False):
+    value = record.get(field)
+    if value is None or value == '':
+        if required:
+            raise ValueError(f'нет поля {field}')
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f'{field} должно быть строкой ISO 8601, а не {value!r}')
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'некорректное время {field}: {value!r}')
+    return value
+
+
+# Флаг 0/1 (isDone): принимаются булево значение, 0/1 и строки '0'/'1'
+def _flag(record: dict, field: str) -> int:
+    value = record.get(field)
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int) and value in (0, 1):
+        return value
+    if isinstance(value, str) and value.strip() in ('0', '1'):
+        return int(value)
+    raise ValueError(f'некорректное значение {field}: {value!r}')
+
+
+# Необязательное текстовое поле
+def _text(record: dict, field: str) -> str:
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'{field} должно быть строкой, а не {value!r}')
+    return value
+
+
+# Проверка записи и приведение её к виду для вставки; ValueError — запись повреждена.
+# Изображения заметок остаются именами в архиве: в хранилище их переносит _store_images,
+# только для записей, которых ещё нет в БД
+def _prepare(record: dict):
+    kind = record.get('kind')
+    if kind == 'note':
+        blocks = record.get('blocks')
+        if not isinstance(blocks, list):
+            raise ValueError('у заметки нет списка блоков')
+        content = []
+        for b in blocks:
+            if not isinstance(b, dict) or b.get('type') not in ('text', 'image'):
+                raise ValueError('некорректный блок заметки')
+            content.append({'type': b['type'], 'content': str(b.get('content') or '')})
+        return {'kind': kind, 'title': str(record.get('title') or ''), 'created': _iso(record, 'created'),
+                'updated': _iso(record, 'updated'), 'content': content}
+    if kind == 'reminder':
+        return {'kind': kind, 'text': str(record.get('text') or ''), 'startTime': _iso(record, 'startTime', True),
+                'endTime': _iso(record, 'endTime'), 'isDone': _flag(record, 'isDone')}
+    if kind == 'ai_request':
+        prompt = record.get('prompt')
+        if not prompt or not isinstance(prompt, str):
+            raise ValueError('у AI-запроса нет текста запроса')
+        return {'kind': kind, 'prompt': prompt, 'response': _text(record, 'response'), 'created': _iso(record, 'created')}
+    raise ValueError(f'неизвестный вид записи {kind!r}')
+
+
+# Блоки заметки с изображениями из архива (ещё не перенесёнными в хранилище)
+def _archive_blocks(record: dict):
+    if record['kind'] != 'note':
+        return []
+    return [b for b in record['content'] if b['type'] == 'image' and b['content'].startswith(IMAGES_PREFIX)]
+
+
+# Перенос изображений заметок из архива в хранилище
+def _store_images(records, images):
+    for record in records:
+        for b in _archive_blocks(record):
+            b['content'] = images.store(b['content'])
+
+
+# Таблица и ключ строки для каждого вида записи
+TABLES = {'note': ('notes', 'noteID'), 'reminder': ('reminders', 'remindID'), 'ai_request': ('ai_requests', 'requestID')}
+
+
+# uid уже импортированных записей, строки которых ещё есть в БД: запись, удалённая после
+# импорта, при повторном импорте (восстановлении из копии) записывается снова.
+# Для записей журнала до миграции 12 строка неизвестна — они считаются импортированными
+def _done_uids(conn, user_id: int, uids) -> set:
+    if not uids:
+        return set()
+    done, rows = set(), {}
+    for row in conn.execute(
+        'SELECT uid, kind, rowID FROM imported_records WHERE userID = ? AND uid IN (SELECT value FROM json_each(?))',
+        (user_id, json.dumps(uids)),
+    ):
+        if row['kind'] is None:
+            done.add(row['uid'])
+        else:
+            rows.setdefault(row['kind'], {})[row['rowID']] = row['uid']
+    for kind, by_id in rows.items():
+        table, key = TABLES[kind]
+        # +userID: поиск по первичному ключу, а не перебор всех строк пользователя по индексу userID
+        alive = {
+            r[0] for r in conn.execute(
+                f'SELECT {key} FROM {table} WHERE +userID = ? AND {key} IN (SELECT value FROM json_each(?))',
+                (user_id, json.dumps(list(by_id))),
+            )
+        }
+        done.update(uid for row_id, uid in by_id.items() if row_id in alive)
+    return done
+
+
+# Записи, которых ещё нет в БД; запись, повторённая в файле с тем же uid, записывается один раз
+def _fresh(conn, user_id: int, prepared):
+    done = _done_uids(conn, user_id, list({uid for uid, _ in prepared}))
+    fresh = []
+    for uid, record in prepared:
+        if uid not in done:
+            done.add(uid)
+            fresh.append((uid, record))
+    return fresh
+
+
+# Первый свободный ID таблицы с AUTOINCREMENT (вызывается под блокировкой на запись)
+def _next_id(conn, table: str, key: str) -> int:
+    return conn.execute(
+        f'SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),'
+        f' COALESCE((SELECT MAX({key}) FROM {table}), 0)) + 1',
+        (table,),
+    ).fetchone()[0]
+
+
+# Запись одной пачки: всё, кроме уже импортированных записей, одной транзакцией.
+# source — установка-источник из заголовка файла; seen — сколько раз в файле уже встречался
+# каждый хэш содержимого (для записей без ID): одинаковые по содержимому записи получают
+# разные uid и не теряются, а uid каждой остаётся тем же при повторном импорте файла
+def _import_batch(user_id: int, batch, images, stats: dict, source=None, seen=None):
+    from models import Note
+
+    prepared = []
+    for line_no, record in batch:
+        try:
+            ready = _prepare(record)
+            uid = record_uid(record, source)
+            if uid is None:
+                uid = content_uid(record)
+                if seen is not None:
+                    n = seen[uid] = seen.get(uid, 0) + 1
+                    if n > 1:
+                        uid = f'{uid}:{n}'
+            prepared.append((uid, ready))
+        except (ValueError, AttributeError, TypeError) as e:
+            print(f"[data_transfer] Строка {line_no} пропущена: {e}")
+            stats['errors'] += 1
+
+    # изображения переносятся в хранилище до транзакции (копирование не держит блокировку
+    # на запись) и только для новых записей: повторный или продолженный импорт архива
+    # не распаковывает изображения уже импортированных заметок
+    if images is not None and any(_archive_blocks(r) for _, r in prepared):
+        _store_images([r for _, r in _fresh(get_conn(), user_id, prepared)], images)
+
+    now = datetime.utcnow().isoformat()
+    with transaction(immediate=True) as conn:
+        fresh = _fresh(conn, user_id, prepared)
+        stats['skipped'] += len(prepared) - len(fresh)
+        # ID строк назначаются заранее (блокировка на запись уже взята): заметки, их блоки
+        # и индексы вставляются пачками без lastrowid на каждую строку, а журнал импорта
+        # запоминает строку каждой записи
+        log_rows = []
+        ids = {kind: _next_id(conn, *TABLES[kind]) for kind in KINDS}
+        by_kind = {kind: [] for kind in KINDS}
+        for uid, record in fresh:
+            row_id = ids[record['kind']]
+            ids[record['kind']] += 1
+            by_kind[record['kind']].append((row_id, record))
+            log_rows.append((user_id, uid, record['kind'], row_id))
+
+        notes = by_kind['note']
+        if notes:
+            note_rows, block_rows, image_rows = [], [], []
+            for note_id, n in notes:
+                note_rows.append((note_id, user_id, n['title'], n['created'] or now, n['updated'] or n['created'] or now))
+                block_rows.extend(
+                    (note_id, (i + 1) * Note.BLOCK_GAP, b['type'], b['content']) for i, b in enumerate(n['content'])
+                )
+                image_rows.extend((path, note_id) for path in Note._image_paths(n['content']))
+            conn.executemany(
+                'INSERT INTO notes (noteID, userID, title, created, updated) VALUES (?, ?, ?, ?, ?)', note_rows
+            )
+            conn.executemany(
+                'INSERT INTO note_blocks (noteID, position, type, content) VALUES (?, ?, ?, ?)', block_rows
+            )
+            Note._index_new(conn, [row[0] for row in note_rows])
+            conn.executemany('INSERT INTO image_refs (path, noteID) VALUES (?, ?)', image_rows)
+
+        conn.executemany(
+            'INSERT INTO reminders (remindID, userID, text, startTime, endTime, isDone) VALUES (?, ?, ?, ?, ?, ?)',
+            [(row_id, user_id, r['text'], r['startTime'], r['endTime'], r['isDone']) for row_id, r in by_kind['reminder']],
+        )
+        # ai_requests_fts обновляют триггеры
+        conn.executemany(
+            'INSERT INTO ai_requests (requestID, userID, prompt, response, created) VALUES (?, ?, ?, ?, ?)',
+            [(row_id, user_id, r['prompt'], r['response'], r['created'] or now) for row_id, r in by_kind['ai_request']],
+        )
+        # запись удалённой после импорта строки заменяет прежнюю запись журнала
+        conn.executemany(
+            'INSERT OR REPLACE INTO imported_records (userID, uid, kind, rowID) VALUES (?, ?, ?, ?)', log_rows
+        )
+    for _, record in fresh:
+        stats[record['kind']] += 1
+
+
+# Строки файла экспорта как (номер строки, запись); первая строка — заголовок формата,
+# он сохраняется в header до выдачи первой записи
+def _iter_lines(lines, header: dict):
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if not header:
+            header.update(json.loads(line))
+            if header.get('kind') != 'header' or header.get('format') != FORMAT:
+                raise ValueError('файл не является экспортом AI Noter')
+            if header.get('version', 0) > VERSION:
+                raise ValueError(f"версия формата {header.get('version')} новее поддерживаемой ({VERSION})")
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError:
+            # повреждённая строка попадёт в ошибки при подготовке пачки
+            yield line_no, None
+
+
+# Импорт данных из path (.zip или JSONL) в аккаунт пользователя user_id.
+# Возвращает число добавленных записей каждого вида, пропущенных (уже импортированных) и ошибочных
+def import_user(user_id: int, path, on_progress=None) -> dict:
+    from models import Reminder
+
+    path = Path(path)
+    stats = dict.fromkeys(KINDS, 0)
+    stats.update(skipped=0, errors=0)
+
+    def run(lines, images):
+        header, seen = {}, {}
+        records = _iter_lines(lines, header)
+        processed = 0
+        while True:
+            batch = list(islice(records, BATCH_SIZE))
+            if not batch:
+                break
+            source = header.get('source')
+            _import_batch(user_id, batch, images, stats, source if isinstance(source, str) else None, seen)
+            processed += len(batch)
+            if on_progress is not None:
+                on_progress(processed)
+
+    if path.suffix.lower() == '.zip':
+        with zipfile.ZipFile(path) as zf, zf.open(RECORDS_NAME) as raw:
+            run(io.TextIOWrapper(raw, encoding='utf-8'), _ZipImages(zf))
+    else:
+        with open(path, encoding='utf-8') as f:
+            run(f, None)
+    if stats['reminder']:
+        # планировщик перевзведёт таймер с учётом новых напоминаний
+        Reminder._notify_changed(user_id)
+    return stats
+
+
+def main():
+    import argparse
+    from db import init_db
+
+    parser = argparse.ArgumentParser(description='Экспорт и импорт данных пользователя AI Noter')
+    parser.add_argument('command', choices=('export', 'import'))
+    parser.add_argument('username', help='имя пользователя')
+    parser.add_argument('path', help='файл .zip (с изображениями) или .jsonl')
+    args = parser.parse_args()
+
+    init_db()
+    row = get_conn().execute('SELECT userID FROM users WHERE username = ?', (args.username,)).fetchone()
+    if row is None:
+        print(f"Пользователь {args.username} не найден")
+        return 1
+    started = time.perf_counter()
+    progress = lambda n: print(f"  записей: {n}", end='\r', flush=True)
+    if args.command == 'export':
+        result = export_user(row['userID'], args.path, progress)
+    else:
+        result = import_user(row['userID'], args.path, progress)
+    print(f"{args.command}: {result}, {time.perf_counter() - started:.1f} с")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
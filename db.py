@@ -1,59 +1,181 @@
 # db.py
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 from paths import get_app_data_path
 
 # Путь к БД (работает в обычном проекте и в exe)
 DB_PATH = get_app_data_path() / 'ai_noter.db'
 
+# Сколько ждать снятия блокировки другим процессом/потоком, мс
+BUSY_TIMEOUT_MS = 5000
+# Размер кэша подготовленных выражений на одно подключение
+STATEMENT_CACHE_SIZE = 256
 
-# Получение подключения к базе данных SQLite с настройкой row_factory для доступа по именам колонок
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
+# Одно подключение на поток: sqlite3.Connection нельзя делить между потоками
+_local = threading.local()
+
+# Профилировщик SQL (sql_profiler.SqlProfiler) или None. Подключения потоков подхватывают его смену
+# при следующем get_conn по номеру поколения: в выключенном состоянии это одно сравнение чисел
+_profiler = None
+_profiler_generation = 0
+
+
+class _Connection(sqlite3.Connection):
+    # Подкласс ради __dict__ у подключения: профилировщик подменяет execute/executemany
+    # атрибутами экземпляра, а без профилировщика вызываются методы sqlite3.Connection напрямую
+    pass
+
+
+# Открытие нового подключения с настройкой режима журнала и прагм производительности
+def _open_conn():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,  # транзакциями управляем сами через transaction()
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=_Connection,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    # В режиме WAL NORMAL не теряет целостность, но не делает fsync на каждый коммит
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+# Получение подключения текущего потока (создаётся один раз и переиспользуется)
+def get_conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _open_conn()
+        _local.conn = conn
+        _local.depth = 0
+        _local.profiler = None
+        _local.profiler_generation = 0
+    if _local.profiler_generation != _profiler_generation:
+        _apply_profiler(conn)
     return conn
 
 
-# Инициализация базы данных: создание всех необходимых таблиц если они не существуют
+# Подключение обработчиков текущего профилировщика к подключению потока (и снятие прежних)
+def _apply_profiler(conn):
+    profiler = _profiler
+    if _local.profiler is not None:
+        _local.profiler.uninstall(conn)
+    if profiler is not None:
+        profiler.install(conn)
+    _local.profiler = profiler
+    _local.profiler_generation = _profiler_generation
+
+
+# Включение (profiler) или выключение (None) профилирования SQL для всех подключений
+def set_profiler(profiler):
+    global _profiler, _profiler_generation
+    _profiler = profiler
+    _profiler_generation += 1
+
+
+def get_profiler():
+    return _profiler
+
+
+# Закрытие подключения текущего потока (например, перед завершением рабочего потока)
+def close_conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.depth = 0
+        _local.profiler = None
+
+
+# Контекстный менеджер транзакции: COMMIT при успехе, ROLLBACK при исключении (в том числе
+# при ошибке самого COMMIT). Вложенные вызовы присоединяются к внешней транзакции.
+# immediate=True сразу берёт блокировку на запись (BEGIN IMMEDIATE)
+@contextmanager
+def transaction(immediate: bool = False):
+    conn = get_conn()
+    if _local.depth > 0:
+        _local.depth += 1
+        try:
+            yield conn
+        finally:
+            _local.depth -= 1
+        return
+
+    conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+    _local.depth = 1
+    _local.on_commit = []
+    _local.on_rollback = []
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        _local.depth = 0
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        _local.on_commit = []
+        _run_hooks(_local.on_rollback)
+        raise
+    else:
+        _local.depth = 0
+        _local.on_rollback = []
+        _run_hooks(_local.on_commit)
+
+
+# Точка сохранения внутри транзакции (если транзакции нет — открывается новая): при исключении
+# откатываются только изменения внутри блока, вместе с его отложенными действиями on_commit
+# и с вызовом его on_rollback; внешняя транзакция продолжается
+@contextmanager
+def savepoint(name: str = 'db_savepoint'):
+    with transaction() as conn:
+        commit_mark, rollback_mark = len(_local.on_commit), len(_local.on_rollback)
+        conn.execute(f'SAVEPOINT {name}')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute(f'ROLLBACK TO {name}')
+            conn.execute(f'RELEASE {name}')
+            del _local.on_commit[commit_mark:]
+            undo = _local.on_rollback[rollback_mark:]
+            del _local.on_rollback[rollback_mark:]
+            _run_hooks(undo)
+            raise
+        else:
+            conn.execute(f'RELEASE {name}')
+
+
+# Действие после фиксации текущей транзакции (самой внешней — вложенные не фиксируют);
+# вне транзакции выполняется сразу. Так объекты моделей принимают новое состояние (ID строк),
+# только когда оно действительно записано в БД
+def on_commit(fn):
+    if getattr(_local, 'depth', 0) > 0:
+        _local.on_commit.append(fn)
+    else:
+        fn()
+
+
+# Действие после отката текущей транзакции (или точки сохранения, внутри которой оно добавлено)
+def on_rollback(fn):
+    if getattr(_local, 'depth', 0) > 0:
+        _local.on_rollback.append(fn)
+
+
+# Выполнение отложенных действий: ошибка одного не отменяет остальные и не меняет исход транзакции
+def _run_hooks(hooks):
+    for fn in hooks:
+        try:
+            fn()
+        except Exception as e:
+            print(f"[db] Ошибка в действии после транзакции: {e}")
+
+
+# Инициализация базы данных: создание таблиц и применение новых миграций схемы
 def init_db():
+    from migrations import apply_migrations
+
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.executescript('''
-    CREATE TABLE IF NOT EXISTS users (
-        userID INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL
-    );
-
-    CREATE TABLE IF NOT EXISTS notes (
-        noteID INTEGER PRIMARY KEY AUTOINCREMENT,
-        userID INTEGER NOT NULL,
-        title TEXT,
-        content TEXT,
-        created TEXT,
-        updated TEXT,
-        FOREIGN KEY(userID) REFERENCES users(userID)
-    );
-
-    CREATE TABLE IF NOT EXISTS reminders (
-        remindID INTEGER PRIMARY KEY AUTOINCREMENT,
-        userID INTEGER NOT NULL,
-        text TEXT,
-        startTime TEXT,
-        endTime TEXT,
-        isDone INTEGER DEFAULT 0,
-        FOREIGN KEY(userID) REFERENCES users(userID)
-    );
-
-    CREATE TABLE IF NOT EXISTS ai_requests (
-        requestID INTEGER PRIMARY KEY AUTOINCREMENT,
-        userID INTEGER NOT NULL,
-        prompt TEXT,
-        response TEXT,
-        created TEXT,
-        FOREIGN KEY(userID) REFERENCES users(userID)
-    );
-    ''')
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    apply_migrations(get_conn())
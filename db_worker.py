@@ -0,0 +1,139 @@
+# db_worker.py
+# Отдельный поток для работы с БД: запросы ставятся в очередь, результат возвращается через
+# concurrent.futures.Future (для интерфейса — через ui/db_async.py, с доставкой в поток Qt).
+# Подряд стоящие в очереди записи выполняются одной транзакцией (групповой коммит):
+# каждая — в своей точке сохранения, так что ошибка одной записи не откатывает остальные
+import queue
+import threading
+from concurrent.futures import Future
+from db import close_conn, savepoint, transaction
+
+# Сколько записей из очереди можно объединить в один коммит
+GROUP_COMMIT_MAX = 64
+# Метка остановки потока в очереди
+_STOP = object()
+
+
+class DBWorker:
+    def __init__(self, group_max: int = GROUP_COMMIT_MAX):
+        self.group_max = group_max
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # Запуск потока (повторный вызов ничего не делает)
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='db-worker', daemon=True)
+                self._thread.start()
+
+    # Постановка вызова fn(*args, **kwargs) в очередь потока БД.
+    # write=True — вызов меняет данные и может быть объединён с соседними записями в один коммит
+    def submit(self, fn, *args, write: bool = False, **kwargs) -> Future:
+        future = Future()
+        self._queue.put((fn, args, kwargs, future, write))
+        self.start()
+        return future
+
+    # Остановка потока после выполнения всего, что уже стоит в очереди
+    def stop(self, timeout: float = None):
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        try:
+            job = self._queue.get()
+            while job is not _STOP:
+                if not job[4]:
+                    self._execute(job)
+                    job = self._queue.get()
+                    continue
+                # к записи присоединяем следующие записи, уже ожидающие в очереди
+                batch, job = [job], None
+                while len(batch) < self.group_max:
+                    try:
+                        nxt = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if nxt is _STOP or not nxt[4]:
+                        job = nxt
+                        break
+                    batch.append(nxt)
+                self._commit_group(batch)
+                if job is None:
+                    job = self._queue.get()
+        finally:
+            close_conn()
+
+    # Выполнение чтения. KeyboardInterrupt / SystemExit отдаются в future и пробрасываются дальше
+    def _execute(self, job):
+        fn, args, kwargs, future, _ = job
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            future.set_result(result)
+
+    # Выполнение группы записей одной транзакцией; результаты отдаются только после COMMIT.
+    # Действия db.on_commit записей (новые ID в объектах моделей) выполняются после COMMIT группы,
+    # у откаченной записи — отбрасываются вместе с её изменениями.
+    # KeyboardInterrupt / SystemExit из записи откатывают только её; исключение пробрасывается
+    # (и останавливает поток), когда у всех записей группы уже есть результат
+    def _commit_group(self, batch):
+        done = []
+        fatal = None
+        try:
+            with transaction(immediate=True):
+                for fn, args, kwargs, future, _ in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    try:
+                        with savepoint('db_worker_job'):
+                            result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        done.append((future, None, e))
+                        if fatal is None and not isinstance(e, Exception):
+                            fatal = e
+                    else:
+                        done.append((future, result, None))
+        except BaseException as e:
+            # не удалось начать или зафиксировать транзакцию — ни одна запись группы не сохранена
+            for fn, args, kwargs, future, _ in batch:
+                if future.running():
+                    future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            if fatal is not None:
+                raise fatal
+            return
+        for future, result, error in done:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if fatal is not None:
+            raise fatal
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+# Общий поток БД процесса (создаётся при первом обращении)
+def get_worker() -> DBWorker:
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = DBWorker()
+    return _worker
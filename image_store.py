@@ -0,0 +1,185 @@
+# image_store.py
+# Контентно-адресуемое хранилище изображений заметок: файл хранится один раз под именем
+# SHA-256 своего содержимого (storage/images/ab/abcdef....jpg), сколько бы заметок на него ни ссылалось.
+# Ссылки заметок на изображения ведутся в таблице image_refs (см. Note.save);
+# файлы без ссылок удаляет collect_garbage(). Миниатюры (storage/thumbs, см. ui/image_loader.py)
+# названы тем же хэшем: сборщик удаляет миниатюры удалённых изображений и держит кэш
+# в пределах THUMB_CACHE_MB
+import hashlib
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from paths import get_app_data_path
+
+IMAGE_DIR = get_app_data_path() / "storage" / "images"
+THUMB_DIR = get_app_data_path() / "storage" / "thumbs"
+CHUNK_SIZE = 1024 * 1024
+# Файлы моложе этого срока сборщик мусора не трогает: ссылка на только что
+# сохранённое изображение появляется в БД чуть позже самого файла
+GC_GRACE_SECONDS = 3600
+
+_STORE_NAME = re.compile(r'^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$')
+
+
+# SHA-256 файла, читаемого потоково (без загрузки целиком в память)
+def file_hash(path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Относительный путь (от папки данных приложения), под которым заметки ссылаются на файл
+def relative_path(path) -> str:
+    return Path(path).relative_to(get_app_data_path()).as_posix()
+
+
+# Лежит ли файл по относительному пути в хранилище (имя — хэш содержимого)
+def is_store_path(rel: str) -> bool:
+    parts = Path(rel).parts
+    return (
+        len(parts) >= 2 and _STORE_NAME.match(parts[-1]) is not None
+        and parts[-1].startswith(parts[-2])
+    )
+
+
+# Путь к миниатюре изображения хранилища path для корзины ширины bucket: ключ — хэш содержимого
+# из имени файла, поэтому копии того же изображения делят одну миниатюру.
+# None — файл не из хранилища, миниатюра для него не кэшируется
+def thumb_path(path, bucket: int):
+    if not is_store_path(str(path)):
+        return None
+    digest = Path(path).name[:64]
+    return THUMB_DIR / digest[:2] / f"{digest}_{bucket}.png"
+
+
+# Помещение файла в хранилище; возвращает относительный путь для content заметки.
+# Если такое содержимое уже хранится, файл не копируется повторно
+def store(src) -> str:
+    src = Path(src)
+    digest = file_hash(src)
+    ext = src.suffix.lower()
+    dest = IMAGE_DIR / digest[:2] / f"{digest}{ext}"
+    if dest.exists():
+        # обновляем mtime, чтобы сборщик мусора не удалил файл до сохранения ссылки на него
+        try:
+            os.utime(dest)
+        except OSError:
+            pass
+        return relative_path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # копия во временный файл и атомарное переименование: недописанный файл не попадёт в хранилище
+    tmp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dest)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return relative_path(dest)
+
+
+# Удаление пустых каталогов-корзин после удаления файлов
+def _remove_empty_dirs(root: Path):
+    for sub in root.iterdir():
+        if sub.is_dir():
+            try:
+                sub.rmdir()
+            except OSError:
+                pass
+
+
+# Удаление файлов из storage/images, на которые не ссылается ни одна заметка, и миниатюр
+# (см. _collect_thumbs). thumb_max_bytes — предел размера кэша миниатюр (по умолчанию THUMB_CACHE_MB).
+# Возвращает (число удалённых файлов, освобождено байт)
+def collect_garbage(grace_seconds: float = GC_GRACE_SECONDS, thumb_max_bytes: int = None):
+    from db import get_conn
+
+    if thumb_max_bytes is None:
+        import settings
+        thumb_max_bytes = settings.get().thumb_cache_mb * 1024 * 1024
+    cutoff = time.time() - grace_seconds
+    deleted = freed = 0
+    # хэши изображений, оставшихся в хранилище
+    alive = set()
+    if IMAGE_DIR.exists():
+        referenced = {row[0] for row in get_conn().execute('SELECT DISTINCT path FROM image_refs')}
+        for path in IMAGE_DIR.rglob('*'):
+            if not path.is_file():
+                continue
+            try:
+                st = path.stat()
+                if st.st_mtime > cutoff or relative_path(path) in referenced:
+                    alive.add(path.name[:64])
+                    continue
+                path.unlink()
+            except OSError:
+                continue
+            deleted += 1
+            freed += st.st_size
+        _remove_empty_dirs(IMAGE_DIR)
+    n, size = _collect_thumbs(alive, cutoff, thumb_max_bytes)
+    return deleted + n, freed + size
+
+
+# Миниатюры: удаляются миниатюры изображений, которых больше нет в хранилище (и файлы старой
+# схемы имён), затем самые давно использованные, пока кэш больше max_bytes.
+# Незавершённые временные файлы удаляются, если они старше cutoff
+def _collect_thumbs(alive: set, cutoff: float, max_bytes: int):
+    if not THUMB_DIR.exists():
+        return 0, 0
+    deleted = freed = 0
+    kept = []
+    for path in THUMB_DIR.rglob('*'):
+        if not path.is_file():
+            continue
+        try:
+            st = path.stat()
+            if path.name.endswith('.tmp.png'):
+                stale = st.st_mtime <= cutoff
+            else:
+                stale = path.name.split('_', 1)[0] not in alive
+            if not stale:
+                kept.append((st.st_mtime, st.st_size, path))
+                continue
+            path.unlink()
+        except OSError:
+            continue
+        deleted += 1
+        freed += st.st_size
+    total = sum(size for _, size, _ in kept)
+    # время изменения миниатюры обновляется при каждом чтении из кэша (см. ui/image_loader.py)
+    kept.sort(key=lambda item: item[0])
+    for mtime, size, path in kept:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+        freed += size
+    _remove_empty_dirs(THUMB_DIR)
+    return deleted, freed
+
+
+# Запуск сборки мусора в фоновом потоке (при старте приложения)
+def start_background_gc():
+    import threading
+    from db import close_conn
+
+    def run():
+        try:
+            deleted, freed = collect_garbage()
+            if deleted:
+                print(f"[image_store] Удалено неиспользуемых изображений и миниатюр: {deleted} ({freed // 1024} КБ)")
+        except Exception as e:
+            print(f"[image_store] Ошибка сборки мусора: {e}")
+        finally:
+            close_conn()
+
+    threading.Thread(target=run, daemon=True).start()
@@ -1,19 +1,134 @@
 # main.py
 import sys
-from PyQt6.QtWidgets import QApplication
-from db import init_db
-from ui.login import LoginWindow
+# профиль старта импортируется первым: отсчёт времени и замер импортов начинаются с него
+import startup_profile
 
+# Модули, не нужные окну входа: импортируются в фоновом потоке после его первой отрисовки,
+# чтобы вход и первые переходы по меню не ждали импорта (мультимедиа, сеть, остальные окна)
+WARMUP_MODULES = (
+    'ui.db_async',
+    'ui.main_menu',
+    'reminder_watcher',
+    'PyQt6.QtMultimedia',
+    'ui.notes_list',
+    'ui.note_editor',
+    'ui.reminders_list',
+    'ui.reminder_editor',
+    'ui.ai_list',
+    'ui.ai_request',
+    'settings',
+    'dotenv',
+    'requests',
+)
+
+
+# Разбор аргументов командной строки; неизвестные аргументы остаются для Qt
+def _parse_args():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='AI Noter')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='замерить время импортов и запуска до готовности окна входа')
+    parser.add_argument('--profile-output', metavar='PATH', help='сохранить профиль старта в JSON')
+    parser.add_argument('--profile-quit', action='store_true',
+                        help='выйти сразу после замера (для benchmarks/startup_time.py)')
+    parser.add_argument('--profile-sql', action='store_true',
+                        help='записывать статистику SQL-запросов с запуска (окно Ctrl+Shift+D), при выходе — в sql_profile.json')
+    parser.add_argument('--sql-slow-ms', type=float, default=50.0, metavar='MS',
+                        help='порог журнала медленных запросов sql_slow.log, мс')
+    parser.add_argument('--sql-log-params', action='store_true',
+                        help='записывать в sql_slow.log значения параметров запросов (пароли, тексты заметок); '
+                             'без флага — только их типы')
+    return parser.parse_known_args()
+
+
+# Фоновая предзагрузка модулей из WARMUP_MODULES
+def _warm_up():
+    import importlib
+    import threading
+
+    def run():
+        for name in WARMUP_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                # например, нет системных библиотек звука — напоминания покажутся без звука
+                print(f"[startup] Не удалось предзагрузить {name}: {e}")
+        startup_profile.mark('фоновая предзагрузка завершена')
+        if startup_profile.is_enabled():
+            print(f"[startup] Фоновая предзагрузка завершена: {startup_profile.report()['marks'][-1]['ms']} мс")
+
+    threading.Thread(target=run, name='warm-up', daemon=True).start()
+
+
+# Остановка потока БД (если он запускался) с записью всего, что стоит в очереди
+def _shutdown_db():
+    from ui import db_async
+    db_async.shutdown()
+
+
+# Остановка очереди AI-запросов (если она создавалась): невыполненные задания
+# останутся в БД и продолжатся после следующего входа пользователя
+def _shutdown_ai_queue():
+    import ai_queue
+    ai_queue.shutdown()
+
+
+# Сохранение статистики SQL при выходе (--profile-sql)
+def _dump_sql_profile():
+    import sql_profiler
+    from paths import get_app_data_path
+    path = get_app_data_path() / 'sql_profile.json'
+    sql_profiler.get().dump(path)
+    print(f"[sql] Статистика запросов сохранена: {path}")
 
 
 # Инициализация приложения: создание базы данных и запуск окна входа
 def main():
+    args, qt_args = _parse_args()
+    if args.profile_startup:
+        startup_profile.enable()
+
+    from PyQt6.QtWidgets import QApplication
+    from db import init_db
+    from ui.shell import MainWindow
+    startup_profile.mark('импорт модулей окна входа')
+
+    if args.profile_sql:
+        # до init_db: в статистику попадают и миграции
+        import sql_profiler
+        sql_profiler.enable(args.sql_slow_ms, log_params=args.sql_log_params)
     init_db()
-    app = QApplication(sys.argv)
-    win = LoginWindow()
-    win.show()
+    startup_profile.mark('инициализация БД')
+    app = QApplication(sys.argv[:1] + qt_args)
+    # при выходе останавливаем очередь AI-запросов и дожидаемся записи всего,
+    # что уже поставлено в очередь потока БД
+    app.aboutToQuit.connect(_shutdown_ai_queue)
+    app.aboutToQuit.connect(_shutdown_db)
+    if args.profile_sql:
+        app.aboutToQuit.connect(_dump_sql_profile)
+    startup_profile.mark('создание QApplication')
+    win = MainWindow()
+    startup_profile.mark('создание окна входа')
+
+    # после первой отрисовки: сборка мусора в хранилище изображений, размер кэша уменьшенных
+    # изображений из настроек и предзагрузка модулей (AI-запросы прошлого запуска продолжаются
+    # после входа пользователя, см. MainWindow.sign_in)
+    def on_interactive():
+        from PyQt6.QtGui import QPixmapCache
+        from image_store import start_background_gc
+        import settings
+        start_background_gc()
+        QPixmapCache.setCacheLimit(settings.get().pixmap_cache_kb)
+        _warm_up()
+        if args.profile_startup:
+            startup_profile.dump(args.profile_output)
+            if args.profile_quit:
+                app.quit()
+
+    startup_profile.watch_first_paint(win, on_interactive)
     sys.exit(app.exec())
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
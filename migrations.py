@@ -0,0 +1,366 @@
+# migrations.py
+# Версионированные миграции схемы БД.
+# Каждая миграция — (версия, описание, шаги); шаг — SQL-строка или функция fn(conn).
+# Номер последней применённой миграции хранится в таблице schema_version,
+# поэтому при запуске выполняются только новые шаги, каждая миграция — в своей транзакции.
+# Новые миграции добавляются только в конец списка, уже выпущенные не редактируются.
+import json
+from datetime import datetime
+from db import transaction
+
+
+# Заполнение notes_fts (схема миграции 4: заголовок и весь текст заметки) для уже существующих заметок
+def _backfill_notes_fts(conn):
+    rows = conn.execute('SELECT noteID, userID, title, content FROM notes').fetchall()
+    for row in rows:
+        try:
+            content = json.loads(row['content'] or '[]')
+        except (json.JSONDecodeError, TypeError):
+            content = []
+        body = '\n'.join(
+            b.get('content', '') for b in content
+            if isinstance(b, dict) and b.get('type') == 'text'
+        )
+        conn.execute(
+            'INSERT INTO notes_fts (rowid, title, body, userID) VALUES (?, ?, ?, ?)',
+            (row['noteID'], row['title'] or '', body, row['userID']),
+        )
+
+
+# Шаг ключей порядка блоков в миграции 8 (как Note.BLOCK_GAP на момент миграции).
+# Миграции не используют код моделей: его последующие изменения не должны менять
+# то, как обновляются старые базы
+_BLOCK_GAP_V8 = 1024.0
+
+
+# Ссылки заметки на изображения в image_refs (схема миграции 7)
+def _index_images_v7(conn, note_id: int, content):
+    paths = {
+        b.get('content') for b in content
+        if isinstance(b, dict) and b.get('type') == 'image' and b.get('content')
+    }
+    conn.execute('DELETE FROM image_refs WHERE noteID = ?', (note_id,))
+    conn.executemany('INSERT INTO image_refs (path, noteID) VALUES (?, ?)', [(path, note_id) for path in paths])
+
+
+# Перенос изображений заметок в хранилище по хэшу и заполнение image_refs.
+# Старые файлы не удаляются здесь: их уберёт сборщик мусора после фиксации миграции
+def _migrate_images_to_store(conn):
+    import image_store
+    from paths import get_app_data_path
+
+    base = get_app_data_path()
+    rows = conn.execute('SELECT noteID, content FROM notes').fetchall()
+    for row in rows:
+        try:
+            content = json.loads(row['content'] or '[]')
+        except (json.JSONDecodeError, TypeError):
+            continue
+        changed = False
+        for block in content:
+            if not isinstance(block, dict) or block.get('type') != 'image':
+                continue
+            rel = block.get('content') or ''
+            if not rel or image_store.is_store_path(rel):
+                continue
+            src = base / rel
+            if not src.is_file():
+                continue
+            try:
+                block['content'] = image_store.store(src)
+                changed = True
+            except OSError as e:
+                print(f"Не удалось перенести изображение {rel}: {e}")
+        if changed:
+            conn.execute(
+                'UPDATE notes SET content = ? WHERE noteID = ?',
+                (json.dumps(content, ensure_ascii=False), row['noteID']),
+            )
+        _index_images_v7(conn, row['noteID'], content)
+
+
+# Перенос содержимого заметок из JSON-колонки notes.content в таблицу блоков note_blocks.
+# Колонка очищается только у успешно разобранных заметок
+def _migrate_content_to_blocks(conn):
+    rows = conn.execute('SELECT noteID, content FROM notes WHERE content IS NOT NULL').fetchall()
+    for row in rows:
+        try:
+            content = json.loads(row['content'] or '[]')
+        except (json.JSONDecodeError, TypeError) as e:
+            print(f"Ошибка парсинга JSON для заметки {row['noteID']}: {e}")
+            continue
+        blocks = [b for b in content if isinstance(b, dict)]
+        conn.executemany(
+            'INSERT INTO note_blocks (noteID, position, type, content) VALUES (?, ?, ?, ?)',
+            [
+                (row['noteID'], (i + 1) * _BLOCK_GAP_V8, b.get('type') or 'text', b.get('content') or '')
+                for i, b in enumerate(blocks)
+            ],
+        )
+        conn.execute('UPDATE notes SET content = NULL WHERE noteID = ?', (row['noteID'],))
+
+
+# Случайный идентификатор установки (app_meta.installID)
+def _create_install_id(conn):
+    import uuid
+
+    conn.execute("INSERT OR IGNORE INTO app_meta (key, value) VALUES ('installID', ?)", (uuid.uuid4().hex,))
+
+
+MIGRATIONS = [
+    (1, 'Базовые таблицы', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            userID INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS notes (
+            noteID INTEGER PRIMARY KEY AUTOINCREMENT,
+            userID INTEGER NOT NULL,
+            title TEXT,
+            content TEXT,
+            created TEXT,
+            updated TEXT,
+            FOREIGN KEY(userID) REFERENCES users(userID)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reminders (
+            remindID INTEGER PRIMARY KEY AUTOINCREMENT,
+            userID INTEGER NOT NULL,
+            text TEXT,
+            startTime TEXT,
+            endTime TEXT,
+            isDone INTEGER DEFAULT 0,
+            FOREIGN KEY(userID) REFERENCES users(userID)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS ai_requests (
+            requestID INTEGER PRIMARY KEY AUTOINCREMENT,
+            userID INTEGER NOT NULL,
+            prompt TEXT,
+            response TEXT,
+            created TEXT,
+            FOREIGN KEY(userID) REFERENCES users(userID)
+        )
+        ''',
+    ]),
+    # Покрывающие индексы под списки и планировщик: выборка по userID
+    # идёт сразу в нужном порядке без сортировки и без чтения самой таблицы
+    (2, 'Индексы для списков и планировщика', [
+        # User.get_notes_list: WHERE userID = ? ORDER BY created DESC -> noteID, title
+        'CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(userID, created DESC, title)',
+        # User.get_ai_history: WHERE userID = ? ORDER BY created DESC -> requestID, prompt
+        'CREATE INDEX IF NOT EXISTS idx_ai_requests_user_created ON ai_requests(userID, created DESC, prompt)',
+        # User.get_reminders_list и ReminderScheduler: WHERE userID = ? [AND startTime <= ?] ORDER BY startTime
+        'CREATE INDEX IF NOT EXISTS idx_reminders_user_start ON reminders(userID, startTime, text)',
+        'ANALYZE',
+    ]),
+    # Захват сработавших напоминаний с арендой: claimedBy — владелец (процесс),
+    # claimedUntil — до какого момента захват действителен
+    (3, 'Аренда напоминаний для нескольких экземпляров', [
+        'ALTER TABLE reminders ADD COLUMN claimedBy TEXT',
+        'ALTER TABLE reminders ADD COLUMN claimedUntil TEXT',
+        'CREATE INDEX IF NOT EXISTS idx_reminders_pending ON reminders(userID, startTime, text) WHERE claimedBy IS NULL',
+        'CREATE INDEX IF NOT EXISTS idx_reminders_claimed ON reminders(userID, claimedUntil) WHERE claimedBy IS NOT NULL',
+    ]),
+    # Полнотекстовый поиск. notes_fts ведёт Note.save/delete (текст блоков лежит в JSON),
+    # ai_requests_fts — индекс над самой таблицей ai_requests, его поддерживают триггеры
+    (4, 'Полнотекстовый поиск FTS5', [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            title, body, userID UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        _backfill_notes_fts,
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS ai_requests_fts USING fts5(
+            prompt, response, userID UNINDEXED,
+            content = 'ai_requests', content_rowid = 'requestID',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ai_requests_fts_ai AFTER INSERT ON ai_requests BEGIN
+            INSERT INTO ai_requests_fts(rowid, prompt, response, userID)
+            VALUES (new.requestID, new.prompt, new.response, new.userID);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ai_requests_fts_ad AFTER DELETE ON ai_requests BEGIN
+            INSERT INTO ai_requests_fts(ai_requests_fts, rowid, prompt, response, userID)
+            VALUES ('delete', old.requestID, old.prompt, old.response, old.userID);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS ai_requests_fts_au AFTER UPDATE OF prompt, response ON ai_requests BEGIN
+            INSERT INTO ai_requests_fts(ai_requests_fts, rowid, prompt, response, userID)
+            VALUES ('delete', old.requestID, old.prompt, old.response, old.userID);
+            INSERT INTO ai_requests_fts(rowid, prompt, response, userID)
+            VALUES (new.requestID, new.prompt, new.response, new.userID);
+        END
+        ''',
+        "INSERT INTO ai_requests_fts(ai_requests_fts) VALUES ('rebuild')",
+    ]),
+    # Постраничная (keyset) выборка списков: в индекс добавлен ID как второй ключ сортировки,
+    # чтобы продолжение страницы (created, ID) < (?, ?) шло поиском по индексу без OFFSET
+    (5, 'Индексы для постраничной загрузки списков', [
+        'DROP INDEX IF EXISTS idx_notes_user_created',
+        'CREATE INDEX IF NOT EXISTS idx_notes_user_page ON notes(userID, created DESC, noteID DESC, title)',
+        'DROP INDEX IF EXISTS idx_ai_requests_user_created',
+        'CREATE INDEX IF NOT EXISTS idx_ai_requests_user_page ON ai_requests(userID, created DESC, requestID DESC, prompt)',
+        'DROP INDEX IF EXISTS idx_reminders_user_start',
+        'CREATE INDEX IF NOT EXISTS idx_reminders_user_page ON reminders(userID, startTime, remindID, text)',
+        'ANALYZE',
+    ]),
+    # Кэш ответов AI: ключ — хэш модели, параметров генерации и нормализованного промпта
+    (6, 'Кэш ответов AI', [
+        '''
+        CREATE TABLE IF NOT EXISTS ai_cache (
+            key TEXT PRIMARY KEY,
+            response TEXT NOT NULL,
+            created REAL NOT NULL,
+            lastUsed REAL NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache(lastUsed)',
+    ]),
+    # Контентно-адресуемое хранилище изображений: индекс ссылок заметок на файлы
+    # и перенос старых storage/images/{mtime}_{имя} в хранилище по SHA-256
+    (7, 'Хранилище изображений по хэшу содержимого', [
+        '''
+        CREATE TABLE IF NOT EXISTS image_refs (
+            path TEXT NOT NULL,
+            noteID INTEGER NOT NULL,
+            PRIMARY KEY (path, noteID)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_image_refs_note ON image_refs(noteID)',
+        _migrate_images_to_store,
+    ]),
+    # Блочное хранение заметок: каждый блок — отдельная строка со стабильным ID и ключом порядка,
+    # сохранение переписывает только изменённые блоки вместо всего JSON заметки
+    (8, 'Блоки заметок', [
+        '''
+        CREATE TABLE IF NOT EXISTS note_blocks (
+            blockID INTEGER PRIMARY KEY AUTOINCREMENT,
+            noteID INTEGER NOT NULL,
+            position REAL NOT NULL,
+            type TEXT NOT NULL,
+            content TEXT,
+            FOREIGN KEY(noteID) REFERENCES notes(noteID)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_note_blocks_note ON note_blocks(noteID, position)',
+        _migrate_content_to_blocks,
+    ]),
+    # Импорт данных (data_transfer.py): идентификаторы уже импортированных записей пользователя,
+    # по ним повторный или прерванный импорт пропускает то, что уже записано
+    (9, 'Журнал импорта', [
+        '''
+        CREATE TABLE IF NOT EXISTS imported_records (
+            userID INTEGER NOT NULL,
+            uid TEXT NOT NULL,
+            PRIMARY KEY (userID, uid)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    # Очередь AI-запросов (ai_queue.py): состояние задания хранится в самой записи запроса,
+    # невыполненные задания подхватываются при следующем запуске. Статус входит в индекс списка,
+    # чтобы выборка истории оставалась покрывающей
+    (10, 'Статус AI-запросов для очереди заданий', [
+        "ALTER TABLE ai_requests ADD COLUMN status TEXT NOT NULL DEFAULT 'done'",
+        "ALTER TABLE ai_requests ADD COLUMN useCache INTEGER NOT NULL DEFAULT 1",
+        'DROP INDEX IF EXISTS idx_ai_requests_user_page',
+        'CREATE INDEX IF NOT EXISTS idx_ai_requests_user_page '
+        'ON ai_requests(userID, created DESC, requestID DESC, prompt, status)',
+        "CREATE INDEX IF NOT EXISTS idx_ai_requests_pending ON ai_requests(requestID) "
+        "WHERE status IN ('queued', 'running')",
+    ]),
+    # Поисковый индекс по блокам: правка блока переписывает в индексе только этот блок,
+    # а не весь текст заметки. notes_fts остаётся индексом заголовков (rowid = noteID),
+    # текстовые блоки — в note_blocks_fts (rowid = blockID)
+    (11, 'Поисковый индекс по блокам заметок', [
+        'DROP TABLE IF EXISTS notes_fts',
+        '''
+        CREATE VIRTUAL TABLE notes_fts USING fts5(
+            title, userID UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS note_blocks_fts USING fts5(
+            body, noteID UNINDEXED, userID UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        ''',
+        "INSERT INTO notes_fts (rowid, title, userID) SELECT noteID, COALESCE(title, ''), userID FROM notes",
+        '''
+        INSERT INTO note_blocks_fts (rowid, body, noteID, userID)
+        SELECT b.blockID, COALESCE(b.content, ''), b.noteID, n.userID
+        FROM note_blocks b JOIN notes n ON n.noteID = b.noteID
+        WHERE b.type = 'text'
+        ''',
+    ]),
+    # Журнал импорта запоминает созданную строку (вид записи и её ID): запись считается
+    # импортированной, только пока эта строка есть, поэтому восстановление из копии
+    # возвращает удалённые после импорта записи
+    (12, 'Строки записей в журнале импорта', [
+        'ALTER TABLE imported_records ADD COLUMN kind TEXT',
+        'ALTER TABLE imported_records ADD COLUMN rowID INTEGER',
+    ]),
+    # Постоянный идентификатор установки: экспорт подписывает им записи (установка, вид записи,
+    # ID строки), поэтому импорт различает записи с одинаковым содержимым
+    (13, 'Идентификатор установки', [
+        '''
+        CREATE TABLE IF NOT EXISTS app_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        _create_install_id,
+    ]),
+    # Аренда заданий очереди AI-запросов: claimedBy — экземпляр приложения, выполняющий задание,
+    # claimedUntil — до какого момента (UTC) аренда действительна. Другой экземпляр возвращает
+    # задание в очередь только после окончания аренды
+    (14, 'Аренда заданий очереди AI-запросов', [
+        'ALTER TABLE ai_requests ADD COLUMN claimedBy TEXT',
+        'ALTER TABLE ai_requests ADD COLUMN claimedUntil TEXT',
+    ]),
+]
+
+
+# Текущая версия схемы (0 — миграции ещё не применялись)
+def get_schema_version(conn) -> int:
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, description TEXT, applied TEXT)'
+    )
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+
+# Применение всех ещё не выполненных миграций по порядку
+def apply_migrations(conn):
+    current = get_schema_version(conn)
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        # IMMEDIATE: два одновременно запущенных экземпляра не применят миграцию дважды
+        with transaction(immediate=True):
+            if get_schema_version(conn) >= version:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                'INSERT INTO schema_version (version, description, applied) VALUES (?, ?, ?)',
+                (version, description, datetime.utcnow().isoformat()),
+            )
@@ -1,8 +1,26 @@
 # models.py
 import sqlite3
 import json
-from datetime import datetime
-from db import get_conn
+import re
+from datetime import datetime, timedelta
+from db import get_conn, on_commit, transaction
+
+# Маркеры подсветки совпадений в сниппетах поиска (UI заменяет их на разметку)
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+
+# Список ID как один параметр запроса: в SQL раскрывается через json_each(?),
+# поэтому любое число ID проходит одним выражением без лимита на число параметров
+def _id_list(ids) -> str:
+    return json.dumps([int(i) for i in ids])
+
+
+# Преобразование пользовательского ввода в безопасный запрос FTS5:
+# каждое слово ищется как префикс, спецсимволы синтаксиса FTS5 отбрасываются
+def _fts_query(text: str) -> str:
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{w}"*' for w in words)
 
 
 class User:
@@ -14,158 +32,496 @@ class User:
     # Регистрация нового пользователя в базе данных
     @staticmethod
     def register(username: str, password: str) -> 'User':
-        conn = get_conn()
-        cur = conn.cursor()
         try:
-            cur.execute(
-                'INSERT INTO users (username, password) VALUES (?, ?)',
-                (username, password),
-            )
-            conn.commit()
-            user_id = cur.lastrowid
+            with transaction() as conn:
+                cur = conn.execute(
+                    'INSERT INTO users (username, password) VALUES (?, ?)',
+                    (username, password),
+                )
+                user_id = cur.lastrowid
             return User(username, password, user_id)
         except sqlite3.IntegrityError:
             return None
-        finally:
-            conn.close()
 
     # Авторизация пользователя по логину и паролю
     @staticmethod
     def login(username: str, password: str) -> 'User':
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute(
+        row = get_conn().execute(
             'SELECT userID, username, password FROM users WHERE username = ?', (username,)
-        )
-        row = cur.fetchone()
-        conn.close()
+        ).fetchone()
         if not row:
             return None
         if row['password'] != password:
             return None
         return User(row['username'], row['password'], row['userID'])
 
-    # Получение списка всех заметок пользователя, отсортированных по дате создания
-    def get_notes_list(self):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT noteID, title, created FROM notes WHERE userID = ? ORDER BY created DESC', (self.userID,))
-        rows = cur.fetchall()
-        conn.close()
+    # Получение списка заметок пользователя, отсортированных по дате создания (новые сверху).
+    # limit/after — постраничная загрузка: after = (created, noteID) последней загруженной строки
+    def get_notes_list(self, limit: int = None, after: tuple = None):
+        sql = 'SELECT noteID, title, created FROM notes WHERE userID = ?'
+        params = [self.userID]
+        if after is not None:
+            sql += ' AND (created, noteID) < (?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY created DESC, noteID DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        rows = get_conn().execute(sql, params).fetchall()
         return [dict(r) for r in rows]
 
-    # Получение списка всех напоминаний пользователя, отсортированных по времени
-    def get_reminders_list(self):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT remindID, text, startTime FROM reminders WHERE userID = ? ORDER BY startTime ASC', (self.userID,))
-        rows = cur.fetchall()
-        conn.close()
+    # Получение списка напоминаний пользователя, отсортированных по времени.
+    # limit/after — постраничная загрузка: after = (startTime, remindID) последней загруженной строки
+    def get_reminders_list(self, limit: int = None, after: tuple = None):
+        sql = 'SELECT remindID, text, startTime FROM reminders WHERE userID = ?'
+        params = [self.userID]
+        if after is not None:
+            sql += ' AND (startTime, remindID) > (?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY startTime ASC, remindID ASC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        rows = get_conn().execute(sql, params).fetchall()
+        return [dict(r) for r in rows]
+
+    # Получение истории AI запросов пользователя, отсортированных по дате создания (новые сверху).
+    # limit/after — постраничная загрузка: after = (created, requestID) последней загруженной строки
+    def get_ai_history(self, limit: int = None, after: tuple = None):
+        sql = 'SELECT requestID, prompt, created, status FROM ai_requests WHERE userID = ?'
+        params = [self.userID]
+        if after is not None:
+            sql += ' AND (created, requestID) < (?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY created DESC, requestID DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        rows = get_conn().execute(sql, params).fetchall()
         return [dict(r) for r in rows]
 
-    # Получение истории AI запросов пользователя, отсортированных по дате создания
-    def get_ai_history(self):
+    # Полнотекстовый поиск по заметкам пользователя, по релевантности: совпадения в заголовке
+    # (notes_fts) и в отдельных текстовых блоках (note_blocks_fts) группируются по заметке,
+    # сниппет — из лучшего совпадения (совпадение в заголовке весит в TITLE_WEIGHT раз больше).
+    # Сниппеты строятся вторым запросом только для найденных строк: snippet() для каждого
+    # совпавшего блока стоил бы на порядок дороже самого поиска. +rowid — один проход по
+    # совпадениям: с rowid IN (...) FTS5 заново разбирал бы запрос MATCH для каждого ID
+    def search_notes(self, query: str, limit: int = 50):
+        match = _fts_query(query)
+        if not match:
+            return []
         conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT requestID, prompt, created FROM ai_requests WHERE userID = ? ORDER BY created DESC', (self.userID,))
-        rows = cur.fetchall()
-        conn.close()
+        rows = conn.execute(
+            'SELECT n.noteID, n.title, n.created, h.hitID, h.inTitle FROM ('
+            ' SELECT noteID, MIN(rank) AS rank, hitID, inTitle FROM ('
+            '  SELECT rowid AS noteID, bm25(notes_fts) * ? AS rank, rowid AS hitID, 1 AS inTitle'
+            '  FROM notes_fts WHERE notes_fts MATCH ? AND userID = ?'
+            '  UNION ALL'
+            '  SELECT noteID, bm25(note_blocks_fts), rowid, 0'
+            '  FROM note_blocks_fts WHERE note_blocks_fts MATCH ? AND userID = ?'
+            ' ) GROUP BY noteID'
+            ') h JOIN notes n ON n.noteID = h.noteID '
+            'ORDER BY h.rank LIMIT ?',
+            (Note.TITLE_WEIGHT, match, self.userID, match, self.userID, limit),
+        ).fetchall()
+        snippets = {}
+        for table, in_title in (('notes_fts', 1), ('note_blocks_fts', 0)):
+            ids = [r['hitID'] for r in rows if r['inTitle'] == in_title]
+            if ids:
+                snippets[in_title] = dict(conn.execute(
+                    f"SELECT rowid, snippet({table}, 0, ?, ?, '…', 12) FROM {table} "
+                    f'WHERE {table} MATCH ? AND +rowid IN (SELECT value FROM json_each(?))',
+                    (SNIPPET_START, SNIPPET_END, match, _id_list(ids)),
+                ).fetchall())
+        return [
+            {'noteID': r['noteID'], 'title': r['title'], 'created': r['created'],
+             'snippet': snippets[r['inTitle']].get(r['hitID'], '')}
+            for r in rows
+        ]
+
+    # Полнотекстовый поиск по истории AI запросов пользователя (промпты и ответы), по релевантности
+    def search_ai_history(self, query: str, limit: int = 50):
+        match = _fts_query(query)
+        if not match:
+            return []
+        rows = get_conn().execute(
+            'SELECT a.requestID, a.prompt, a.created, a.status, '
+            "snippet(ai_requests_fts, -1, ?, ?, '…', 12) AS snippet "
+            'FROM ai_requests_fts JOIN ai_requests a ON a.requestID = ai_requests_fts.rowid '
+            'WHERE ai_requests_fts MATCH ? AND a.userID = ? '
+            'ORDER BY bm25(ai_requests_fts, 2.0, 1.0) LIMIT ?',
+            (SNIPPET_START, SNIPPET_END, match, self.userID, limit),
+        ).fetchall()
         return [dict(r) for r in rows]
 
 
 class Note:
+    # Шаг ключей порядка блоков (note_blocks.position). Новый блок получает ключ между соседями,
+    # поэтому вставка не сдвигает остальные блоки
+    BLOCK_GAP = 1024.0
+    # Вес совпадения в заголовке относительно совпадения в блоке при поиске
+    TITLE_WEIGHT = 10.0
+
     def __init__(self, user_id: int, title: str = '', content=None, note_id: int = None):
         self.noteID = note_id
         self.userID = user_id
         self.title = title
+        # блоки заметки: {'id': blockID (нет у ещё не сохранённых), 'type': 'text'|'image', 'content': ...}
         self.content = content or []
         self.created = None
         self.updated = None
+        # сохранённое в БД состояние блоков: blockID -> (position, type); None — ещё не прочитано
+        self._saved_blocks = None
+        self._saved_title = None
 
-    # Сохранение заметки в базу данных (создание новой или обновление существующей)
-    def save(self):
-        now = datetime.utcnow().isoformat()
-        conn = get_conn()
-        cur = conn.cursor()
-        if self.noteID is None:
-            cur.execute(
-                'INSERT INTO notes (userID, title, content, created, updated) VALUES (?, ?, ?, ?, ?)',
-                (self.userID, self.title, json.dumps(self.content, ensure_ascii=False), now, now),
-            )
-            self.noteID = cur.lastrowid
-        else:
-            cur.execute(
-                'UPDATE notes SET title = ?, content = ?, updated = ? WHERE noteID = ? AND userID = ?',
-                (self.title, json.dumps(self.content, ensure_ascii=False), now, self.noteID, self.userID),
+    # Относительные пути изображений, на которые ссылается заметка
+    @staticmethod
+    def _image_paths(content):
+        return {
+            b.get('content') for b in content
+            if isinstance(b, dict) and b.get('type') == 'image' and b.get('content')
+        }
+
+    # Обновление ссылок заметки на изображения в image_refs (вызывается внутри транзакции сохранения)
+    @staticmethod
+    def _index_images(conn, note_id: int, content):
+        conn.execute('DELETE FROM image_refs WHERE noteID = ?', (note_id,))
+        conn.executemany(
+            'INSERT INTO image_refs (path, noteID) VALUES (?, ?)',
+            [(path, note_id) for path in Note._image_paths(content)],
+        )
+
+    # Обновление заголовка заметки в notes_fts (вызывается внутри транзакции сохранения).
+    # Текст блоков индексируется отдельно, по блокам (note_blocks_fts, см. _write_blocks)
+    @staticmethod
+    def _index_title(conn, note_id: int, user_id: int, title: str):
+        conn.execute('DELETE FROM notes_fts WHERE rowid = ?', (note_id,))
+        conn.execute(
+            'INSERT INTO notes_fts (rowid, title, userID) VALUES (?, ?, ?)', (note_id, title or '', user_id)
+        )
+
+    # Индексы поиска для заметок, записанных в обход save (импорт, генератор тестовых данных):
+    # заголовки и все текстовые блоки по уже вставленным строкам notes и note_blocks
+    @staticmethod
+    def _index_new(conn, note_ids):
+        ids = _id_list(note_ids)
+        conn.execute(
+            "INSERT INTO notes_fts (rowid, title, userID) SELECT noteID, COALESCE(title, ''), userID "
+            'FROM notes WHERE noteID IN (SELECT value FROM json_each(?))',
+            (ids,),
+        )
+        conn.execute(
+            'INSERT INTO note_blocks_fts (rowid, body, noteID, userID) '
+            "SELECT b.blockID, COALESCE(b.content, ''), b.noteID, n.userID FROM note_blocks b "
+            'JOIN notes n ON n.noteID = b.noteID '
+            "WHERE b.noteID IN (SELECT value FROM json_each(?)) AND b.type = 'text'",
+            (ids,),
+        )
+
+    # Ключи порядка для блоков: сохранённые ключи остаются на месте, пока идут по возрастанию,
+    # остальным блокам назначаются ключи между соседями. None — между соседями не осталось места
+    @staticmethod
+    def _order_keys(existing):
+        keys = list(existing)
+        last = float('-inf')
+        for i, key in enumerate(keys):
+            if key is not None and key > last:
+                last = key
+            else:
+                keys[i] = None
+        i, prev = 0, 0.0
+        while i < len(keys):
+            if keys[i] is not None:
+                prev = keys[i]
+                i += 1
+                continue
+            j = i
+            while j < len(keys) and keys[j] is None:
+                j += 1
+            hi = keys[j] if j < len(keys) else prev + (j - i + 1) * Note.BLOCK_GAP
+            step = (hi - prev) / (j - i + 1)
+            if step < 1e-6:
+                return None
+            for k in range(i, j):
+                keys[k] = prev + step * (k - i + 1)
+            prev, i = keys[j - 1], j
+        return keys
+
+    # Запись изменившихся блоков и их строк в note_blocks_fts внутри транзакции сохранения.
+    # saved — сохранённое состояние блоков заметки note_id, dirty — ID блоков с изменённым
+    # содержимым (None — все блоки). Объект не меняется.
+    # Возвращает (новое состояние блоков, вставленные блоки с их ID, изменились ли изображения)
+    def _write_blocks(self, conn, note_id: int, saved: dict, dirty):
+        blocks = [b for b in self.content if isinstance(b, dict)]
+        ids, seen = [], set()
+        for b in blocks:
+            # блок с чужим или повторяющимся ID сохраняется как новый
+            bid = b.get('id')
+            if bid not in saved or bid in seen:
+                bid = None
+            ids.append(bid)
+            seen.add(bid)
+        removed = [bid for bid in saved if bid not in seen]
+
+        keys = Note._order_keys([saved[bid][0] if bid is not None else None for bid in ids])
+        if keys is None:
+            keys = [(i + 1) * Note.BLOCK_GAP for i in range(len(blocks))]
+
+        images_changed = any(saved[bid][1] == 'image' for bid in removed)
+        # строки поискового индекса: удаляемые (blockID) и добавляемые (blockID, текст)
+        fts_delete = [(bid,) for bid in removed if saved[bid][1] == 'text']
+        fts_insert = []
+        if removed:
+            conn.executemany('DELETE FROM note_blocks WHERE blockID = ?', [(bid,) for bid in removed])
+        state, inserted = {}, []
+        for b, bid, key in zip(blocks, ids, keys):
+            btype = b.get('type') or 'text'
+            if bid is None:
+                cur = conn.execute(
+                    'INSERT INTO note_blocks (noteID, position, type, content) VALUES (?, ?, ?, ?)',
+                    (note_id, key, btype, b.get('content', '')),
+                )
+                bid = cur.lastrowid
+                inserted.append((b, bid))
+            elif dirty is None or bid in dirty or btype != saved[bid][1]:
+                conn.execute(
+                    'UPDATE note_blocks SET position = ?, type = ?, content = ? WHERE blockID = ?',
+                    (key, btype, b.get('content', ''), bid),
+                )
+                if saved[bid][1] == 'text':
+                    fts_delete.append((bid,))
+            else:
+                # содержимое не менялось: при необходимости переписывается только ключ порядка
+                if key != saved[bid][0]:
+                    conn.execute('UPDATE note_blocks SET position = ? WHERE blockID = ?', (key, bid))
+                state[bid] = (key, btype)
+                continue
+            state[bid] = (key, btype)
+            if btype == 'text':
+                fts_insert.append((bid, b.get('content', ''), note_id, self.userID))
+            images_changed = images_changed or btype == 'image'
+        if fts_delete:
+            conn.executemany('DELETE FROM note_blocks_fts WHERE rowid = ?', fts_delete)
+        if fts_insert:
+            conn.executemany(
+                'INSERT INTO note_blocks_fts (rowid, body, noteID, userID) VALUES (?, ?, ?, ?)', fts_insert
             )
-        conn.commit()
-        conn.close()
+        return state, inserted, images_changed
+
+    # Сохранение заметки в базу данных (создание новой или обновление существующей).
+    # Записываются только вставленные, удалённые и перечисленные в dirty блоки (None — все),
+    # поисковый индекс — только по этим блокам и по заголовку, если он изменился;
+    # ссылки на изображения — только если изменились изображения
+    def save(self, dirty=None):
+        now = datetime.utcnow().isoformat()
+        title = self.title
+        with transaction() as conn:
+            note_id, saved, created = self.noteID, self._saved_blocks, self.created
+            if note_id is None:
+                cur = conn.execute(
+                    'INSERT INTO notes (userID, title, created, updated) VALUES (?, ?, ?, ?)',
+                    (self.userID, title, now, now),
+                )
+                note_id, saved, created = cur.lastrowid, {}, now
+            else:
+                cur = conn.execute(
+                    'UPDATE notes SET title = ?, updated = ? WHERE noteID = ? AND userID = ?',
+                    (title, now, note_id, self.userID),
+                )
+                if not cur.rowcount:
+                    return
+                if saved is None:
+                    saved = {
+                        row['blockID']: (row['position'], row['type'])
+                        for row in conn.execute(
+                            'SELECT blockID, position, type FROM note_blocks WHERE noteID = ?', (note_id,)
+                        )
+                    }
+            state, inserted, images_changed = self._write_blocks(conn, note_id, saved, dirty)
+            if title != self._saved_title:
+                Note._index_title(conn, note_id, self.userID, title)
+            if images_changed:
+                Note._index_images(conn, note_id, self.content)
 
-    # Загрузка заметки из базы данных по ID с обработкой ошибок парсинга JSON
+            # состояние объекта обновляется только после фиксации транзакции: внутри группового
+            # коммита потока БД (db_worker) выход из этого блока — ещё не COMMIT, и при откате
+            # объект не должен ссылаться на несуществующие строки
+            def committed():
+                self.noteID = note_id
+                self.created = created
+                for b, bid in inserted:
+                    b['id'] = bid
+                self._saved_blocks = state
+                self._saved_title = title
+            on_commit(committed)
+
+    # Загрузка заметки из базы данных по ID вместе с блоками в порядке position
     @staticmethod
     def load_by_id(note_id: int):
         conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM notes WHERE noteID = ?', (note_id,))
-        row = cur.fetchone()
-        conn.close()
+        row = conn.execute('SELECT noteID, userID, title, created, updated FROM notes WHERE noteID = ?', (note_id,)).fetchone()
         if not row:
             return None
-        try:
-            content = json.loads(row['content'] or '[]')
-        except (json.JSONDecodeError, TypeError) as e:
-            # Восстанавливаемся с пустым содержимым при ошибке парсинга
-            content = []
-            print(f"Ошибка парсинга JSON для заметки {row['noteID']}: {e}")
+        rows = conn.execute(
+            'SELECT blockID, position, type, content FROM note_blocks WHERE noteID = ? ORDER BY position',
+            (note_id,),
+        ).fetchall()
+        content = [{'id': r['blockID'], 'type': r['type'], 'content': r['content'] or ''} for r in rows]
         n = Note(row['userID'], row['title'], content, row['noteID'])
         n.created = row['created']
         n.updated = row['updated']
+        n._saved_blocks = {r['blockID']: (r['position'], r['type']) for r in rows}
+        n._saved_title = row['title']
         return n
 
     # Удаление заметки из базы данных
     def delete(self):
         if self.noteID is None:
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('DELETE FROM notes WHERE noteID = ? AND userID = ?', (self.noteID, self.userID))
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            cur = conn.execute('DELETE FROM notes WHERE noteID = ? AND userID = ?', (self.noteID, self.userID))
+            if cur.rowcount:
+                conn.execute(
+                    'DELETE FROM note_blocks_fts WHERE rowid IN (SELECT blockID FROM note_blocks WHERE noteID = ?)',
+                    (self.noteID,),
+                )
+                conn.execute('DELETE FROM note_blocks WHERE noteID = ?', (self.noteID,))
+                conn.execute('DELETE FROM notes_fts WHERE rowid = ?', (self.noteID,))
+                conn.execute('DELETE FROM image_refs WHERE noteID = ?', (self.noteID,))
+
+    # Удаление нескольких заметок пользователя одной транзакцией; чужие и уже удалённые ID пропускаются.
+    # Возвращает (ID удалённых заметок, ID чужих заметок — в удалении отказано)
+    @staticmethod
+    def delete_many(user_id: int, note_ids):
+        with transaction() as conn:
+            deleted, refused = [], []
+            for row in conn.execute(
+                'SELECT noteID, userID FROM notes WHERE noteID IN (SELECT value FROM json_each(?))', (_id_list(note_ids),)
+            ):
+                (deleted if row[1] == user_id else refused).append(row[0])
+            if deleted:
+                ids = _id_list(deleted)
+                conn.execute('DELETE FROM notes WHERE noteID IN (SELECT value FROM json_each(?))', (ids,))
+                conn.execute(
+                    'DELETE FROM note_blocks_fts WHERE rowid IN '
+                    '(SELECT blockID FROM note_blocks WHERE noteID IN (SELECT value FROM json_each(?)))',
+                    (ids,),
+                )
+                conn.execute('DELETE FROM note_blocks WHERE noteID IN (SELECT value FROM json_each(?))', (ids,))
+                conn.execute('DELETE FROM notes_fts WHERE rowid IN (SELECT value FROM json_each(?))', (ids,))
+                conn.execute('DELETE FROM image_refs WHERE noteID IN (SELECT value FROM json_each(?))', (ids,))
+        return deleted, refused
 
 
 class Reminder:
+    # Подписчики на изменение набора напоминаний: callback(user_id).
+    # Через них планировщик узнаёт, что нужно перевзвести таймер
+    _listeners = []
+
     def __init__(self, user_id: int, text: str, start_time: str, remind_id: int = None):
         self.remindID = remind_id
         self.userID = user_id
         self.text = text
         self.startTime = start_time
 
+    # Подписка на изменения напоминаний (создание, изменение, удаление)
+    @classmethod
+    def add_change_listener(cls, callback):
+        if callback not in cls._listeners:
+            cls._listeners.append(callback)
+
+    # Отписка от изменений напоминаний
+    @classmethod
+    def remove_change_listener(cls, callback):
+        if callback in cls._listeners:
+            cls._listeners.remove(callback)
+
+    # Оповещение подписчиков об изменении напоминаний пользователя. Из транзакции вызывается
+    # через on_commit: при групповом коммите подписчики (планировщик) видят только
+    # зафиксированные изменения и не узнают об откаченных
+    @classmethod
+    def _notify_changed(cls, user_id: int):
+        for callback in list(cls._listeners):
+            callback(user_id)
+
+    # Время, когда планировщику нужно проснуться (ISO-строка), или None, если напоминаний нет.
+    # Для захваченных другим процессом напоминаний это момент окончания аренды
+    @staticmethod
+    def get_next_start_time(user_id: int):
+        row = get_conn().execute(
+            'SELECT MIN(t) FROM ('
+            ' SELECT MIN(startTime) AS t FROM reminders WHERE userID = ? AND claimedBy IS NULL'
+            ' UNION ALL'
+            ' SELECT MIN(claimedUntil) AS t FROM reminders WHERE userID = ? AND claimedBy IS NOT NULL'
+            ')',
+            (user_id, user_id),
+        ).fetchone()
+        return row[0]
+
+    # Атомарный захват всех сработавших напоминаний пользователя одной транзакцией.
+    # owner — идентификатор процесса; захват действует lease_seconds, после чего
+    # незавершённые (например, из-за падения процесса) напоминания снова станут доступны
+    @staticmethod
+    def claim_due(user_id: int, owner: str, now: datetime = None, lease_seconds: int = 600):
+        now = now or datetime.now()
+        now_iso = now.isoformat()
+        until_iso = (now + timedelta(seconds=lease_seconds)).isoformat()
+        # IMMEDIATE: блокировка на запись берётся до SELECT, другой процесс не захватит те же строки
+        with transaction(immediate=True) as conn:
+            rows = conn.execute(
+                'SELECT remindID, userID, text, startTime FROM reminders '
+                'WHERE userID = ? AND startTime <= ? AND (claimedBy IS NULL OR claimedUntil <= ?) '
+                'ORDER BY startTime',
+                (user_id, now_iso, now_iso),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    'UPDATE reminders SET claimedBy = ?, claimedUntil = ? WHERE remindID = ?',
+                    [(owner, until_iso, row['remindID']) for row in rows],
+                )
+        return [Reminder(row['userID'], row['text'], row['startTime'], row['remindID']) for row in rows]
+
+    # Завершение доставки захваченных напоминаний: удаление одной транзакцией
+    @staticmethod
+    def complete_claimed(user_id: int, remind_ids, owner: str):
+        remind_ids = list(remind_ids)
+        if not remind_ids:
+            return
+        with transaction() as conn:
+            conn.executemany(
+                'DELETE FROM reminders WHERE remindID = ? AND userID = ? AND claimedBy = ?',
+                [(remind_id, user_id, owner) for remind_id in remind_ids],
+            )
+            on_commit(lambda: Reminder._notify_changed(user_id))
+
     # Сохранение напоминания в базу данных (создание новой или обновление существующей)
     def save(self):
-        conn = get_conn()
-        cur = conn.cursor()
-        if self.remindID is None:
-            cur.execute(
-                'INSERT INTO reminders (userID, text, startTime) VALUES (?, ?, ?)',
-                (self.userID, self.text, self.startTime),
-            )
-            self.remindID = cur.lastrowid
-        else:
-            cur.execute(
-                'UPDATE reminders SET text = ?, startTime = ? WHERE remindID = ? AND userID = ?',
-                (self.text, self.startTime, self.remindID, self.userID),
-            )
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            if self.remindID is None:
+                cur = conn.execute(
+                    'INSERT INTO reminders (userID, text, startTime) VALUES (?, ?, ?)',
+                    (self.userID, self.text, self.startTime),
+                )
+                remind_id = cur.lastrowid
+
+                # ID — только после фиксации транзакции (см. Note.save)
+                def committed():
+                    self.remindID = remind_id
+                on_commit(committed)
+            else:
+                conn.execute(
+                    # изменённое напоминание снова ожидает срабатывания — снимаем захват
+                    'UPDATE reminders SET text = ?, startTime = ?, claimedBy = NULL, claimedUntil = NULL '
+                    'WHERE remindID = ? AND userID = ?',
+                    (self.text, self.startTime, self.remindID, self.userID),
+                )
+            user_id = self.userID
+            on_commit(lambda: Reminder._notify_changed(user_id))
 
     # Загрузка напоминания из базы данных по ID
     @staticmethod
     def load_by_id(remind_id: int):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM reminders WHERE remindID = ?', (remind_id,))
-        row = cur.fetchone()
-        conn.close()
+        row = get_conn().execute('SELECT * FROM reminders WHERE remindID = ?', (remind_id,)).fetchone()
         if not row:
             return None
         r = Reminder(row['userID'], row['text'], row['startTime'], row['remindID'])
@@ -175,108 +531,279 @@ class Reminder:
     def delete(self):
         if self.remindID is None:
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('DELETE FROM reminders WHERE remindID = ? AND userID = ?', (self.remindID, self.userID))
-        conn.commit()
-        conn.close()
+        with transaction() as conn:
+            conn.execute('DELETE FROM reminders WHERE remindID = ? AND userID = ?', (self.remindID, self.userID))
+            user_id = self.userID
+            on_commit(lambda: Reminder._notify_changed(user_id))
+
+    # Удаление нескольких напоминаний пользователя одной транзакцией; уже удалённые ID пропускаются.
+    # Возвращает (ID удалённых, ID чужих напоминаний — в удалении отказано)
+    @staticmethod
+    def delete_many(user_id: int, remind_ids):
+        with transaction() as conn:
+            deleted, refused = [], []
+            for row in conn.execute(
+                'SELECT remindID, userID FROM reminders WHERE remindID IN (SELECT value FROM json_each(?))', (_id_list(remind_ids),)
+            ):
+                (deleted if row[1] == user_id else refused).append(row[0])
+            if deleted:
+                conn.execute(
+                    'DELETE FROM reminders WHERE remindID IN (SELECT value FROM json_each(?))', (_id_list(deleted),)
+                )
+                on_commit(lambda: Reminder._notify_changed(user_id))
+        return deleted, refused
 
 
 class AIRequest:
+    # Параметры генерации (входят в ключ кэша ответов); модель задаётся в настройках (AI_MODEL)
+    SYSTEM_PROMPT = "Отвечайте на русском языке. Будьте краткими и чёткими. Максимальная длина ответа - 500 токенов."
+    MAX_TOKENS = 500
+    TEMPERATURE = 0.7
+
+    # Состояния задания в очереди (ai_queue.py); запросы, отправленные напрямую через send, сразу done/failed
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    # Срок аренды выполняющегося задания, сек: пока экземпляр работает, ai_queue продлевает её
+    # (renew_jobs), после падения экземпляра задание вернётся в очередь по окончании аренды
+    JOB_LEASE_SECONDS = 60
+
     def __init__(self, user_id: int, prompt: str, response: str = '', request_id: int = None):
         self.requestID = request_id
         self.userID = user_id
         self.prompt = prompt
         self.response = response
         self.created = None
-    
+        self.status = AIRequest.DONE
+        # использовать ли кэш ответов при выполнении задания
+        self.use_cache = True
 
-    # Отправка запроса к AI API DeepSeek и сохранение результата в базу данных
-    def send(self):
-        import os
-        import requests
-        from dotenv import load_dotenv
-        from datetime import datetime
-        from paths import get_app_data_path
-
-        # Загружаем .env из папки приложения (работает в обычном проекте и в exe)
-        env_path = get_app_data_path() / '.env'
-        load_dotenv(env_path, override=True)
-        api_key = os.getenv('DEEPSEEK_API_KEY')
-        if not api_key:
+    # Ключ кэша ответов для этого запроса (модель, параметры генерации и промпт)
+    def cache_key(self, model: str) -> str:
+        import ai_cache
+        return ai_cache.make_key(model, self.SYSTEM_PROMPT, self.TEMPERATURE, self.MAX_TOKENS, self.prompt)
+
+    # Отправка запроса к AI API DeepSeek в потоковом режиме и сохранение результата в базу данных.
+    # on_delta(text) вызывается для каждого полученного фрагмента ответа (из потока отправки);
+    # в БД ответ записывается один раз, целиком.
+    # use_cache=False — обойти кэш ответов (кэш включается в .env: AI_CACHE_ENABLED=1).
+    # status становится done, если ответ получен полностью, иначе failed (текст ошибки — в response)
+    def send(self, on_delta=None, use_cache: bool = True):
+        import ai_cache
+        import settings
+
+        config = settings.get()
+        if not config.has_api_key:
             raise RuntimeError('DEEPSEEK_API_KEY not found in .env')
+        api_key = config.api_key
+        model = config.ai_model
 
-        url = "https://api.deepseek.com/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
+        use_cache = use_cache and config.ai_cache_enabled
+        if not use_cache:
+            self._finish(self._request_api(api_key, model, on_delta))
+            return
+
+        key = self.cache_key(model)
+        cached = ai_cache.get(key, ttl=config.ai_cache_ttl)
+        if cached is None:
+            leader, inflight = ai_cache.begin(key)
+            if leader:
+                ok = False
+                try:
+                    ok = self._request_api(api_key, model, on_delta)
+                finally:
+                    ai_cache.finish(key, inflight, self.response if ok else None)
+                if ok:
+                    ai_cache.put(key, self.response, ttl=config.ai_cache_ttl, max_entries=config.ai_cache_max_entries)
+                self._finish(ok)
+                return
+            # такой же запрос уже выполняется — ждём его ответ вместо второго платного вызова
+            cached = ai_cache.wait(inflight)
+            if cached is None:
+                self._finish(self._request_api(api_key, model, on_delta))
+                return
+
+        self.response = cached
+        if on_delta is not None:
+            on_delta(cached)
+        self._finish(True)
+
+    # Итог отправки: статус по результату и запись ответа в БД
+    def _finish(self, ok: bool):
+        self.status = AIRequest.DONE if ok else AIRequest.FAILED
+        self.save()
+
+    # Потоковый запрос к API: заполняет self.response (текст ответа или описание ошибки).
+    # Возвращает True, если ответ получен полностью и без ошибок
+    def _request_api(self, api_key: str, model: str, on_delta=None) -> bool:
+        import requests
+        from ai_client import get_client
 
         payload = {
-            "model": "deepseek-chat",
+            "model": model,
             "messages": [
-                {"role": "system", "content": "Отвечайте на русском языке. Будьте краткими и чёткими. Максимальная длина ответа - 500 токенов."},
+                {"role": "system", "content": self.SYSTEM_PROMPT},
                 {"role": "user", "content": self.prompt}
             ],
-            "max_tokens": 500,
-            "temperature": 0.7,
-            "stream": False
+            "max_tokens": self.MAX_TOKENS,
+            "temperature": self.TEMPERATURE,
         }
 
+        parts = []
+        # ошибки requests проверяются раньше ValueError: MissingSchema, InvalidURL и другие
+        # ошибки адреса API (AI_BASE_URL) — тоже подклассы ValueError
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=30)
-            resp.raise_for_status()
-            try:
-                data = resp.json()
-                self.response = data["choices"][0]["message"]["content"]
-            except (ValueError, KeyError, IndexError) as e:
-                self.response = f"Ошибка парсинга ответа API: {e}"
+            for delta in get_client().stream_chat(api_key, payload):
+                parts.append(delta)
+                if on_delta is not None:
+                    on_delta(delta)
+            self.response = ''.join(parts)
+            return True
         except requests.exceptions.HTTPError as e:
-            status_code = resp.status_code if hasattr(resp, 'status_code') else 'unknown'
+            status_code = e.response.status_code if e.response is not None else 'unknown'
             self.response = f"Ошибка API: {e} (status {status_code})"
         except requests.exceptions.RequestException as e:
-            self.response = f"Ошибка запроса: {e}"
+            # обрыв посреди потока: сохраняем уже полученную часть ответа
+            prefix = ''.join(parts) + '\n\n' if parts else ''
+            self.response = f"{prefix}Ошибка запроса: {e}"
+        except ValueError as e:
+            self.response = ''.join(parts) + f"\n\nОшибка парсинга ответа API: {e}"
+        return False
 
+    # Сохранение запроса и ответа в базу данных (создание новой записи или обновление ответа)
+    def save(self):
         now = datetime.utcnow().isoformat()
-        conn = get_conn()
-        cur = conn.cursor()
-        if self.requestID is None:
-            cur.execute(
-                'INSERT INTO ai_requests (userID, prompt, response, created) VALUES (?, ?, ?, ?)',
-                (self.userID, self.prompt, self.response, now),
+        with transaction() as conn:
+            if self.requestID is None:
+                cur = conn.execute(
+                    'INSERT INTO ai_requests (userID, prompt, response, created, status, useCache) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (self.userID, self.prompt, self.response, now, self.status, int(self.use_cache)),
+                )
+                request_id = cur.lastrowid
+
+                # ID — только после фиксации транзакции (см. Note.save)
+                def committed():
+                    self.requestID = request_id
+                    self.created = now
+                on_commit(committed)
+            else:
+                conn.execute(
+                    'UPDATE ai_requests SET response = ?, status = ? WHERE requestID = ? AND userID = ?',
+                    (self.response, self.status, self.requestID, self.userID),
+                )
+
+    # Постановка запроса в очередь: запись со статусом queued (выполнит ai_queue)
+    @staticmethod
+    def enqueue(user_id: int, prompt: str, use_cache: bool = True) -> 'AIRequest':
+        r = AIRequest(user_id, prompt)
+        r.status = AIRequest.QUEUED
+        r.use_cache = use_cache
+        r.save()
+        return r
+
+    # Захват задания для выполнения: queued -> running одной командой, поэтому задание
+    # не выполнится дважды. owner — идентификатор экземпляра приложения, аренда действует
+    # lease_seconds (см. Reminder.claim_due). None — задание уже взято, отменено или удалено
+    @staticmethod
+    def start_job(request_id: int, owner: str, lease_seconds: int = None):
+        until = datetime.utcnow() + timedelta(seconds=lease_seconds or AIRequest.JOB_LEASE_SECONDS)
+        with transaction(immediate=True) as conn:
+            cur = conn.execute(
+                'UPDATE ai_requests SET status = ?, claimedBy = ?, claimedUntil = ? WHERE requestID = ? AND status = ?',
+                (AIRequest.RUNNING, owner, until.isoformat(), request_id, AIRequest.QUEUED),
             )
-            self.requestID = cur.lastrowid
-            self.created = now
-        else:
-            cur.execute(
-                'UPDATE ai_requests SET response = ? WHERE requestID = ? AND userID = ?',
-                (self.response, self.requestID, self.userID),
+            if not cur.rowcount:
+                return None
+            return AIRequest.load_by_id(request_id)
+
+    # Отмена задания, которое ещё не начало выполняться; возвращает True, если оно было в очереди
+    @staticmethod
+    def cancel_queued(request_id: int) -> bool:
+        with transaction() as conn:
+            cur = conn.execute(
+                'UPDATE ai_requests SET status = ? WHERE requestID = ? AND status = ?',
+                (AIRequest.CANCELLED, request_id, AIRequest.QUEUED),
             )
+        return cur.rowcount > 0
+
+    # Невыполненные задания пользователя: выполняющиеся (running), аренда которых истекла
+    # (экземпляр, взявший задание, завершился или упал), возвращаются в очередь. Задания
+    # с действующей арендой выполняет другой работающий экземпляр — их не трогаем.
+    # Возвращает ID заданий в очереди в порядке постановки; queued=False — только возвращённые.
+    # Условие частичного индекса idx_ai_requests_pending повторено в запросах буквально:
+    # со статусом-параметром SQLite его не использует и просматривает всю историю запросов.
+    # +userID — по той же причине: иначе выбирается индекс истории пользователя
+    @staticmethod
+    def requeue_pending(user_id: int, queued: bool = True, now: datetime = None):
+        now_iso = (now or datetime.utcnow()).isoformat()
+        with transaction(immediate=True) as conn:
+            expired = [
+                row[0] for row in conn.execute(
+                    "SELECT requestID FROM ai_requests WHERE status IN ('queued', 'running') AND status = ? "
+                    "AND +userID = ? AND (claimedUntil IS NULL OR claimedUntil <= ?)",
+                    (AIRequest.RUNNING, user_id, now_iso),
+                )
+            ]
+            if expired:
+                conn.execute(
+                    'UPDATE ai_requests SET status = ?, claimedBy = NULL, claimedUntil = NULL '
+                    'WHERE requestID IN (SELECT value FROM json_each(?))',
+                    (AIRequest.QUEUED, _id_list(expired)),
+                )
+            if not queued:
+                return sorted(expired)
+            rows = conn.execute(
+                "SELECT requestID FROM ai_requests WHERE status IN ('queued', 'running') AND status = ? "
+                "AND +userID = ? ORDER BY requestID",
+                (AIRequest.QUEUED, user_id),
+            ).fetchall()
+        return [row[0] for row in rows]
 
-        conn.commit()
-        conn.close()
-  
+    # Продление аренды всех выполняющихся заданий экземпляра owner
+    @staticmethod
+    def renew_jobs(owner: str, lease_seconds: int = None):
+        until = datetime.utcnow() + timedelta(seconds=lease_seconds or AIRequest.JOB_LEASE_SECONDS)
+        with transaction() as conn:
+            conn.execute(
+                "UPDATE ai_requests SET claimedUntil = ? WHERE status IN ('queued', 'running') AND status = ? "
+                "AND claimedBy = ?",
+                (until.isoformat(), AIRequest.RUNNING, owner),
+            )
 
     # Загрузка AI запроса из базы данных по ID
     @staticmethod
     def load_by_id(request_id: int):
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('SELECT * FROM ai_requests WHERE requestID = ?', (request_id,))
-        row = cur.fetchone()
-        conn.close()
+        row = get_conn().execute('SELECT * FROM ai_requests WHERE requestID = ?', (request_id,)).fetchone()
         if not row:
             return None
         a = AIRequest(row['userID'], row['prompt'], row['response'], row['requestID'])
         a.created = row['created']
+        a.status = row['status']
+        a.use_cache = bool(row['useCache'])
         return a
 
     # Удаление AI запроса из базы данных
     def delete(self):
         if self.requestID is None:
             return
-        conn = get_conn()
-        cur = conn.cursor()
-        cur.execute('DELETE FROM ai_requests WHERE requestID = ? AND userID = ?', (self.requestID, self.userID))
-        conn.commit()
-        conn.close()
\ No newline at end of file
+        with transaction() as conn:
+            conn.execute('DELETE FROM ai_requests WHERE requestID = ? AND userID = ?', (self.requestID, self.userID))
+
+    # Удаление нескольких AI запросов пользователя одной транзакцией (ai_requests_fts обновляют триггеры);
+    # уже удалённые ID пропускаются. Возвращает (ID удалённых, ID чужих запросов — в удалении отказано)
+    @staticmethod
+    def delete_many(user_id: int, request_ids):
+        with transaction() as conn:
+            deleted, refused = [], []
+            for row in conn.execute(
+                'SELECT requestID, userID FROM ai_requests WHERE requestID IN (SELECT value FROM json_each(?))', (_id_list(request_ids),)
+            ):
+                (deleted if row[1] == user_id else refused).append(row[0])
+            if deleted:
+                conn.execute(
+                    'DELETE FROM ai_requests WHERE requestID IN (SELECT value FROM json_each(?))', (_id_list(deleted),)
+                )
+        return deleted, refused
@@ -1,66 +1,170 @@
 # reminder_watcher.py
-from PyQt6.QtCore import QObject, QTimer, QUrl
+from PyQt6.QtCore import QObject, QTimer, QUrl, Qt, pyqtSignal
 from PyQt6.QtWidgets import QMessageBox, QApplication
-from PyQt6.QtMultimedia import QSoundEffect
+import os
+import socket
+import uuid
 from datetime import datetime
 from pathlib import Path
 from models import Reminder
-from db import get_conn
+from ui import db_async
 from paths import get_resource_path
 
 class ReminderScheduler(QObject):
+    # Сигнал об изменении напоминаний: может прийти из любого потока,
+    # обработчик всегда выполняется в потоке планировщика
+    reminders_changed = pyqtSignal()
+    # Сигнал о доставленных (удалённых из БД и показанных) напоминаниях: список их ID
+    reminders_delivered = pyqtSignal(list)
+
     # Инициализация планировщика напоминаний
     # user: объект текущего авторизованного пользователя, должен иметь атрибут userID
-    # interval_ms: интервал проверки в миллисекундах (по умолчанию 5 секунд)
-    # sound_file: путь к звуковому файлу (относительно корня проекта)
-    def __init__(self, user, interval_ms: int = 5000, sound_file: str = "alarm.wav"):
+    # max_wait_ms: максимальный интервал сна таймера в миллисекундах (по умолчанию — из настроек,
+    #   REMINDER_MAX_WAIT_MS, 1 минута).
+    #   Таймер взводится на время ближайшего напоминания, но не дольше этого интервала,
+    #   чтобы после сна системы или перевода часов пересчитать задержку по настенным часам
+    # sound_file: путь к звуковому файлу (относительно корня проекта); звук загружается
+    #   при первом напоминании, QtMultimedia не импортируется заранее
+    def __init__(self, user, max_wait_ms: int = None, sound_file: str = "alarm.wav"):
         super().__init__()
         self.user = user
+        if max_wait_ms is None:
+            import settings
+            max_wait_ms = settings.get().reminder_max_wait_ms
+        self.max_wait_ms = max_wait_ms
+        # Время ближайшего напоминания (datetime) — кэш, чтобы не ходить в БД при каждом пробуждении
+        self._next_due = None
+        # Защита от повторного входа: проверка идёт через поток БД, а _show_reminder крутит свой цикл событий
+        self._checking = False
+        # После stop() поздние ответы потока БД игнорируются
+        self._stopped = False
+        # Идентификатор этого экземпляра приложения для захвата напоминаний
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self._check)
-        self.timer.start(interval_ms)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self._on_timeout)
+
+        self.reminders_changed.connect(self.reschedule)
+        Reminder.add_change_listener(self._on_reminders_changed)
+
+        self.sound_file = sound_file
+        self.sound = None
+
+        # Сразу показываем просроченные напоминания и взводим таймер на следующее
+        QTimer.singleShot(0, self._check)
+
+    # Остановка планировщика (при выходе из аккаунта)
+    def stop(self):
+        self._stopped = True
+        Reminder.remove_change_listener(self._on_reminders_changed)
+        self.timer.stop()
+
+    # Обработчик изменений из models.Reminder: интересуют только напоминания своего пользователя
+    def _on_reminders_changed(self, user_id: int):
+        if user_id == self.user.userID:
+            self.reminders_changed.emit()
 
-        # Настройка звука (если файла нет - play() просто ничего не сделает)
-        self.sound = QSoundEffect(self)
+    # Перечитывание времени ближайшего напоминания из БД (в потоке БД) и перевзвод таймера
+    def reschedule(self):
+        if self._checking or self._stopped:
+            # _check сам перевзведёт таймер после показа уведомлений
+            return
+        db_async.run(Reminder.get_next_start_time, self.user.userID, on_done=self._on_next_start)
+
+    # Получено время ближайшего напоминания
+    def _on_next_start(self, next_start):
+        if self._checking or self._stopped:
+            return
         try:
-            # Получаем путь к звуковому файлу (работает в обычном проекте и в exe)
-            sound_path = get_resource_path(sound_file)
-            if sound_path.exists():
-                self.sound.setSource(QUrl.fromLocalFile(str(sound_path.resolve())))
-                self.sound.setVolume(0.8)
-        except Exception:
-            # безопасно проигнорируем ошибку при инициализации звука
-            pass
+            self._next_due = datetime.fromisoformat(next_start) if next_start else None
+        except ValueError:
+            # некорректная дата в БД — проверим её обычным путём через _check
+            self._next_due = datetime.now()
+        self._arm()
+
+    # Взвод одноразового таймера на время ближайшего напоминания (не дольше max_wait_ms)
+    def _arm(self):
+        self.timer.stop()
+        if self._next_due is None:
+            # Напоминаний нет — спим, пока Reminder.save не сообщит об изменениях
+            return
+        delay_ms = int((self._next_due - datetime.now()).total_seconds() * 1000) + 1
+        self.timer.start(max(0, min(delay_ms, self.max_wait_ms)))
 
-    # Проверка базы данных на наличие напоминаний, которые должны быть показаны сейчас
+    # Пробуждение таймера: если срок наступил — проверяем БД, иначе досыпаем оставшееся время
+    def _on_timeout(self):
+        if self._next_due is not None and self._next_due <= datetime.now():
+            self._check()
+        else:
+            # промежуточное пробуждение: пересчитываем задержку по текущим часам
+            self._arm()
+
+    # Проверка базы данных на наличие напоминаний, которые должны быть показаны сейчас.
+    # Захват сработавших напоминаний выполняется одной транзакцией в потоке БД,
+    # удаление и показ — уже после коммита захвата (см. _show_claimed)
     def _check(self):
-        now_iso = datetime.now().isoformat()
-        conn = get_conn()
-        cur = conn.cursor()
+        if self._checking or self._stopped:
+            return
+        self._checking = True
+        db_async.run(
+            Reminder.claim_due, self.user.userID, self.owner, write=True,
+            on_done=self._show_claimed, on_error=self._check_failed,
+        )
+
+    # Захваченные напоминания удаляются одной транзакцией ещё до показа: модальное окно может
+    # оставаться открытым дольше аренды, и другой экземпляр захватил бы и показал их повторно
+    def _show_claimed(self, claimed):
+        if not claimed:
+            self._check_done()
+            return
+        ids = [r.remindID for r in claimed]
+        db_async.run(
+            Reminder.complete_claimed, self.user.userID, ids, self.owner,
+            write=True, on_done=lambda _: self._on_delivered(claimed), on_error=self._check_failed,
+        )
+
+    # Напоминания удалены из БД: показ уведомлений
+    def _on_delivered(self, claimed):
         try:
-            cur.execute(
-                "SELECT remindID, text FROM reminders WHERE userID = ? AND startTime <= ?",
-                (self.user.userID, now_iso),
-            )
-            rows = cur.fetchall()
-            for row in rows:
-                remind_id = row["remindID"]
-                text = row["text"] or ""
-                # Показываем уведомление и звук
-                self._show_reminder(text)
-                # Удаляем напоминание — используем класс Reminder (без изменений)
-                r = Reminder.load_by_id(remind_id)
-                if r:
-                    r.delete()
+            self.reminders_delivered.emit([r.remindID for r in claimed])
+            if not self._stopped:
+                for r in claimed:
+                    # Показываем уведомление и звук
+                    self._show_reminder(r.text or "")
         finally:
-            conn.commit()
-            conn.close()
+            self._check_done()
+
+    # Завершение проверки: перевзвод таймера на следующее напоминание
+    def _check_done(self, _=None):
+        self._checking = False
+        self.reschedule()
+
+    # Ошибка БД при проверке: незавершённые захваты освободятся по окончании аренды
+    def _check_failed(self, error):
+        print(f"[reminders] Ошибка проверки напоминаний: {error}")
+        self._check_done()
+
+    # Звук напоминания: создаётся при первом использовании (если файла нет - play() просто ничего не сделает)
+    def _get_sound(self):
+        if self.sound is None:
+            from PyQt6.QtMultimedia import QSoundEffect
+
+            self.sound = QSoundEffect(self)
+            # Получаем путь к звуковому файлу (работает в обычном проекте и в exe)
+            sound_path = get_resource_path(self.sound_file)
+            if sound_path.exists():
+                self.sound.setSource(QUrl.fromLocalFile(str(sound_path.resolve())))
+                self.sound.setVolume(0.8)
+        return self.sound
 
     # Показ уведомления о напоминании с воспроизведением звука
     def _show_reminder(self, text: str):
         try:
-            self.sound.play()
+            self._get_sound().play()
         except Exception:
+            # безопасно проигнорируем ошибку звука (например, нет библиотек мультимедиа)
             pass
 
         # информационное уведомление по центру (QMessageBox)
@@ -0,0 +1,152 @@
+# settings.py
+# Настройки приложения из файла .env в папке приложения (работает в обычном проекте и в exe).
+# Файл разбирается один раз; повторно — только если изменилось время его модификации
+# (проверяется не чаще раза в CHECK_INTERVAL секунд) или после записи через update().
+# Обращения из горячих путей (главное меню, отправка AI-запроса) читают значения из памяти.
+# Запись атомарная: файл пишется рядом под временным именем и подменяет старый через os.replace
+import os
+import tempfile
+import threading
+import time
+from paths import get_app_data_path
+
+ENV_PATH = get_app_data_path() / '.env'
+# Как часто (сек) сверять время модификации .env с прочитанным
+CHECK_INTERVAL = 1.0
+# Значение-заглушка ключа из env.example — считается отсутствующим ключом
+PLACEHOLDER_API_KEY = 'your_api_key_here'
+
+# Заголовок нового .env (если файла ещё нет)
+ENV_HEADER = [
+    '# DeepSeek API Key\n',
+    '# Получите свой API ключ на https://www.deepseek.com/\n',
+    '# Вы можете обратиться в Telegram @coawy для получения API-ключа для тестирования проекта\n',
+]
+
+
+def _to_bool(value: str) -> bool:
+    return value.strip().lower() in ('1', 'true', 'yes')
+
+
+# Переменная .env -> (атрибут Settings, преобразование, значение по умолчанию)
+FIELDS = {
+    'DEEPSEEK_API_KEY': ('api_key', str, ''),
+    'AI_MODEL': ('ai_model', str, 'deepseek-chat'),
+    'AI_BASE_URL': ('ai_base_url', str, 'https://api.deepseek.com/v1'),
+    'AI_CONNECT_TIMEOUT': ('ai_connect_timeout', float, 10.0),
+    'AI_READ_TIMEOUT': ('ai_read_timeout', float, 30.0),
+    'AI_MAX_RETRIES': ('ai_max_retries', int, 3),
+    'AI_WORKERS': ('ai_workers', int, 2),
+    'AI_RATE_PER_MINUTE': ('ai_rate_per_minute', float, 20.0),
+    'AI_BURST': ('ai_burst', int, 3),
+    'AI_CACHE_ENABLED': ('ai_cache_enabled', _to_bool, False),
+    'AI_CACHE_MAX_ENTRIES': ('ai_cache_max_entries', int, 500),
+    'AI_CACHE_TTL': ('ai_cache_ttl', float, 7 * 24 * 3600),
+    'REMINDER_MAX_WAIT_MS': ('reminder_max_wait_ms', int, 60000),
+    'PIXMAP_CACHE_KB': ('pixmap_cache_kb', int, 64 * 1024),
+    'THUMB_CACHE_MB': ('thumb_cache_mb', int, 256),
+}
+
+
+class Settings:
+    # Снимок настроек: атрибуты из FIELDS уже приведены к своим типам.
+    # values: словарь переменных .env (и окружения); некорректные значения заменяются значениями по умолчанию
+    def __init__(self, values: dict):
+        for name, (attr, convert, default) in FIELDS.items():
+            raw = values.get(name)
+            value = default
+            if raw is not None and str(raw).strip() != '':
+                try:
+                    value = convert(str(raw).strip())
+                except ValueError:
+                    print(f"[settings] Некорректное значение {name}={raw!r}, используется {default!r}")
+            setattr(self, attr, value)
+
+    # Задан ли настоящий ключ API (не пустой и не заглушка из env.example)
+    @property
+    def has_api_key(self) -> bool:
+        return bool(self.api_key) and self.api_key != PLACEHOLDER_API_KEY
+
+
+_lock = threading.Lock()
+_current = None
+# Время модификации прочитанного .env (None — файла не было) и момент последней сверки
+_mtime = None
+_checked = 0.0
+
+
+def _file_mtime():
+    try:
+        return os.stat(ENV_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+# Разбор .env; значения файла важнее переменных окружения (как load_dotenv(override=True))
+def _load() -> Settings:
+    from dotenv import dotenv_values
+    values = {name: os.environ[name] for name in FIELDS if name in os.environ}
+    if ENV_PATH.exists():
+        values.update({k: v for k, v in dotenv_values(ENV_PATH).items() if v is not None})
+    return Settings(values)
+
+
+# Текущие настройки. Файл перечитывается, только если он изменился с прошлого чтения
+def get() -> Settings:
+    global _current, _mtime, _checked
+    now = time.monotonic()
+    current = _current
+    if current is not None and now - _checked < CHECK_INTERVAL:
+        return current
+    with _lock:
+        mtime = _file_mtime()
+        if _current is None or mtime != _mtime:
+            _current = _load()
+            _mtime = mtime
+        _checked = now
+        return _current
+
+
+# Сброс прочитанных настроек: следующий get() перечитает файл
+def invalidate():
+    global _current
+    with _lock:
+        _current = None
+
+
+# Запись переменных в .env с сохранением остальных строк и комментариев.
+# values: имя переменной -> значение (строкой); файл подменяется атомарно
+def update(values: dict):
+    global _current
+    with _lock:
+        lines = []
+        if ENV_PATH.exists():
+            with open(ENV_PATH, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        else:
+            lines = list(ENV_HEADER)
+
+        pending = dict(values)
+        for i, line in enumerate(lines):
+            name = line.split('=', 1)[0].strip()
+            if '=' in line and name in pending:
+                lines[i] = f'{name}={pending.pop(name)}\n'
+        if pending:
+            # удаляем пустые строки в конце и дописываем новые переменные
+            while lines and lines[-1].strip() == '':
+                lines.pop()
+            if lines and not lines[-1].endswith('\n'):
+                lines[-1] += '\n'
+            lines.extend(f'{name}={value}\n' for name, value in pending.items())
+
+        fd, tmp = tempfile.mkstemp(prefix='.env.', suffix='.tmp', dir=ENV_PATH.parent)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, ENV_PATH)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        _current = None
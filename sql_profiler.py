@@ -0,0 +1,310 @@
+# sql_profiler.py
+# Профилировщик SQL: число выполнений и гистограмма задержек каждого запроса (по нормализованному
+# тексту — литералы заменены на ?), журнал медленных запросов с планом EXPLAIN QUERY PLAN.
+# Выключен по умолчанию и тогда ничего не стоит: подключения БД работают без обработчиков.
+# После enable() каждое подключение при следующем db.get_conn() получает:
+#   - set_trace_callback: счётчик выполнений каждого выражения, включая каждую строку executemany,
+#     срабатывания триггеров и внутренние выражения FTS5;
+#   - set_progress_handler: число шагов виртуальной машины SQLite на выражение (цена запроса
+#     без учёта ожидания блокировок и кэша ОС);
+#   - замер времени вокруг execute/executemany. В sqlite3 нет обработчика окончания выражения,
+#     поэтому время SELECT — до первой строки результата: для fetchall()/fetchone() сразу после
+#     execute (как в models.py) это почти всё время запроса.
+# Статистика — в окне диагностики (Ctrl+Shift+D в главном окне) и в JSON (dump)
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+# Верхние границы корзин гистограммы задержек, мс (последняя — всё, что дольше)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf'))
+# Через сколько инструкций виртуальной машины SQLite вызывается обработчик прогресса
+PROGRESS_STEPS = 1000
+# Сколько последних медленных запросов хранится в памяти (журнал в файле — целиком)
+SLOW_KEEP = 200
+# Длина текста параметров в журнале медленных запросов (при log_params)
+PARAMS_MAX = 200
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\bX'[0-9A-Fa-f]*'|(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b|\bNULL\b")
+_SPACES = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)', re.IGNORECASE)
+
+
+# Нормализованный текст запроса: одна строка, литералы (в том числе подставленные трассировкой
+# значения параметров) заменены на ?, списки IN (?, ?, ...) свёрнуты
+def normalize(sql: str) -> str:
+    sql = _SPACES.sub(' ', sql).strip()
+    if sql.startswith('--'):
+        # внутренние выражения SQLite (FTS5, триггеры) трассировка сообщает с префиксом --
+        return sql
+    sql = _LITERALS.sub('?', sql)
+    return _IN_LIST.sub('IN (?, ...)', sql)
+
+
+# normalize с кэшем — только для текста, переданного в execute (с ? вместо значений).
+# Текст из трассировки не кэшируется: в нём подставлены значения параметров (тексты заметок,
+# ключи API), и кэш держал бы их в памяти всё время работы профилировщика
+_normalize_query = lru_cache(maxsize=4096)(normalize)
+
+
+class QueryStats:
+    def __init__(self):
+        # executions — выполнения по трассировке; calls — замеренные вызовы execute/executemany
+        self.executions = 0
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.vm_steps = 0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, ms: float, steps: int):
+        self.calls += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.vm_steps += steps
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    # Перцентиль по гистограмме: верхняя граница корзины (для последней — максимум)
+    def percentile(self, p: float) -> float:
+        if not self.calls:
+            return 0.0
+        rank = p / 100 * self.calls
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self, sql: str) -> dict:
+        return {
+            'sql': sql,
+            'executions': self.executions,
+            'calls': self.calls,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.calls, 4) if self.calls else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 3),
+            'vm_steps': self.vm_steps,
+            'histogram': {
+                ('inf' if bound == float('inf') else f'{bound:g}'): n
+                for bound, n in zip(BUCKETS_MS, self.buckets) if n
+            },
+        }
+
+
+# Состояние профилирования одного подключения (подключение используется одним потоком)
+class _ConnState:
+    def __init__(self):
+        self.steps = 0
+        # идёт служебный запрос профилировщика (EXPLAIN) — его не учитываем
+        self.internal = False
+
+
+class SqlProfiler:
+    # slow_ms: запросы дольше — в журнал медленных запросов с планом выполнения
+    # log_path: файл журнала (JSON-строки) или None — только в памяти
+    # log_params: записывать в журнал значения параметров. По умолчанию — только их число и типы:
+    #   в параметрах пароли, тексты заметок и промпты, а журнал — обычный текстовый файл
+    def __init__(self, slow_ms: float = 50, log_path=None, log_params: bool = False):
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self.log_params = log_params
+        self.started = datetime.now().isoformat(timespec='seconds')
+        self._stats = {}
+        self._slow = deque(maxlen=SLOW_KEEP)
+        # план выполнения по нормализованному запросу: EXPLAIN выполняется один раз на запрос
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    # Подключение обработчиков к подключению; вызывается из db.get_conn в потоке подключения
+    def install(self, conn):
+        state = _ConnState()
+
+        def trace(sql):
+            if state.internal:
+                return
+            key = normalize(sql)
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = QueryStats()
+                stats.executions += 1
+
+        def progress():
+            state.steps += PROGRESS_STEPS
+            return 0
+
+        def timed(method):
+            def call(sql, parameters=()):
+                state.steps = 0
+                started = time.perf_counter()
+                try:
+                    return method(sql, parameters)
+                finally:
+                    ms = (time.perf_counter() - started) * 1000
+                    if not state.internal:
+                        self._record(conn, state, sql, parameters, ms, method is base_executemany)
+            return call
+
+        base_execute = sqlite3.Connection.execute.__get__(conn)
+        base_executemany = sqlite3.Connection.executemany.__get__(conn)
+        conn.set_trace_callback(trace)
+        conn.set_progress_handler(progress, PROGRESS_STEPS)
+        # атрибуты экземпляра перекрывают методы класса (db._Connection)
+        conn.execute = timed(base_execute)
+        conn.executemany = timed(base_executemany)
+
+    # Снятие обработчиков (профилировщик выключен или заменён)
+    @staticmethod
+    def uninstall(conn):
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+        for name in ('execute', 'executemany'):
+            conn.__dict__.pop(name, None)
+
+    def _record(self, conn, state, sql: str, parameters, ms: float, many: bool):
+        key = _normalize_query(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.add(ms, state.steps)
+            plan = self._plans.get(key)
+        if ms < self.slow_ms:
+            return
+        if plan is None:
+            # план — по первому набору параметров (для executemany — по первой строке)
+            first = None
+            if many:
+                try:
+                    first = next(iter(parameters), None)
+                except TypeError:
+                    first = None
+            plan = self._explain(conn, state, sql, first if many else parameters)
+            with self._lock:
+                self._plans[key] = plan
+        entry = {
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'ms': round(ms, 3),
+            'sql': key,
+            'params': _short(parameters, many) if self.log_params else _param_types(parameters, many),
+            'vm_steps': state.steps,
+            'thread': threading.current_thread().name,
+            'plan': plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        if self.log_path is not None:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            except OSError as e:
+                print(f"[sql_profiler] Не удалось записать журнал медленных запросов: {e}")
+
+    # План выполнения запроса (строки EXPLAIN QUERY PLAN); для выражений без плана — пустой список
+    @staticmethod
+    def _explain(conn, state, sql: str, parameters):
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ''
+        if head not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+            return []
+        state.internal = True
+        try:
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, parameters or ()).fetchall()
+            return [row[-1] for row in rows]
+        except (sqlite3.Error, ValueError) as e:
+            return [f'EXPLAIN не выполнен: {e}']
+        finally:
+            state.internal = False
+
+    # Снимок статистики: запросы по убыванию суммарного времени и последние медленные запросы
+    def snapshot(self) -> dict:
+        with self._lock:
+            queries = [stats.as_dict(sql) for sql, stats in self._stats.items()]
+            slow = list(self._slow)
+        queries.sort(key=lambda q: (q['total_ms'], q['executions']), reverse=True)
+        return {
+            'started': self.started,
+            'slow_ms': self.slow_ms,
+            'buckets_ms': ['inf' if b == float('inf') else b for b in BUCKETS_MS],
+            'queries': queries,
+            'slow': slow,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._plans.clear()
+        self.started = datetime.now().isoformat(timespec='seconds')
+
+    # Сохранение снимка статистики в JSON
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+
+# Параметры запроса без значений: число и типы
+def _param_types(parameters, many: bool) -> str:
+    if many:
+        return f'{len(parameters)} строк' if hasattr(parameters, '__len__') else 'executemany'
+    if not parameters:
+        return '()'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{name}: {type(v).__name__}' for name, v in parameters.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+
+
+# Значения параметров, обрезанные до PARAMS_MAX символов (только при log_params)
+def _short(parameters, many: bool) -> str:
+    text = f'{len(parameters)} строк' if many and hasattr(parameters, '__len__') else repr(parameters)
+    return text if len(text) <= PARAMS_MAX else text[:PARAMS_MAX] + '…'
+
+
+_profiler = None
+
+
+# Включение профилирования для всех подключений (подхватывается при следующем db.get_conn).
+# Повторный вызов меняет порог, статистика сохраняется.
+# log_params — записывать в журнал значения параметров (None — оставить как есть, по умолчанию выключено)
+def enable(slow_ms: float = 50, log_path=None, log_params: bool = None) -> SqlProfiler:
+    global _profiler
+    import db
+    if _profiler is None:
+        if log_path is None:
+            from paths import get_app_data_path
+            log_path = get_app_data_path() / 'sql_slow.log'
+        _profiler = SqlProfiler(slow_ms, log_path, bool(log_params))
+    else:
+        _profiler.slow_ms = slow_ms
+        if log_params is not None:
+            _profiler.log_params = log_params
+    if db.get_profiler() is not _profiler:
+        db.set_profiler(_profiler)
+    return _profiler
+
+
+# Выключение: подключения снимут обработчики при следующем db.get_conn; накопленная статистика остаётся в get()
+def disable():
+    import db
+    db.set_profiler(None)
+
+
+# Текущий (или последний включённый) профилировщик либо None
+def get():
+    return _profiler
+
+
+def is_enabled() -> bool:
+    import db
+    return _profiler is not None and db.get_profiler() is _profiler
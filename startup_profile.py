@@ -0,0 +1,141 @@
+# startup_profile.py
+# Профиль холодного старта (python main.py --profile-startup): время импорта модулей
+# и отметки этапов запуска до первой отрисовки и первого свободного цикла событий окна входа.
+# Без флага модуль ничего не перехватывает и почти ничего не стоит
+import json
+import sys
+import threading
+import time
+
+# Момент запуска процесса, от которого считаются все отметки
+_T0 = time.perf_counter()
+
+_enabled = False
+# Этапы запуска: [(название, мс от старта)]
+_marks = []
+# Импорты: имя модуля -> [полное время, собственное время без вложенных импортов], мс
+_imports = {}
+# Стек вложенных импортов своего потока (фоновая предзагрузка импортирует параллельно)
+_local = threading.local()
+
+
+class _TimedLoader:
+    # Обёртка загрузчика: замеряет создание и выполнение модуля, вычитая время вложенных импортов
+    # (модули расширений, например PyQt6, загружают разделяемую библиотеку в create_module)
+    def __init__(self, loader):
+        self._loader = loader
+        self._create_ms = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        start = time.perf_counter()
+        try:
+            return self._loader.create_module(spec)
+        finally:
+            self._create_ms = (time.perf_counter() - start) * 1000
+
+    def exec_module(self, module):
+        _stack = getattr(_local, 'stack', None)
+        if _stack is None:
+            _stack = _local.stack = []
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            total = (time.perf_counter() - start) * 1000 + self._create_ms
+            nested = _stack.pop()
+            if _stack:
+                _stack[-1] += total
+            _imports[module.__name__] = [total, total - nested]
+
+
+class _TimingFinder:
+    # Поисковик модулей в начале sys.meta_path: находит модуль остальными
+    # поисковиками и подменяет загрузчик на замеряющий
+    @classmethod
+    def find_spec(cls, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is cls or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+# Включение профиля: вызывать до импорта профилируемых модулей
+def enable():
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    sys.meta_path.insert(0, _TimingFinder)
+    mark('профиль включён')
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+# Отметка этапа запуска
+def mark(name: str):
+    if _enabled:
+        _marks.append((name, (time.perf_counter() - _T0) * 1000))
+
+
+# Отметки первой отрисовки окна и первого свободного цикла событий после неё
+# (окно уже отвечает на ввод); затем вызывается on_interactive
+def watch_first_paint(window, on_interactive=None):
+    from PyQt6.QtCore import QObject, QEvent, QTimer
+
+    class _PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                obj.removeEventFilter(self)
+                mark('первая отрисовка окна входа')
+                QTimer.singleShot(0, self._interactive)
+            return False
+
+        def _interactive(self):
+            mark('окно входа готово к вводу')
+            self.deleteLater()
+            if on_interactive is not None:
+                on_interactive()
+
+    watcher = _PaintWatcher(window)
+    window.installEventFilter(watcher)
+
+
+# Отчёт: этапы, самые долгие импорты, итоговое время до готовности окна
+def report(top: int = 15) -> dict:
+    ready = next((t for name, t in _marks if name == 'окно входа готово к вводу'), None)
+    return {
+        'time_to_interactive_ms': round(ready, 1) if ready is not None else None,
+        'marks': [{'name': name, 'ms': round(t, 1)} for name, t in _marks],
+        'imports': [
+            {'module': name, 'total_ms': round(total, 2), 'self_ms': round(own, 2)}
+            for name, (total, own) in sorted(_imports.items(), key=lambda kv: -kv[1][1])[:top]
+        ],
+        'modules_imported': len(_imports),
+    }
+
+
+# Печать отчёта и (если задан path) сохранение его в JSON
+def dump(path=None):
+    data = report()
+    print("[startup] Этапы запуска, мс от старта процесса:")
+    for m in data['marks']:
+        print(f"  {m['ms']:8.1f}  {m['name']}")
+    print(f"[startup] Импортировано модулей: {data['modules_imported']}, самые долгие (собственное / полное время, мс):")
+    for imp in data['imports']:
+        print(f"  {imp['self_ms']:8.2f} / {imp['total_ms']:8.2f}  {imp['module']}")
+    print(f"[startup] До готовности окна входа: {data['time_to_interactive_ms']} мс")
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    return data
@@ -1,14 +1,26 @@
 # ai_list.py
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem, QHBoxLayout, QMessageBox
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListView, QHBoxLayout, QMessageBox, QAbstractItemView
+from PyQt6.QtCore import QModelIndex
+from ui import db_async
+from ui.list_model import PagedListModel, ID_ROLE
+from ui.search import SearchBox, HtmlItemDelegate, result_html
+from ui.shell import navigate
+
+# Пометка строки по статусу запроса в очереди (выполненные запросы без пометки)
+STATUS_LABELS = {
+    'queued': 'в очереди',
+    'running': 'выполняется',
+    'failed': 'ошибка',
+    'cancelled': 'отменён',
+}
+
 class AIList(QWidget):
-    def __init__(self, user, scheduler=None):
+    def __init__(self, user):
         super().__init__()
         self.user = user
-        self.scheduler = scheduler
         self.setWindowTitle('Искусственный интеллект')
         self._build()
         self.load()
-        self.showMaximized()
 
     # Построение интерфейса списка AI запросов с кнопками управления
     def _build(self):
@@ -25,79 +37,122 @@ class AIList(QWidget):
         v.addLayout(top_layout)
         
         self.btn_new = QPushButton('Создать новый запрос')
-        self.listw = QListWidget()
-        self.btn_delete = QPushButton('Удалить выбранный запрос')
+        self.search = SearchBox('Поиск по запросам и ответам...')
+        self.search.search_requested.connect(lambda _: self.load())
+        self.model = PagedListModel(self._fetch_page, 'requestID', self._format_row)
+        self.listw = QListView()
+        self.listw.setModel(self.model)
+        self.listw.setUniformItemSizes(True)
+        self.listw.setItemDelegate(HtmlItemDelegate(self.listw))
+        # выделение нескольких строк (Shift/Ctrl) для удаления одной операцией
+        self.listw.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.btn_delete = QPushButton('Удалить выбранные запросы')
         self.btn_delete.setStyleSheet("QPushButton { background-color: #dc3545; color: white; padding: 8px; }")
         self.btn_delete.clicked.connect(self.delete_request)
         
         v.addWidget(self.btn_new)
+        v.addWidget(self.search)
         v.addWidget(self.listw)
         v.addWidget(self.btn_delete)
         self.setLayout(v)
 
         self.btn_new.clicked.connect(self.create_request)
-        self.listw.itemDoubleClicked.connect(self.open_request)
+        self.listw.doubleClicked.connect(self.open_request)
     
+    # Показ списка в главном окне; saved — запрос из окна чата: если он уже записан в БД,
+    # его строка добавляется без перезагрузки списка
+    def activate(self, saved=None):
+        if saved is None or saved.requestID is None:
+            return
+        if self.search.text().strip():
+            self.load()
+            return
+        self.model.upsert_row(
+            {'requestID': saved.requestID, 'prompt': saved.prompt, 'created': saved.created,
+             'status': saved.status},
+            lambda it: (it['created'], it['requestID']), descending=True,
+        )
+
     # Возврат в главное меню
     def go_back(self):
-        from ui.main_menu import MainMenu
-        self.main_menu = MainMenu(self.user, self.scheduler)
-        self.main_menu.show()
-        self.close()
+        navigate(self, 'show_menu')
+
+    # Страница истории AI запросов после строки last (keyset-пагинация по created, requestID)
+    def _fetch_page(self, limit, last):
+        after = (last['created'], last['requestID']) if last else None
+        return self.user.get_ai_history(limit, after)
+
+    # Текст строки списка AI запросов (сокращение длинных промптов, статус невыполненных запросов)
+    def _format_row(self, it):
+        prompt = (it['prompt'][:20] + '...') if len(it['prompt']) > 20 else it['prompt']
+        label = STATUS_LABELS.get(it.get('status'))
+        return f"{prompt} — {it['created']}" + (f" [{label}]" if label else '')
 
-    # Загрузка списка AI запросов из базы данных и отображение в виджете (сокращение длинных промптов)
+    # Загрузка истории AI запросов в модель (строки подгружаются страницами при прокрутке);
+    # при непустой строке поиска — результаты полнотекстового поиска со сниппетами
     def load(self):
-        self.listw.clear()
-        items = self.user.get_ai_history()
-        for it in items:
-            prompt = (it['prompt'][:20] + '...') if len(it['prompt']) > 20 else it['prompt']
-            lw = QListWidgetItem(f"{prompt} — {it['created']}")
-            lw.setData(1000, it['requestID'])
-            self.listw.addItem(lw)
+        query = self.search.text().strip()
+        if query:
+            self.listw.setUniformItemSizes(False)
+            self.model.set_source(
+                lambda limit, last: [] if last else self.user.search_ai_history(query),
+                self._format_row,
+                lambda it: result_html(
+                    (it['prompt'][:40] + '...') if len(it['prompt']) > 40 else it['prompt'],
+                    it['snippet'], it['created'],
+                ),
+            )
+        else:
+            self.listw.setUniformItemSizes(True)
+            self.model.set_source(self._fetch_page, self._format_row)
 
     # Создание нового AI запроса: открытие окна запроса
     def create_request(self):
-        from ui.ai_request import AIRequestWindow
-        self.req = AIRequestWindow(self.user, scheduler=self.scheduler)
-        self.req.show()
-        self.close()
+        navigate(self, 'open_ai_request')
 
     # Открытие выбранного AI запроса для просмотра с проверкой прав доступа
-    def open_request(self, item: QListWidgetItem):
-        req_id = item.data(1000)
+    def open_request(self, index: QModelIndex):
         from models import AIRequest
-        r = AIRequest.load_by_id(req_id)
+        db_async.run(AIRequest.load_by_id, index.data(ID_ROLE), on_done=self._on_open_loaded)
+
+    # Запись для открытия загружена (в потоке интерфейса)
+    def _on_open_loaded(self, r):
         if not r or r.userID != self.user.userID:
             QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
             return
-        from ui.ai_request import AIRequestWindow
-        self.req = AIRequestWindow(self.user, r, scheduler=self.scheduler)
-        self.req.show()
-        self.close()
+        navigate(self, 'open_ai_request', r)
 
-    # Удаление выбранного AI запроса с подтверждением и проверкой прав доступа
+    # Удаление выбранных запросов одной транзакцией с одним подтверждением;
+    # права доступа проверяет AIRequest.delete_many (чужие записи не удаляются)
     def delete_request(self):
-        current_item = self.listw.currentItem()
-        if not current_item:
+        indexes = self.listw.selectionModel().selectedIndexes()
+        if not indexes:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите запрос для удаления')
             return
-        
-        req_id = current_item.data(1000)
-        from models import AIRequest
-        r = AIRequest.load_by_id(req_id)
-        if not r or r.userID != self.user.userID:
-            QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
-            return
-        
+        if len(indexes) == 1:
+            question = f'Вы уверены, что хотите удалить запрос "{indexes[0].data()}"?'
+        else:
+            question = f'Вы уверены, что хотите удалить выбранные запросы ({len(indexes)})?'
         reply = QMessageBox.question(
-            self, 
-            'Подтверждение удаления', 
-            f'Вы уверены, что хотите удалить запрос "{current_item.text()}"?',
+            self,
+            'Подтверждение удаления',
+            question,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No
         )
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            r.delete()
-            self.load()
-            QMessageBox.information(self, 'Успех', 'Запрос удалён')
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        from models import AIRequest
+        ids = [index.data(ID_ROLE) for index in indexes]
+        db_async.run(
+            AIRequest.delete_many, self.user.userID, ids, write=True,
+            on_done=lambda result: self._on_deleted(ids, result[1]),
+        )
+
+    # Записи удалены из БД: выбранные строки убираются из модели без перезагрузки списка, в том числе
+    # строки, которых в БД уже не было (удалены другим экземпляром или предыдущим нажатием).
+    # refused — чужие записи: только об отказе в их удалении выводится предупреждение
+    def _on_deleted(self, requested, refused):
+        self.model.remove_ids(set(requested).difference(refused))
+        if refused:
+            QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
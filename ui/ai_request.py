@@ -1,26 +1,37 @@
 # ai_request.py
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QPushButton,
-    QMessageBox, QApplication
+    QMessageBox, QApplication, QCheckBox
 )
 
-from PyQt6.QtCore import Qt, QTimer
-import os
-from dotenv import load_dotenv
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QTextCursor
 from models import AIRequest
-from paths import get_app_data_path
-import threading
+import ai_queue
+import settings
+from ui import db_async
+from ui.shell import navigate
+
+# Текст в поле ответа, пока задание ждёт своей очереди или первого фрагмента ответа
+QUEUED_TEXT = "_Запрос в очереди..._"
+RUNNING_TEXT = "_Запрос отправлен, подождите, пожалуйста..._"
+
 
 class AIRequestWindow(QWidget):
-    def __init__(self, user, request: AIRequest = None, scheduler=None):
+    # Запросы выполняет очередь ai_queue: окно показывает ход последнего отправленного
+    # (или открытого) запроса, остальные выполняются в фоне, пока пользователь работает дальше
+    def __init__(self, user, request: AIRequest = None):
         super().__init__()
         self.user = user
         self.request = request
-        self.scheduler = scheduler
-        self._sending = False  # Флаг для предотвращения повторных отправок
         self.setWindowTitle('AI — Чат')
+        # Получен ли уже хотя бы один фрагмент потокового ответа
+        self._streaming = False
+        self._queue = ai_queue.get_queue()
+        self._queue.job_started.connect(self._on_started)
+        self._queue.job_delta.connect(self._on_delta)
+        self._queue.job_finished.connect(self._on_finished)
         self._build()
-        self.showMaximized()
         if self.request:
             self.load()
 
@@ -54,26 +65,36 @@ class AIRequestWindow(QWidget):
         # Кнопки действий
         self.btn_send = QPushButton('Отправить')
         self.btn_send.clicked.connect(self.send)
+        # Отмена показанного запроса, пока он в очереди или выполняется
+        self.btn_cancel = QPushButton('Отменить запрос')
+        self.btn_cancel.clicked.connect(self.cancel)
+        self.btn_cancel.hide()
+        # Обход кэша ответов: запрос уйдёт в API, даже если такой же ответ уже есть
+        self.chk_no_cache = QCheckBox('Не использовать кэш ответов')
 
         main_layout.addWidget(self.lbl_user)
         main_layout.addWidget(self.prompt)
         main_layout.addWidget(self.lbl_response)
         main_layout.addWidget(self.btn_copy, alignment=Qt.AlignmentFlag.AlignRight)
+        main_layout.addWidget(self.chk_no_cache)
         main_layout.addWidget(self.btn_send)
+        main_layout.addWidget(self.btn_cancel)
 
         self.setLayout(main_layout)
 
     # Загрузка существующего AI запроса в форму для просмотра
     def load(self):
         self.prompt.setPlainText(self.request.prompt)
-        self.lbl_response.setMarkdown(self.request.response or '')
-
-    # Отправка AI запроса: валидация промпта, запуск запроса в отдельном потоке и периодическая проверка ответа
+        pending = self.request.status in (AIRequest.QUEUED, AIRequest.RUNNING)
+        if pending:
+            # уже полученные фрагменты не сохраняются до конца ответа — допишутся новые
+            self.lbl_response.setMarkdown(QUEUED_TEXT if self.request.status == AIRequest.QUEUED else RUNNING_TEXT)
+        else:
+            self.lbl_response.setMarkdown(self.request.response or '')
+        self.btn_cancel.setVisible(pending)
+
+    # Отправка AI запроса: валидация промпта и постановка запроса в очередь
     def send(self):
-        # Предотвращаем повторные отправки
-        if self._sending:
-            return
-        
         text = self.prompt.toPlainText().strip()
         if not text:
             self.lbl_response.setMarkdown('**Ошибка:** заполните запрос')
@@ -97,88 +118,75 @@ class AIRequestWindow(QWidget):
             return
 
         # Проверяем наличие ключа до любой попытки отправки
-        # Загружаем .env из папки приложения (работает в обычном проекте и в exe)
-        env_path = get_app_data_path() / '.env'
-        load_dotenv(env_path, override=True)
-        api_key = os.getenv('DEEPSEEK_API_KEY')
-        if not api_key:
+        # заглушка из env.example (your_api_key_here) — тоже отсутствующий ключ
+        if not settings.get().has_api_key:
             self.lbl_response.setMarkdown(
                 "**Ошибка:** отсутствует ключ `DEEPSEEK_API_KEY`. Добавьте его в файл `.env`."
             )
             return
 
-        # Блокируем повторные отправки
-        self._sending = True
+        # запрос записывается в БД со статусом queued и только затем передаётся очереди:
+        # при закрытии приложения он выполнится после следующего запуска
         self.btn_send.setEnabled(False)
-        self.btn_send.setText('Отправка...')
-        self.lbl_response.setMarkdown("_Запрос отправлен, подождите, пожалуйста..._")
-
-        # создаём объект запроса
-        self.request = AIRequest(self.user.userID, text)
-
-        # запускаем отправку запроса в отдельном потоке
-        threading.Thread(target=self._send_request_thread, daemon=True).start()
-
-        # запускаем таймер для проверки ответа
-        self.check_timer = QTimer(self)
-        self.check_timer.timeout.connect(self.check_response)
-        self.check_timer.start(2000)  # проверка каждые 2 секунды
-
-    # Выполнение отправки запроса к AI API в отдельном потоке для неблокирующей работы UI
-    def _send_request_thread(self):
-        try:
-            self.request.send()  # вызов метода send, который логирует и пишет в БД
-        except Exception as e:
-            # Если запрос не был сохранен в БД, сохраняем ошибку напрямую
-            if not self.request.requestID:
-                self.request.response = f"Ошибка при отправке: {e}"
-                # Сохраняем ошибку в БД
-                from datetime import datetime
-                from db import get_conn
-                now = datetime.utcnow().isoformat()
-                conn = get_conn()
-                cur = conn.cursor()
-                cur.execute(
-                    'INSERT INTO ai_requests (userID, prompt, response, created) VALUES (?, ?, ?, ?)',
-                    (self.request.userID, self.request.prompt, self.request.response, now),
-                )
-                self.request.requestID = cur.lastrowid
-                self.request.created = now
-                conn.commit()
-                conn.close()
-            else:
-                # Если запрос уже был сохранен, просто обновляем ответ
-                self.request.response = f"Ошибка при отправке: {e}"
-                from db import get_conn
-                conn = get_conn()
-                cur = conn.cursor()
-                cur.execute(
-                    'UPDATE ai_requests SET response = ? WHERE requestID = ? AND userID = ?',
-                    (self.request.response, self.request.requestID, self.request.userID),
-                )
-                conn.commit()
-                conn.close()
-            print(f"[AIRequestWindow] Ошибка отправки запроса: {e}")
-            # Разблокируем кнопку при ошибке
-            self._sending = False
-            # Используем QTimer для безопасного обновления UI из другого потока
-            QTimer.singleShot(0, lambda: (
-                self.btn_send.setEnabled(True),
-                self.btn_send.setText('Отправить')
-            ))
-
-    # Периодическая проверка наличия ответа от AI API и обновление интерфейса
-    def check_response(self):
-        if not self.request or not self.request.requestID:
+        use_cache = not self.chk_no_cache.isChecked()
+        db_async.run(
+            AIRequest.enqueue, self.user.userID, text, use_cache, write=True,
+            on_done=self._on_enqueued, on_error=self._on_enqueue_failed,
+        )
+
+    # Запрос записан в БД: передаём его очереди и показываем его ход
+    def _on_enqueued(self, request: AIRequest):
+        self.btn_send.setEnabled(True)
+        self.request = request
+        self._streaming = False
+        self.lbl_response.setMarkdown(QUEUED_TEXT)
+        self.btn_cancel.show()
+        self._queue.submit(request)
+
+    def _on_enqueue_failed(self, error):
+        self.btn_send.setEnabled(True)
+        self.lbl_response.setMarkdown(f"**Ошибка:** не удалось поставить запрос в очередь: {error}")
+
+    # Отмена показанного запроса
+    def cancel(self):
+        if self.request is not None and self.request.requestID is not None:
+            self._queue.cancel(self.request.requestID)
+            self.btn_cancel.setEnabled(False)
+
+    # Относится ли событие очереди к показанному запросу
+    def _is_current(self, request_id: int) -> bool:
+        return self.request is not None and self.request.requestID == request_id
+
+    # Задание начало выполняться
+    def _on_started(self, request_id: int):
+        if self._is_current(request_id) and not self._streaming:
+            self.request.status = AIRequest.RUNNING
+            self.lbl_response.setMarkdown(RUNNING_TEXT)
+
+    # Добавление очередного фрагмента ответа в конец поля ответа
+    def _on_delta(self, request_id: int, delta: str):
+        if not self._is_current(request_id):
             return
-        updated_request = AIRequest.load_by_id(self.request.requestID)
-        if updated_request and updated_request.response:
-            self.lbl_response.setMarkdown(updated_request.response)
-            self.check_timer.stop()
-            # Разблокируем кнопку отправки
-            self._sending = False
-            self.btn_send.setEnabled(True)
-            self.btn_send.setText('Отправить')
+        if not self._streaming:
+            # первый фрагмент заменяет сообщение «подождите»
+            self._streaming = True
+            self.lbl_response.clear()
+        self.lbl_response.moveCursor(QTextCursor.MoveOperation.End)
+        self.lbl_response.insertPlainText(delta)
+        self.lbl_response.ensureCursorVisible()
+
+    # Завершение задания: итоговый ответ отрисовывается как Markdown
+    def _on_finished(self, request_id: int, status: str, response: str):
+        if not self._is_current(request_id):
+            return
+        self.request.status = status
+        self.request.response = response
+        if status == AIRequest.CANCELLED:
+            response = (response + '\n\n' if response else '') + '_Запрос отменён_'
+        self.lbl_response.setMarkdown(response)
+        self._streaming = False
+        self.btn_cancel.hide()
+        self.btn_cancel.setEnabled(True)
 
     # Копирование ответа AI в буфер обмена
     def copy_response(self):
@@ -187,17 +195,6 @@ class AIRequestWindow(QWidget):
             QApplication.clipboard().setText(text)
             QMessageBox.information(self, "Скопировано", "Ответ скопирован в буфер обмена")
 
-    # Остановка таймера при закрытии окна
-    def closeEvent(self, event):
-        if hasattr(self, 'check_timer'):
-            self.check_timer.stop()
-        super().closeEvent(event)
-
     # Возврат к списку AI запросов
     def back(self):
-        if hasattr(self, 'check_timer'):
-            self.check_timer.stop()
-        from ui.ai_list import AIList
-        self.listw = AIList(self.user, self.scheduler)
-        self.listw.show()
-        self.close()
\ No newline at end of file
+        navigate(self, 'show_ai', saved=self.request)
\ No newline at end of file
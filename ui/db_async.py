@@ -0,0 +1,61 @@
+# db_async.py
+# Вызовы БД из интерфейса без ожидания SQLite в потоке Qt: функция выполняется в потоке БД
+# (db_worker.py), а on_done/on_error вызываются уже в потоке интерфейса
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot
+from db_worker import get_worker
+
+
+class _Dispatcher(QObject):
+    # Сигнал испускается из потока БД, слот выполняется в потоке, где создан диспетчер
+    call = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.call.connect(self._invoke)
+
+    @pyqtSlot(object)
+    def _invoke(self, fn):
+        try:
+            fn()
+        except Exception as e:
+            print(f"[db] Ошибка в обработчике результата: {e}")
+
+
+_dispatcher = None
+
+
+def _get_dispatcher() -> _Dispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = _Dispatcher()
+    return _dispatcher
+
+
+# Выполнение fn(*args, **kwargs) в потоке БД.
+# on_done(result) / on_error(exc) вызываются в потоке интерфейса; без on_error ошибка печатается.
+# write=True — вызов меняет данные (может попасть в общий коммит с соседними записями).
+# Возвращает concurrent.futures.Future
+def run(fn, *args, on_done=None, on_error=None, write: bool = False, **kwargs):
+    dispatcher = _get_dispatcher()
+    future = get_worker().submit(fn, *args, write=write, **kwargs)
+
+    def finished(f):
+        if f.cancelled():
+            return
+        error = f.exception()
+        if error is not None:
+            if on_error is not None:
+                dispatcher.call.emit(lambda: on_error(error))
+            else:
+                print(f"[db] Ошибка запроса: {error}")
+        elif on_done is not None:
+            result = f.result()
+            dispatcher.call.emit(lambda: on_done(result))
+
+    future.add_done_callback(finished)
+    return future
+
+
+# Остановка потока БД с выполнением всех поставленных в очередь записей (при выходе из приложения)
+def shutdown():
+    get_worker().stop()
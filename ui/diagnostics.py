@@ -0,0 +1,143 @@
+# diagnostics.py
+# Скрытое окно диагностики (Ctrl+Shift+D в главном окне): профилирование SQL (sql_profiler) —
+# запросы по суммарному времени с перцентилями и последние медленные запросы с планами выполнения
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QDoubleSpinBox, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QPlainTextEdit, QSplitter, QFileDialog, QMessageBox, QHeaderView
+)
+from PyQt6.QtCore import Qt, QTimer
+import sql_profiler
+
+# Период обновления таблицы, пока окно открыто, мс
+REFRESH_MS = 1000
+COLUMNS = ('Запрос', 'Выполнений', 'Вызовов', 'Всего, мс', 'p50', 'p95', 'p99', 'Макс, мс', 'Шагов VM')
+
+
+class DiagnosticsDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle('Диагностика SQL')
+        self.resize(1000, 600)
+        self._build()
+        # таблица обновляется, только пока окно открыто
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._timer.start(REFRESH_MS)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def _build(self):
+        layout = QVBoxLayout()
+
+        top = QHBoxLayout()
+        self.chk_enabled = QCheckBox('Запись запросов')
+        self.chk_enabled.setChecked(sql_profiler.is_enabled())
+        self.chk_enabled.toggled.connect(self.set_enabled)
+        self.spin_slow = QDoubleSpinBox()
+        self.spin_slow.setRange(0.1, 60000)
+        self.spin_slow.setSuffix(' мс')
+        profiler = sql_profiler.get()
+        self.spin_slow.setValue(profiler.slow_ms if profiler else 50)
+        self.spin_slow.valueChanged.connect(self.set_slow_ms)
+        self.lbl_summary = QLabel()
+        self.btn_reset = QPushButton('Сбросить')
+        self.btn_reset.clicked.connect(self.reset)
+        self.btn_dump = QPushButton('Сохранить JSON...')
+        self.btn_dump.clicked.connect(self.dump)
+        top.addWidget(self.chk_enabled)
+        top.addWidget(QLabel('Медленные — дольше'))
+        top.addWidget(self.spin_slow)
+        top.addWidget(self.lbl_summary, 1)
+        top.addWidget(self.btn_reset)
+        top.addWidget(self.btn_dump)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.slow_log = QPlainTextEdit()
+        self.slow_log.setReadOnly(True)
+        self.slow_log.setPlaceholderText('Медленных запросов нет')
+
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        splitter.addWidget(self.table)
+        splitter.addWidget(self.slow_log)
+        layout.addLayout(top)
+        layout.addWidget(splitter)
+        self.setLayout(layout)
+
+    # Включение и выключение записи; накопленная статистика при выключении остаётся на экране
+    def set_enabled(self, enabled: bool):
+        if enabled:
+            sql_profiler.enable(self.spin_slow.value())
+        else:
+            sql_profiler.disable()
+        self.refresh()
+
+    def set_slow_ms(self, value: float):
+        profiler = sql_profiler.get()
+        if profiler is not None:
+            profiler.slow_ms = value
+
+    def reset(self):
+        profiler = sql_profiler.get()
+        if profiler is not None:
+            profiler.reset()
+        self.refresh()
+
+    def dump(self):
+        profiler = sql_profiler.get()
+        if profiler is None:
+            QMessageBox.information(self, 'Диагностика', 'Запись запросов ещё не включалась')
+            return
+        path, _ = QFileDialog.getSaveFileName(self, 'Сохранить статистику SQL', 'sql_profile.json', 'JSON (*.json)')
+        if not path:
+            return
+        try:
+            profiler.dump(path)
+        except OSError as e:
+            QMessageBox.warning(self, 'Ошибка', f'Не удалось сохранить файл: {e}')
+
+    # Перерисовка таблицы и журнала медленных запросов
+    def refresh(self):
+        profiler = sql_profiler.get()
+        if profiler is None:
+            self.lbl_summary.setText('Запись выключена')
+            return
+        snap = profiler.snapshot()
+        queries = snap['queries']
+        self.lbl_summary.setText(
+            f"с {snap['started']}: запросов {len(queries)}, "
+            f"{sum(q['calls'] for q in queries)} вызовов, {sum(q['total_ms'] for q in queries):.1f} мс"
+            + ('' if sql_profiler.is_enabled() else ' (запись выключена)')
+        )
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(queries))
+        for row, q in enumerate(queries):
+            values = (q['sql'], q['executions'], q['calls'], q['total_ms'], q['p50_ms'], q['p95_ms'],
+                      q['p99_ms'], q['max_ms'], q['vm_steps'])
+            for col, value in enumerate(values):
+                item = QTableWidgetItem()
+                if col == 0:
+                    item.setText(value)
+                    item.setToolTip(value)
+                else:
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(value, 3) if isinstance(value, float) else value)
+                self.table.setItem(row, col, item)
+        self.table.setSortingEnabled(True)
+
+        lines = []
+        for entry in reversed(snap['slow']):
+            lines.append(f"{entry['time']}  {entry['ms']} мс  [{entry['thread']}]  {entry['sql']}")
+            lines.append(f"    параметры: {entry['params']}")
+            lines.extend(f"    {step}" for step in entry['plan'])
+        text = '\n'.join(lines)
+        if text != self.slow_log.toPlainText():
+            self.slow_log.setPlainText(text)
@@ -0,0 +1,137 @@
+# image_loader.py
+# Загрузка изображений заметок: декодирование сразу в нужном размере (QImageReader.setScaledSize)
+# в пуле потоков и дисковый кэш миниатюр в storage/thumbs.
+# Ключ миниатюры — хэш содержимого изображения из имени файла хранилища и корзина ширины
+# (image_store.thumb_path); миниатюры удалённых изображений и превышение размера кэша убирает
+# image_store.collect_garbage.
+# В том же пуле выполняется сглаженное масштабирование уже декодированных копий под ширину окна
+import os
+import threading
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, QThread, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QImageIOHandler
+from image_store import thumb_path
+
+# Шаг корзин ширины: миниатюра декодируется с запасом, чтобы небольшой ресайз окна не требовал новой
+WIDTH_BUCKET = 256
+
+
+# Корзина ширины: ближайшее сверху кратное WIDTH_BUCKET
+def width_bucket(width: int) -> int:
+    return max(WIDTH_BUCKET, -(-int(width) // WIDTH_BUCKET) * WIDTH_BUCKET)
+
+
+# Размер изображения с учётом EXIF-поворота; читается только заголовок файла, без декодирования
+def image_size(path: str) -> QSize:
+    reader = QImageReader(path)
+    size = reader.size()
+    if size.isValid() and reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90:
+        size = size.transposed()
+    return size
+
+
+# Декодирование изображения шириной не больше bucket: из кэша миниатюр или из файла сразу
+# в уменьшенном размере (без промежуточной полноразмерной копии в памяти)
+def decode_scaled(path: str, bucket: int) -> QImage:
+    thumb = thumb_path(path, bucket)
+    if thumb is not None and thumb.exists():
+        img = QImage(str(thumb))
+        if not img.isNull():
+            try:
+                # время использования для вытеснения давно не нужных миниатюр
+                os.utime(thumb)
+            except OSError:
+                pass
+            return img
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    raw = reader.size()
+    shown = image_size(path)
+    scaled = False
+    if raw.isValid() and shown.width() > bucket:
+        factor = bucket / shown.width()
+        reader.setScaledSize(QSize(max(1, round(raw.width() * factor)), max(1, round(raw.height() * factor))))
+        scaled = True
+    img = reader.read()
+    if img.isNull() or not scaled or thumb is None:
+        # маленькие изображения не кэшируем — исходный файл декодируется так же быстро
+        return img
+
+    try:
+        thumb.parent.mkdir(parents=True, exist_ok=True)
+        # запись через временный файл: параллельный читатель не увидит недописанную миниатюру
+        tmp = thumb.with_name(f"{thumb.stem}.{os.getpid()}.{threading.get_ident()}.tmp.png")
+        if img.save(str(tmp), "PNG"):
+            os.replace(tmp, thumb)
+    except OSError:
+        pass
+    return img
+
+
+class _DecodeTask(QRunnable):
+    def __init__(self, loader, token: int, path: str, bucket: int):
+        super().__init__()
+        self.loader = loader
+        self.token = token
+        self.path = path
+        self.bucket = bucket
+
+    def run(self):
+        img = decode_scaled(self.path, self.bucket)
+        self.loader.loaded.emit(self.token, img)
+
+
+class _ScaleTask(QRunnable):
+    def __init__(self, loader, token: int, image: QImage, width: int, height: int):
+        super().__init__()
+        self.loader = loader
+        self.token = token
+        self.image = image
+        self.width = width
+        self.height = height
+
+    def run(self):
+        img = self.image.scaled(
+            self.width, self.height,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+        self.loader.scaled.emit(self.token, img)
+
+
+class ImageLoader(QObject):
+    # Результат декодирования: токен запроса и изображение (пустое при ошибке).
+    # Сигнал испускается из рабочего потока, слоты выполняются в потоке интерфейса
+    loaded = pyqtSignal(int, QImage)
+    # Результат сглаженного масштабирования (см. scale)
+    scaled = pyqtSignal(int, QImage)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(2, QThread.idealThreadCount() - 1))
+        self._next_token = 0
+
+    # Постановка изображения в очередь декодирования под ширину width; возвращает токен запроса
+    def request(self, path: str, width: int) -> int:
+        self._next_token += 1
+        self._pool.start(_DecodeTask(self, self._next_token, path, width_bucket(width)))
+        return self._next_token
+
+    # Сглаженное масштабирование image в размер width x height (с сохранением пропорций) в пуле потоков.
+    # Задачи с большим priority выполняются раньше; возвращает токен запроса
+    def scale(self, image: QImage, width: int, height: int, priority: int = 0) -> int:
+        self._next_token += 1
+        self._pool.start(_ScaleTask(self, self._next_token, image, width, height), priority)
+        return self._next_token
+
+
+_loader = None
+
+
+# Общий загрузчик изображений приложения
+def get_image_loader() -> ImageLoader:
+    global _loader
+    if _loader is None:
+        _loader = ImageLoader()
+    return _loader
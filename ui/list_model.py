@@ -0,0 +1,173 @@
+# list_model.py
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from ui import db_async
+
+# Роль с ID записи (тот же номер, что использовали элементы QListWidget)
+ID_ROLE = 1000
+# Роль с HTML-представлением строки (для результатов поиска со сниппетами)
+HTML_ROLE = 1002
+
+
+class PagedListModel(QAbstractListModel):
+    # Модель списка с постраничной подгрузкой строк из БД.
+    # fetch_page(limit, last_row) -> list[dict]: следующая страница после last_row (None — первая);
+    # выполняется в потоке БД, строки добавляются в модель по готовности страницы
+    # id_key: ключ ID записи в словаре строки
+    # format_row(row) -> str: текст строки, вычисляется только при отрисовке
+    # format_html(row) -> str: необязательное HTML-представление (см. HtmlItemDelegate)
+    def __init__(self, fetch_page, id_key: str, format_row, format_html=None, page_size: int = 200, parent=None):
+        super().__init__(parent)
+        self._fetch_page = fetch_page
+        self._id_key = id_key
+        self._format_row = format_row
+        self._format_html = format_html
+        self._page_size = page_size
+        self._rows = []
+        self._exhausted = False
+        # Идёт загрузка страницы; номер поколения отбрасывает страницы, запрошенные до reload()
+        self._loading = False
+        self._generation = 0
+
+    # Смена источника данных (например, переключение между списком и поиском) со сбросом модели
+    def set_source(self, fetch_page, format_row=None, format_html=None):
+        self._fetch_page = fetch_page
+        if format_row is not None:
+            self._format_row = format_row
+        self._format_html = format_html
+        self.reload()
+
+    # Полная перезагрузка: сброс и загрузка первой страницы
+    def reload(self):
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self._loading = False
+        self._generation += 1
+        self.endResetModel()
+        if self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._format_row(row)
+        if role == ID_ROLE:
+            return row[self._id_key]
+        if role == HTML_ROLE and self._format_html is not None:
+            return self._format_html(row)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    # Подгрузка следующей страницы — view вызывает её при прокрутке к концу списка.
+    # Запрос уходит в поток БД, строки вставляются в _on_page
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        self._loading = True
+        generation = self._generation
+        last_row = self._rows[-1] if self._rows else None
+        db_async.run(
+            self._fetch_page, self._page_size, last_row,
+            on_done=lambda page: self._on_page(generation, page),
+            on_error=lambda e: self._on_page_error(generation, e),
+        )
+
+    # Получена страница строк (в потоке интерфейса)
+    def _on_page(self, generation: int, page):
+        if generation != self._generation:
+            return
+        self._loading = False
+        if len(page) < self._page_size:
+            self._exhausted = True
+        if not page:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    # Ошибка загрузки страницы: подгрузка прекращается до следующего reload()
+    def _on_page_error(self, generation: int, error):
+        if generation != self._generation:
+            return
+        print(f"[list_model] Ошибка загрузки страницы: {error}")
+        self._loading = False
+        self._exhausted = True
+
+    # Строка (словарь) по индексу
+    def row_at(self, index):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        return self._rows[index.row()]
+
+    # Вставка одной строки без перезагрузки списка (по умолчанию — в начало)
+    def insert_row(self, row: dict, position: int = 0):
+        position = max(0, min(position, len(self._rows)))
+        self.beginInsertRows(QModelIndex(), position, position)
+        self._rows.insert(position, row)
+        self.endInsertRows()
+
+    # Вставка новой или замена изменённой строки без перезагрузки списка. Строка встаёт на место
+    # по ключу сортировки sort_key(row) (descending — по убыванию, как в запросе страниц); если её
+    # место после последней загруженной строки, а список загружен не весь, она придёт со страницей
+    def upsert_row(self, row: dict, sort_key, descending: bool = False):
+        row_id = row[self._id_key]
+        key = sort_key(row)
+        for i, old in enumerate(self._rows):
+            if old[self._id_key] != row_id:
+                continue
+            if sort_key(old) == key:
+                # место в списке не меняется — только перерисовка строки
+                self._rows[i] = row
+                index = self.index(i)
+                self.dataChanged.emit(index, index)
+                return
+            self.beginRemoveRows(QModelIndex(), i, i)
+            del self._rows[i]
+            self.endRemoveRows()
+            break
+        position = next(
+            (i for i, r in enumerate(self._rows) if (sort_key(r) < key if descending else sort_key(r) > key)),
+            len(self._rows),
+        )
+        if position == len(self._rows) and not self._exhausted:
+            return
+        self.insert_row(row, position)
+
+    # Изменение полей загруженной строки с ID row_id (например, статуса) с перерисовкой только её;
+    # строки, которая ещё не загружена, изменение не касается — она придёт из БД уже новой
+    def update_row(self, row_id, changes: dict):
+        for i, row in enumerate(self._rows):
+            if row[self._id_key] == row_id:
+                row.update(changes)
+                index = self.index(i)
+                self.dataChanged.emit(index, index)
+                return
+
+    # Удаление строк с указанными ID без перезагрузки списка. Подряд идущие строки удаляются
+    # одним диапазоном: при массовом удалении view получает по сигналу на диапазон, а не на строку
+    def remove_ids(self, ids):
+        ids = set(ids)
+        if not ids:
+            return
+        i = len(self._rows) - 1
+        while i >= 0:
+            if self._rows[i][self._id_key] not in ids:
+                i -= 1
+                continue
+            last = i
+            while i > 0 and self._rows[i - 1][self._id_key] in ids:
+                i -= 1
+            self.beginRemoveRows(QModelIndex(), i, last)
+            del self._rows[i:last + 1]
+            self.endRemoveRows()
+            i -= 1
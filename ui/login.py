@@ -1,10 +1,10 @@
 # login.py
 from PyQt6.QtWidgets import (
     QWidget, QLabel, QLineEdit, QPushButton,
-    QVBoxLayout, QHBoxLayout, QMessageBox, QSpacerItem, QSizePolicy, QApplication
+    QVBoxLayout, QHBoxLayout, QMessageBox, QSpacerItem, QSizePolicy
 )
 from models import User
-from reminder_watcher import ReminderScheduler
+from ui.shell import navigate
 
 
 class LoginWindow(QWidget):
@@ -12,7 +12,6 @@ class LoginWindow(QWidget):
         super().__init__()
         self.setWindowTitle('AI Noter — Вход')
         self._build()
-        self.showMaximized()
 
     # Построение интерфейса окна входа с полями логина и пароля
     def _build(self):
@@ -66,20 +65,30 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, 'Ошибка', 'Заполните логин и пароль')
             return
 
-        user = User.login(username, password)
+        # поток БД запускается при первом запросе, а не при показе окна входа
+        from ui import db_async
+        self._set_busy(True)
+        db_async.run(User.login, username, password, on_done=self._on_login_done, on_error=self._on_db_error)
+
+    # Включение/выключение кнопок на время запроса к БД
+    def _set_busy(self, busy: bool):
+        self.btn_login.setEnabled(not busy)
+        self.btn_reg.setEnabled(not busy)
+
+    # Ошибка запроса к БД при входе или регистрации
+    def _on_db_error(self, error):
+        self._set_busy(False)
+        QMessageBox.warning(self, 'Ошибка', f'Ошибка базы данных: {error}')
+
+    # Результат проверки логина и пароля
+    def _on_login_done(self, user):
+        self._set_busy(False)
         if not user:
             QMessageBox.warning(self, 'Ошибка', 'Неверный логин или пароль')
             return
 
-        # Создаём планировщик напоминаний после успешного логина
-        scheduler = ReminderScheduler(user)
-        # Устанавливаем родителя как QApplication, чтобы планировщик жил независимо от окон
-        scheduler.setParent(QApplication.instance())
-        
-        from ui.main_menu import MainMenu
-        self.main = MainMenu(user, scheduler)
-        self.main.show()
-        self.close()
+        # Главное окно запускает планировщик напоминаний и открывает меню
+        navigate(self, 'sign_in', user)
 
     # Обработка регистрации нового пользователя
     def on_register(self):
@@ -89,7 +98,14 @@ class LoginWindow(QWidget):
             QMessageBox.warning(self, 'Ошибка', 'Заполните логин и пароль')
             return
 
-        user = User.register(username, password)
+        from ui import db_async
+        self._set_busy(True)
+        db_async.run(User.register, username, password, write=True,
+                     on_done=self._on_register_done, on_error=self._on_db_error)
+
+    # Результат регистрации
+    def _on_register_done(self, user):
+        self._set_busy(False)
         if not user:
             QMessageBox.warning(self, 'Ошибка', 'Пользователь с таким логином уже существует')
             return
@@ -5,21 +5,22 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont
-from pathlib import Path
-import os
-from dotenv import load_dotenv
-from paths import get_app_data_path
+import settings
+from ui.shell import navigate
 
 class MainMenu(QWidget):
-    def __init__(self, user, scheduler=None):
+    def __init__(self, user):
         super().__init__()
         self.user = user
-        # Планировщик напоминаний передаётся из LoginWindow
-        self.scheduler = scheduler
         self.setWindowTitle('AI Noter')
         self._build()
-        self.showMaximized()
-        # Убираем фокус с кнопок после показа окна
+
+    # Показ меню в главном окне
+    def activate(self):
+        # Ключ мог появиться в .env, пока меню было скрыто
+        if self.has_deepseek_key():
+            self.btn_add_key.hide()
+        # Убираем фокус с кнопок после показа
         self.setFocus()
 
     # Построение интерфейса главного меню с кнопками навигации
@@ -94,85 +95,29 @@ class MainMenu(QWidget):
         self.btn_add_key.clicked.connect(self.add_deepseek_key)
 
 
-    # Открытие окна со списком заметок
+    # Переход к списку заметок
     def open_notes(self):
-        from ui.notes_list import NotesList
-        self.notes = NotesList(self.user, self.scheduler)
-        self.notes.show()
-        self.close()
+        navigate(self, 'show_notes')
 
-    # Открытие окна со списком напоминаний
+    # Переход к списку напоминаний
     def open_reminders(self):
-        from ui.reminders_list import RemindersList
-        self.rm = RemindersList(self.user, self.scheduler)
-        self.rm.show()
-        self.close()
+        navigate(self, 'show_reminders')
 
-    # Открытие окна со списком AI запросов
+    # Переход к списку AI запросов
     def open_ai(self):
-        from ui.ai_list import AIList
-        self.aiw = AIList(self.user, self.scheduler)
-        self.aiw.show()
-        self.close()
+        navigate(self, 'show_ai')
 
-    # Выход из аккаунта и возврат к окну входа
+    # Выход из аккаунта и возврат к окну входа (планировщик напоминаний останавливает главное окно)
     def logout(self):
-        # Уничтожаем планировщик напоминаний при выходе из аккаунта
-        if self.scheduler:
-            self.scheduler.timer.stop()
-            self.scheduler.deleteLater()
-            self.scheduler = None
-        
-        from ui.login import LoginWindow
-        self.login = LoginWindow()
-        self.login.show()
-        self.close()
+        navigate(self, 'logout')
 
-    # Проверка наличия ключа DeepSeek в .env файле
+    # Проверка наличия ключа DeepSeek в настройках (без чтения файла, если .env не менялся)
     def has_deepseek_key(self):
-        # Загружаем .env из папки приложения (работает в обычном проекте и в exe)
-        env_path = get_app_data_path() / '.env'
-        load_dotenv(env_path, override=True)
-        api_key = os.getenv('DEEPSEEK_API_KEY')
-        # Проверяем, что ключ не пустой и не равен значению по умолчанию
-        return api_key and api_key.strip() and api_key.strip() != 'your_api_key_here'
+        return settings.get().has_api_key
 
     # Сохранение ключа DeepSeek в .env файл
     def save_deepseek_key(self, api_key: str):
-        # Путь к .env файлу (работает в обычном проекте и в exe)
-        env_path = get_app_data_path() / '.env'
-        
-        # Читаем существующий файл, если он есть
-        env_content = []
-        if env_path.exists():
-            with open(env_path, 'r', encoding='utf-8') as f:
-                env_content = f.readlines()
-        else:
-            # Если файл не существует, добавляем заголовок с комментариями
-            env_content = [
-                '# DeepSeek API Key\n',
-                '# Получите свой API ключ на https://www.deepseek.com/\n',
-                '# Вы можете обратиться в Telegram @coawy для получения API-ключа для тестирования проекта\n'
-            ]
-        
-        # Ищем строку с DEEPSEEK_API_KEY
-        key_found = False
-        for i, line in enumerate(env_content):
-            if line.strip().startswith('DEEPSEEK_API_KEY='):
-                env_content[i] = f'DEEPSEEK_API_KEY={api_key}\n'
-                key_found = True
-                break
-        
-        # Если ключ не найден, добавляем его
-        if not key_found:
-            # Удаляем пустые строки в конце
-            while env_content and env_content[-1].strip() == '':
-                env_content.pop()
-            env_content.append(f'DEEPSEEK_API_KEY={api_key}\n')
-        
-        # Записываем обратно в файл
-        with open(env_path, 'w', encoding='utf-8') as f:
-            f.writelines(env_content)
+        settings.update({'DEEPSEEK_API_KEY': api_key})
 
     # Диалог для добавления API ключа DeepSeek
     def add_deepseek_key(self):
@@ -232,8 +177,5 @@ class MainMenu(QWidget):
                 QMessageBox.information(self, 'Успешно', 'API ключ сохранен в .env файл')
                 # Скрываем кнопку и перестраиваем интерфейс
                 self.btn_add_key.hide()
-                # Обновляем переменные окружения
-                env_path = get_app_data_path() / '.env'
-                load_dotenv(env_path, override=True)
             except Exception as e:
                 QMessageBox.warning(self, 'Ошибка', f'Не удалось сохранить ключ: {e}')
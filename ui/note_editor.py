@@ -1,19 +1,17 @@
 # note_editor.py
-import os
-import shutil
 from pathlib import Path
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QFileDialog, QLabel,
     QMessageBox, QScrollArea, QSizePolicy, QPlainTextEdit, QApplication
 )
-from PyQt6.QtCore import Qt, QTimer, QEvent
-from PyQt6.QtGui import QPixmap, QMouseEvent
+from PyQt6.QtCore import Qt, QTimer, QEvent, QRect
+from PyQt6.QtGui import QPixmap, QPixmapCache, QMouseEvent, QPainter
 from models import Note
+from ui import db_async
+from ui.shell import navigate
 from paths import get_app_data_path
-
-# Путь к папке с изображениями (работает в обычном проекте и в exe)
-IMAGE_DIR = get_app_data_path() / "storage" / "images"
-IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+from ui.image_loader import get_image_loader, image_size, width_bucket
+import image_store
 
 
 class AutoGrowTextEdit(QPlainTextEdit):
@@ -23,27 +21,48 @@ class AutoGrowTextEdit(QPlainTextEdit):
         self.max_lines = max_lines
         self.padding = 12
         self._delete_mode = False
+        self._adjust_pending = False
         self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
         self.setFrameStyle(0)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         self.setLineWrapMode(QPlainTextEdit.LineWrapMode.WidgetWidth)
-        self.textChanged.connect(self.adjust_height)
-        QTimer.singleShot(0, self.adjust_height)
+        # раскладка документа перестраивает только изменённый абзац и сообщает об изменении
+        # числа визуальных строк; набор текста внутри строки высоту не трогает
+        self.document().documentLayout().documentSizeChanged.connect(self._schedule_adjust)
+        self.adjust_height()
+
+    # Отложенный пересчёт высоты: все изменения за итерацию цикла событий дают одну перекладку
+    def _schedule_adjust(self, *args):
+        if not self._adjust_pending:
+            self._adjust_pending = True
+            QTimer.singleShot(0, self.adjust_height)
 
-    # Автоматическое изменение высоты текстового блока в зависимости от количества строк
+    # Высота блока по числу визуальных строк (с учётом переноса) из раскладки документа.
+    # Меняется только высота самого блока; контейнер перекладывается Qt один раз за итерацию цикла событий
     def adjust_height(self):
-        blocks = max(1, self.document().blockCount())
-        fm = self.fontMetrics()
-        line_h = fm.lineSpacing() or 16
-        lines = max(self.min_lines, min(self.max_lines, blocks))
+        self._adjust_pending = False
+        doc = self.document()
+        layout = doc.documentLayout()
+        # абзацы без раскладки (после смены ширины или нового текста) раскладываются сейчас,
+        # а не при отрисовке, чтобы высота сразу была окончательной; редактируемый абзац уже разложен
+        block = doc.firstBlock()
+        while block.isValid():
+            if block.isVisible() and block.layout().lineCount() == 0:
+                layout.blockBoundingRect(block)
+            block = block.next()
+        lines = int(layout.documentSize().height())
+        line_h = self.fontMetrics().lineSpacing() or 16
+        lines = max(self.min_lines, min(self.max_lines, lines))
         new_h = int(lines * line_h + self.padding)
-        min_h = int(self.min_lines * line_h + self.padding)
-        max_h = int(self.max_lines * line_h + self.padding)
-        new_h = max(min_h, min(max_h, new_h))
-        self.setFixedHeight(new_h)
-        if self.parentWidget() is not None:
-            self.parentWidget().adjustSize()
+        if new_h != self.minimumHeight() or new_h != self.maximumHeight():
+            self.setFixedHeight(new_h)
     
+    # Смена ширины меняет переносы строк, а с ними и высоту
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if event.size().width() != event.oldSize().width():
+            self._schedule_adjust()
+
     # Установка режима удаления для блока (блокировка редактирования)
     def set_delete_mode(self, enabled):
         self._delete_mode = enabled
@@ -68,22 +87,83 @@ class AutoGrowTextEdit(QPlainTextEdit):
         super().mousePressEvent(event)
 
 
+class ImageLabel(QLabel):
+    # Метка блока с изображением. Пока сглаженная копия нужной ширины не готова, показывается
+    # предпросмотр: уменьшенная копия растягивается при отрисовке без сглаживания и без новых копий в памяти
+    def __init__(self):
+        super().__init__()
+        self.preview = None
+
+    # Показ pixmap в режиме предпросмотра (None — выход из него)
+    def set_preview(self, pixmap):
+        self.preview = pixmap
+        self.update()
+
+    def paintEvent(self, event):
+        if self.preview is None:
+            super().paintEvent(event)
+            return
+        rect = self.contentsRect()
+        size = self.preview.size().scaled(rect.size(), Qt.AspectRatioMode.KeepAspectRatio)
+        target = QRect(0, 0, size.width(), size.height())
+        target.moveCenter(rect.center())
+        painter = QPainter(self)
+        painter.drawPixmap(target, self.preview)
+
+
+class _Block:
+    # Блок заметки в редакторе. Виджет есть только у блоков рядом с видимой областью,
+    # для остальных хранятся данные и высота (измеренная или оценённая)
+    def __init__(self, kind: str, block_id: int = None, text: str = '', path: str = None, rel: str = None):
+        self.kind = kind  # 'text', 'image' или 'missing' (сообщение об отсутствующем изображении)
+        self.block_id = block_id  # ID сохранённого блока (None для нового)
+        self.text = text  # текст блока или сообщения
+        self.dirty = False  # текст изменён после загрузки
+        self.path = path  # абсолютный путь изображения
+        self.rel = rel  # путь изображения в хранилище (у уже сохранённых)
+        self.size = None  # размер изображения, читается из заголовка при первом показе
+        self.pixmap_key = None  # ключ уменьшенной копии в QPixmapCache и её ширина
+        self.pixmap_width = 0
+        self.height = None
+        self.widget = None
+
+
 class NoteEditor(QWidget):
-    def __init__(self, user, note: Note = None, scheduler=None):
+    # Запас над и под видимой областью (в её высотах), для которого виджеты блоков создаются заранее
+    OVERSCAN = 1.0
+    # Пауза после последнего изменения размера окна, после которой изображения сглаживаются, мс
+    RESIZE_DEBOUNCE_MS = 150
+
+    def __init__(self, user, note: Note = None):
         super().__init__()
         self.user = user
         self.note = note
-        self.scheduler = scheduler
         self.setWindowTitle("Редактор заметки")
+        # все блоки заметки по порядку и блоки, у которых сейчас есть виджеты
         self.blocks = []
+        self._live = []
+        # свободные виджеты для повторного использования, по видам блоков
+        self._pools = {'text': [], 'image': [], 'missing': []}
+        self._refresh_pending = False
+        self._layout_width = 0
         # список меток с изображениями для ресайза
         self._image_labels = []
         # режим удаления блоков
         self._delete_mode = False
         # флаг для предотвращения параллельных удалений
         self._deleting_block = False
+        # изображения, ожидающие декодирования в фоне: токен запроса -> (метка, ширина, путь)
+        self._pending_images = {}
+        # заказанные сглаженные масштабирования: токен -> (метка, ключ копии в QPixmapCache)
+        self._pending_scales = {}
+        get_image_loader().loaded.connect(self._on_image_loaded)
+        get_image_loader().scaled.connect(self._on_image_scaled)
+        # таймер окончания изменения размера окна
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(self.RESIZE_DEBOUNCE_MS)
+        self._resize_timer.timeout.connect(self._finish_resize)
         self._build_ui()
-        self.showMaximized()
         if self.note:
             self.load_note()
 
@@ -112,8 +192,16 @@ class NoteEditor(QWidget):
         # добавляем нижний отступ, чтобы контент не перекрывался кнопками
         # отступ должен быть достаточным для всех кнопок внизу
         self.container_layout.setContentsMargins(0, 0, 0, 100)
+        # заглушки на месте блоков выше и ниже живых виджетов; живые виджеты — между ними
+        self.top_spacer = QWidget()
+        self.bottom_spacer = QWidget()
+        self.top_spacer.hide()
+        self.bottom_spacer.hide()
+        self.container_layout.addWidget(self.top_spacer)
+        self.container_layout.addWidget(self.bottom_spacer)
         self.container_layout.addStretch(1)
         self.scroll.setWidget(self.container)
+        self.scroll.verticalScrollBar().valueChanged.connect(self._schedule_refresh)
 
         self.txt = None  # будет первым текстовым блоком внутри scroll
         self.btn_add_text = QPushButton("Добавить текст")
@@ -140,20 +228,15 @@ class NoteEditor(QWidget):
         self.container.installEventFilter(self)
         self.scroll.viewport().installEventFilter(self)
 
-    # Добавление нового текстового блока в заметку
-    def add_text_block(self, text=""):
-        te = AutoGrowTextEdit(min_lines=1, max_lines=200)
-        te.setPlainText(text)
-        # вставляем перед растягивающим элемент (последним)
-        idx = self.container_layout.count() - 1
-        self.container_layout.insertWidget(idx, te)
-        # устанавливаем обработчик событий для клика
-        te.installEventFilter(self)
-        QTimer.singleShot(0, te.adjust_height)
-        return te
+    # Добавление нового текстового блока в конец заметки; возвращает его виджет
+    def add_text_block(self, text="", block_id=None):
+        b = _Block('text', block_id, text)
+        self.blocks.append(b)
+        self._refresh_window(ensure=b)
+        return b.widget
 
     # Добавление нового блока с изображением в заметку с выбором файла через диалог
-    def add_image_block(self, path=None, auto_add_text=False):
+    def add_image_block(self, path=None, auto_add_text=False, block_id=None, rel=None):
         if not path:
             fpath, _ = QFileDialog.getOpenFileName(
                 self, "Выберите изображение", filter="Images (*.png *.jpg *.bmp *.jpeg)"
@@ -162,112 +245,277 @@ class NoteEditor(QWidget):
                 return
             path = fpath
 
-        pix_orig = QPixmap(path)
-        if pix_orig.isNull():
+        # читаем только заголовок файла: размер нужен для заглушки правильной высоты
+        size = image_size(path)
+        if not size.isValid() or size.isEmpty():
             QMessageBox.warning(self, "Ошибка", f"Не удалось загрузить изображение: {path}")
             return
 
-        # создаём метку и сохраняем оригинал + аспект
-        lbl = QLabel()
-        lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        lbl.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
-        lbl.original_pixmap = pix_orig
-        # защитимся от деления на ноль
-        w = pix_orig.width() or 1
-        h = pix_orig.height() or 1
-        lbl.aspect_ratio = w / h
-        lbl.img_path = path  # исходный путь (для сохранения)
-        # масштабируем под текущую ширину контейнера
-        self._resize_image(lbl)
-
-        idx = self.container_layout.count() - 1
-        self.container_layout.insertWidget(idx, lbl)
-        # регистрируем в списке для ресайза
-        self._image_labels.append(lbl)
-        # устанавливаем обработчик событий для клика
-        lbl.installEventFilter(self)
+        b = _Block('image', block_id, path=path, rel=rel)
+        b.size = size
+        self.blocks.append(b)
+        self._refresh_window(ensure=b)
         # опционально добавляем текстовый блок после изображения (только при ручном добавлении)
         if auto_add_text:
             te = self.add_text_block()
             te.setFocus()
-        return lbl
+        return b.widget
 
-    # Загрузка существующей заметки из базы данных и отображение всех блоков
+    # Загрузка существующей заметки из базы данных. Создаются только данные блоков,
+    # виджеты — лишь для блоков в видимой области (см. _refresh_window)
     def load_note(self):
         self.title.setText(self.note.title)
-        # очищаем контейнер (удаляем виджеты)
-        while self.container_layout.count():
-            item = self.container_layout.takeAt(0)
-            w = item.widget()
-            if w is not None:
-                w.deleteLater()
-        self.container_layout.addStretch(1)
-        # очистим список изображений
-        self._image_labels = []
-        # наполняем блоками из note.content
-        for b in self.note.content:
-            t = b.get("type")
+        for b in list(self._live):
+            self._release(b)
+        self._live = []
+        self.blocks = []
+        # в базе хранится относительный путь изображения
+        base = get_app_data_path()
+        for item in self.note.content:
+            t = item.get("type")
             if t == "text":
-                self.add_text_block(b.get("content", ""))
+                self.blocks.append(_Block('text', item.get("id"), item.get("content", "")))
             elif t == "image":
-                rel = b.get("content", "")
-                # в базе хранится относительный путь (как в первом коде)
-                base = get_app_data_path()
+                rel = item.get("content", "")
                 p = base / rel if rel else None
                 if p and p.exists():
-                    # передаём строковый путь, без автоматического добавления текста при загрузке
-                    self.add_image_block(str(p), auto_add_text=False)
+                    self.blocks.append(_Block('image', item.get("id"), path=str(p), rel=rel))
                 else:
-                    lbl = QLabel(f"⚠️ Изображение не найдено: {rel}")
-                    lbl.setStyleSheet("color: red; font-style: italic; padding:4px;")
-                    idx = self.container_layout.count() - 1
-                    self.container_layout.insertWidget(idx, lbl)
-                    # устанавливаем обработчик событий для клика
-                    lbl.installEventFilter(self)
-
-    # Сохранение заметки: сбор всех блоков, копирование изображений в storage и запись в БД
+                    # сообщение об ошибке — не блок заметки, при сохранении оно отбрасывается
+                    self.blocks.append(_Block('missing', text=f"⚠️ Изображение не найдено: {rel}"))
+        self._refresh_window()
+
+    # Есть ли в заметке блоки, которые можно удалить (сообщения об ошибках не считаются)
+    def _has_blocks(self):
+        return any(b.kind != 'missing' for b in self.blocks)
+
+    # Отложенное (один раз за итерацию цикла событий) обновление окна живых виджетов
+    def _schedule_refresh(self, *args):
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            QTimer.singleShot(0, self._refresh_window)
+
+    # Оценка высоты блока без виджета: по числу строк с переносом или по пропорциям изображения
+    def _estimate_height(self, b, width):
+        fm = self.fontMetrics()
+        line_h = fm.lineSpacing() or 16
+        if b.kind == 'image':
+            if b.size is not None and b.size.isValid() and not b.size.isEmpty():
+                return max(20, int(width * b.size.height() / b.size.width()))
+            return int(width * 3 / 4)
+        if b.kind == 'missing':
+            return line_h + 8
+        per_line = max(1, width // max(1, fm.averageCharWidth()))
+        lines = sum(max(1, -(-len(line) // per_line)) for line in b.text.split('\n'))
+        return int(min(200, lines) * line_h + 12)
+
+    # Высота заглушки на месте блоков с высотами heights (с учётом промежутков между ними)
+    def _set_spacer(self, spacer, heights, spacing):
+        if not heights:
+            spacer.hide()
+            return
+        spacer.setFixedHeight(sum(heights) + spacing * (len(heights) - 1))
+        spacer.show()
+
+    # Обновление окна живых виджетов: виджеты создаются (или берутся из пула) для блоков
+    # в видимой области с запасом OVERSCAN, ушедшие из неё блоки возвращают виджеты в пул.
+    # ensure — блок, который нужно показать (например, только что добавленный)
+    def _refresh_window(self, ensure=None):
+        self._refresh_pending = False
+        vp = self.scroll.viewport()
+        width = max(100, vp.width() - 20)
+        spacing = self.container_layout.spacing()
+        for b in self._live:
+            self._sync_block(b)
+        heights = []
+        for b in self.blocks:
+            if b.height is None:
+                b.height = self._estimate_height(b, width)
+            heights.append(b.height)
+
+        top = self.scroll.verticalScrollBar().value()
+        if ensure is not None:
+            idx = self.blocks.index(ensure)
+            top = sum(heights[:idx]) + spacing * idx
+        margin = int(vp.height() * self.OVERSCAN)
+        lo, hi = top - margin, top + vp.height() + margin
+        first, last, y = len(heights), 0, 0
+        for i, h in enumerate(heights):
+            if y + h >= lo and y <= hi:
+                first = min(first, i)
+                last = i + 1
+            y += h + spacing
+        if first >= last:
+            # прокрутка ушла за оценённый конец — показываем последний блок
+            first, last = max(0, len(heights) - 1), len(heights)
+
+        live = self.blocks[first:last]
+        if live != self._live:
+            keep = set(map(id, live))
+            for b in self._live:
+                if id(b) not in keep:
+                    self._release(b)
+            for b in live:
+                if b.widget is None:
+                    self._bind(b)
+                else:
+                    self.container_layout.removeWidget(b.widget)
+            # живые виджеты стоят между заглушками в порядке блоков
+            for i, b in enumerate(live):
+                self.container_layout.insertWidget(1 + i, b.widget)
+            self._live = live
+        self._set_spacer(self.top_spacer, heights[:first], spacing)
+        self._set_spacer(self.bottom_spacer, heights[last:], spacing)
+        if ensure is not None and ensure.widget is not None:
+            QTimer.singleShot(0, lambda: self._scroll_to_block(ensure))
+
+    # Прокрутка к блоку, если у него всё ещё есть виджет
+    def _scroll_to_block(self, b):
+        if b.widget is not None:
+            self.scroll.ensureWidgetVisible(b.widget)
+
+    # Прокрутка к курсору блока, в котором идёт набор: высокий блок может выходить за видимую область
+    def _ensure_cursor_visible(self, te):
+        if te.block is None or not te.hasFocus():
+            return
+        rect = te.cursorRect()
+        pos = te.viewport().mapTo(self.container, rect.center())
+        self.scroll.ensureVisible(pos.x(), pos.y(), 0, rect.height())
+
+    # Новый виджет для блока вида kind
+    def _create_block_widget(self, kind):
+        if kind == 'text':
+            w = AutoGrowTextEdit(min_lines=1, max_lines=200)
+            w.cursorPositionChanged.connect(lambda w=w: self._ensure_cursor_visible(w))
+        elif kind == 'image':
+            w = ImageLabel()
+            w.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            w.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        else:
+            w = QLabel()
+            w.setStyleSheet("color: red; font-style: italic; padding:4px;")
+        w.kind = kind
+        # устанавливаем обработчик событий для клика
+        w.installEventFilter(self)
+        return w
+
+    # Привязка виджета (из пула или нового) к блоку
+    def _bind(self, b):
+        if b.kind == 'image' and b.size is None:
+            # размер читается из заголовка файла при первом показе блока
+            b.size = image_size(b.path)
+            if not b.size.isValid() or b.size.isEmpty():
+                b.kind = 'missing'
+                b.text = f"⚠️ Не удалось загрузить изображение: {b.path}"
+        pool = self._pools[b.kind]
+        w = pool.pop() if pool else self._create_block_widget(b.kind)
+        w.block = b
+        b.widget = w
+        if b.kind == 'text':
+            w.setPlainText(b.text)
+            w.document().setModified(False)
+            w.adjust_height()
+        elif b.kind == 'image':
+            self._bind_image(w, b)
+        else:
+            w.setText(b.text)
+        self._apply_block_style(w)
+        w.show()
+
+    # Настройка метки изображения под блок: уменьшенная копия берётся из QPixmapCache, если она там есть
+    def _bind_image(self, lbl, b):
+        lbl.original_width = b.size.width()
+        lbl.aspect_ratio = b.size.width() / b.size.height()
+        lbl.img_path = b.path  # исходный путь (для сохранения)
+        # уменьшенная копия изображения и ширина, под которую она декодирована
+        lbl.display_pixmap = QPixmapCache.find(b.pixmap_key) if b.pixmap_key else None
+        lbl.display_image = None  # та же копия как QImage — для масштабирования в рабочем потоке
+        lbl.scaling_key = None
+        lbl.loaded_width = b.pixmap_width if lbl.display_pixmap is not None else 0
+        lbl.requested_width = 0
+        lbl.setText("" if lbl.display_pixmap is not None else "Загрузка изображения...")
+        # регистрируем в списке для ресайза
+        self._image_labels.append(lbl)
+        # масштабируем под текущую ширину контейнера
+        self._resize_image(lbl)
+
+    # Перенос состояния виджета в блок: изменённый текст и фактическая высота
+    def _sync_block(self, b):
+        w = b.widget
+        if w is None:
+            return
+        if b.kind == 'text' and w.document().isModified():
+            b.text = w.toPlainText()
+            b.dirty = True
+            w.document().setModified(False)
+        if w.minimumHeight() > 0:
+            b.height = w.minimumHeight()
+
+    # Отвязка виджета от блока и возврат его в пул
+    def _release(self, b):
+        w = b.widget
+        self._sync_block(b)
+        if w in self._image_labels:
+            self._image_labels.remove(w)
+            if w.display_pixmap is not None:
+                b.pixmap_key = f"note_image:{b.path}:{w.loaded_width}"
+                b.pixmap_width = w.loaded_width
+                QPixmapCache.insert(b.pixmap_key, w.display_pixmap)
+            w.display_pixmap = None
+            w.display_image = None
+            w.scaling_key = None
+            w.set_preview(None)
+            w.clear()
+        self.container_layout.removeWidget(w)
+        w.hide()
+        w.block = None
+        b.widget = None
+        self._pools[w.kind].append(w)
+
+    # Сохранение заметки: сбор всех блоков, копирование новых изображений в storage и запись в БД.
+    # В БД переписываются только новые, удалённые и изменённые блоки
     def save_note(self):
         title = self.title.text().strip()
-        # собираем блоки из виджетов контейнера в правильном порядке
+        for b in self._live:
+            self._sync_block(b)
+        # собираем блоки в правильном порядке
         data = []
-        for i in range(self.container_layout.count() - 1):  # пропускаем последний stretch
-            item = self.container_layout.itemAt(i)
-            w = item.widget()
-            if w is None:
-                continue
-            if isinstance(w, AutoGrowTextEdit):
-                txt = w.toPlainText().strip()
+        # ID сохранённых блоков, текст которых изменён
+        dirty = set()
+        for b in self.blocks:
+            if b.kind == 'text':
+                txt = b.text.strip()
                 if txt:
-                    data.append({"type": "text", "content": txt})
-            elif isinstance(w, QLabel):
-                path = getattr(w, "img_path", "")
-                if path:
-                    # перед сохранением — убедимся, что изображение находится в IMAGE_DIR
-                    src = Path(path)
-                    try:
-                        if not src.exists():
-                            # если фото было ссылкой на несуществующий файл, пропустить
-                            continue
-                        fname = os.path.basename(path)
-                        dest = IMAGE_DIR / f"{int(src.stat().st_mtime)}_{fname}"
-                        if not dest.exists():
-                            shutil.copy(path, dest)
-                        # Сохраняем относительный путь от корня приложения
-                        base = get_app_data_path()
-                        rel = str(dest.relative_to(base))
-                        data.append({"type": "image", "content": rel})
-                    except PermissionError:
-                        QMessageBox.warning(self, "Ошибка", "Нет прав доступа для сохранения изображения. Проверьте права доступа к папке storage/images.")
-                        return
-                    except OSError as e:
-                        if "No space left" in str(e) or "errno 28" in str(e):
-                            QMessageBox.warning(self, "Ошибка", "Недостаточно места на диске для сохранения изображения.")
-                        else:
-                            QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить изображение: {e}")
-                        return
-                    except Exception as e:
-                        QMessageBox.warning(self, "Ошибка", f"Неожиданная ошибка при сохранении изображения: {e}")
-                        return
+                    data.append({"id": b.block_id, "type": "text", "content": txt})
+                    if b.dirty and b.block_id is not None:
+                        dirty.add(b.block_id)
+            elif b.kind == 'image':
+                if b.rel:
+                    # уже сохранённое изображение повторно в хранилище не копируется
+                    data.append({"id": b.block_id, "type": "image", "content": b.rel})
+                    continue
+                # перед сохранением — помещаем изображение в хранилище по хэшу содержимого
+                # (одинаковые файлы хранятся один раз)
+                src = Path(b.path)
+                try:
+                    if not src.exists():
+                        # если фото было ссылкой на несуществующий файл, пропустить
+                        continue
+                    # Сохраняем относительный путь от корня приложения
+                    rel = image_store.store(src)
+                    data.append({"id": b.block_id, "type": "image", "content": rel})
+                except PermissionError:
+                    QMessageBox.warning(self, "Ошибка", "Нет прав доступа для сохранения изображения. Проверьте права доступа к папке storage/images.")
+                    return
+                except OSError as e:
+                    if "No space left" in str(e) or "errno 28" in str(e):
+                        QMessageBox.warning(self, "Ошибка", "Недостаточно места на диске для сохранения изображения.")
+                    else:
+                        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить изображение: {e}")
+                    return
+                except Exception as e:
+                    QMessageBox.warning(self, "Ошибка", f"Неожиданная ошибка при сохранении изображения: {e}")
+                    return
         # если нет заголовка и нет содержимого — предупреждение
         if not title and not data:
             QMessageBox.warning(self, "Ошибка", "Заметка пуста")
@@ -279,29 +527,57 @@ class NoteEditor(QWidget):
             n = self.note
             n.title = title
             n.content = data
-        n.save()
+        # запись — в потоке БД; до её завершения повторное сохранение недоступно
+        self.btn_save.setEnabled(False)
+        db_async.run(n.save, dirty=dirty, write=True, on_done=lambda _: self._on_saved(n), on_error=self._on_save_failed)
+
+    # Заметка сохранена: возврат к списку заметок, в котором обновится только её строка
+    def _on_saved(self, n):
         QMessageBox.information(self, "OK", "Сохранено")
-        from ui.notes_list import NotesList
-        self.listw = NotesList(self.user, self.scheduler)
-        self.listw.show()
-        self.close()
+        self.note = n
+        navigate(self, 'show_notes', saved=self.note)
+
+    # Ошибка записи заметки в БД
+    def _on_save_failed(self, error):
+        self.btn_save.setEnabled(True)
+        QMessageBox.warning(self, "Ошибка", f"Не удалось сохранить заметку: {error}")
 
     # Возврат к списку заметок
     def back(self):
-        from ui.notes_list import NotesList
-        self.listw = NotesList(self.user, self.scheduler)
-        self.listw.show()
-        self.close()
+        navigate(self, 'show_notes')
 
-    # Пересчет размеров изображений при изменении размера окна
+    # Пересчет размеров изображений при изменении размера окна. Пока размер меняется,
+    # изображения масштабируются только быстро (без сглаживания); сглаженные копии
+    # заказываются после паузы RESIZE_DEBOUNCE_MS (см. _finish_resize)
     def resizeEvent(self, event):
         super().resizeEvent(event)
+        width = self.scroll.viewport().width()
+        if width != self._layout_width:
+            # оценки высот блоков без виджетов зависят от ширины
+            self._layout_width = width
+            for b in self.blocks:
+                if b.widget is None:
+                    b.height = None
         for lbl in list(self._image_labels):
+            self._resize_image(lbl, smooth=False)
+        self._resize_timer.start()
+        self._schedule_refresh()
+
+    # Завершение изменения размера окна: сглаженное масштабирование, видимые изображения — первыми
+    def _finish_resize(self):
+        visible = [lbl for lbl in self._image_labels if not lbl.visibleRegion().isEmpty()]
+        hidden = [lbl for lbl in self._image_labels if lbl.visibleRegion().isEmpty()]
+        for lbl in visible:
+            self._resize_image(lbl, priority=1)
+        for lbl in hidden:
             self._resize_image(lbl)
 
-    # Масштабирование изображения под ширину видимой области с сохранением пропорций
-    def _resize_image(self, lbl):
-        if not hasattr(lbl, "original_pixmap"):
+    # Масштабирование изображения под ширину видимой области с сохранением пропорций.
+    # Сглаженная копия под эту ширину берётся из QPixmapCache; если её нет, показывается
+    # предпросмотр (см. ImageLabel), а при smooth сглаженная копия заказывается в пуле потоков.
+    # Если уменьшенной копии не хватает для текущей ширины — заказывается новая
+    def _resize_image(self, lbl, smooth=True, priority=0):
+        if not hasattr(lbl, "aspect_ratio"):
             return
         # ширина доступной области для изображения (немного отступа)
         try:
@@ -311,14 +587,72 @@ class NoteEditor(QWidget):
         # вычисляем высоту с учётом aspect_ratio
         new_w = int(avail_w)
         new_h = max(20, int(new_w / (getattr(lbl, "aspect_ratio", 1) or 1)))
-        scaled = lbl.original_pixmap.scaled(
-            new_w, new_h,
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        )
-        lbl.setPixmap(scaled)
-        lbl.setFixedHeight(scaled.height())
-    
+        if lbl.display_pixmap is not None:
+            key = f"note_image:{lbl.img_path}:{lbl.loaded_width}:{new_w}x{new_h}"
+            scaled = QPixmapCache.find(key)
+            if scaled is not None:
+                lbl.set_preview(None)
+                lbl.setPixmap(scaled)
+                lbl.setFixedHeight(scaled.height())
+            else:
+                lbl.set_preview(lbl.display_pixmap)
+                lbl.setFixedHeight(new_h)
+                if smooth:
+                    self._queue_scale(lbl, key, new_w, new_h, priority)
+        else:
+            lbl.setFixedHeight(new_h)
+        if not smooth:
+            return
+        # нужная ширина копии: корзина текущей ширины, но не больше оригинала
+        needed = min(width_bucket(new_w), lbl.original_width)
+        if needed > max(lbl.loaded_width, lbl.requested_width):
+            lbl.requested_width = needed
+            token = get_image_loader().request(lbl.img_path, needed)
+            self._pending_images[token] = (lbl, needed, lbl.img_path)
+
+    # Заказ сглаженного масштабирования копии изображения метки в пуле потоков
+    def _queue_scale(self, lbl, key, width, height, priority):
+        if lbl.scaling_key == key:
+            # такое масштабирование уже заказано
+            return
+        if lbl.display_image is None:
+            lbl.display_image = lbl.display_pixmap.toImage()
+        lbl.scaling_key = key
+        token = get_image_loader().scale(lbl.display_image, width, height, priority)
+        self._pending_scales[token] = (lbl, key)
+
+    # Получение сглаженной копии: она кэшируется по ширине и показывается, если метка всё ещё её ждёт
+    def _on_image_scaled(self, token, image):
+        lbl, key = self._pending_scales.pop(token, (None, None))
+        if lbl is None or image.isNull():
+            return
+        pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(key, pixmap)
+        if lbl in self._image_labels and lbl.scaling_key == key:
+            lbl.scaling_key = None
+            lbl.set_preview(None)
+            lbl.setPixmap(pixmap)
+            lbl.setFixedHeight(pixmap.height())
+
+    # Получение декодированного в фоне изображения и замена заглушки
+    def _on_image_loaded(self, token, image):
+        lbl, width, path = self._pending_images.pop(token, (None, 0, None))
+        if lbl is None or lbl not in self._image_labels or lbl.img_path != path:
+            # запрос другого редактора, блок уже удалён или метка отдана другому блоку
+            return
+        if image.isNull():
+            lbl.setText(f"⚠️ Не удалось загрузить изображение: {lbl.img_path}")
+            return
+        if width <= lbl.loaded_width:
+            # уже получена копия не меньшей ширины
+            return
+        lbl.display_image = image
+        lbl.display_pixmap = QPixmap.fromImage(image)
+        lbl.loaded_width = width
+        lbl.scaling_key = None
+        lbl.setText("")
+        self._resize_image(lbl)
+
     # Переключение режима удаления блоков: включение/выключение визуальных индикаторов
     def toggle_delete_mode(self):
         # если выходим из режима удаления
@@ -331,18 +665,7 @@ class NoteEditor(QWidget):
             return
         
         # проверяем, есть ли блоки для удаления
-        has_blocks = False
-        for i in range(self.container_layout.count() - 1):  # пропускаем последний stretch
-            item = self.container_layout.itemAt(i)
-            w = item.widget()
-            if w is not None:
-                if isinstance(w, AutoGrowTextEdit):
-                    has_blocks = True
-                    break
-                elif isinstance(w, QLabel) and hasattr(w, "img_path"):
-                    # учитываем только QLabel с изображениями, не сообщения об ошибках
-                    has_blocks = True
-                    break
+        has_blocks = self._has_blocks()
         
         if not has_blocks:
             QMessageBox.warning(self, "Ошибка", "Нет блоков для удаления")
@@ -356,31 +679,31 @@ class NoteEditor(QWidget):
         self._update_blocks_style()
         QMessageBox.information(self, "Режим удаления", "Нажмите на блок, который хотите удалить")
     
-    # Обновление визуального стиля всех блоков в зависимости от режима удаления
+    # Обновление визуального стиля всех блоков с виджетами в зависимости от режима удаления
     def _update_blocks_style(self):
-        for i in range(self.container_layout.count() - 1):  # пропускаем последний stretch
-            item = self.container_layout.itemAt(i)
-            w = item.widget()
-            if w is None:
-                continue
-            # обрабатываем только реальные блоки контента
-            if isinstance(w, AutoGrowTextEdit):
-                if self._delete_mode:
-                    w.setStyleSheet("border: 2px dashed #ff6b6b; padding: 4px;")
-                    w.setCursor(Qt.CursorShape.PointingHandCursor)
-                    w.set_delete_mode(True)
-                else:
-                    w.setStyleSheet("")
-                    w.setCursor(Qt.CursorShape.IBeamCursor)
-                    w.set_delete_mode(False)
-            elif isinstance(w, QLabel) and hasattr(w, "img_path"):
-                # обрабатываем только QLabel с изображениями, не сообщения об ошибках
-                if self._delete_mode:
-                    w.setStyleSheet("border: 2px dashed #ff6b6b; padding: 4px;")
-                    w.setCursor(Qt.CursorShape.PointingHandCursor)
-                else:
-                    w.setStyleSheet("")
-                    w.setCursor(Qt.CursorShape.ArrowCursor)
+        for b in self._live:
+            self._apply_block_style(b.widget)
+
+    # Стиль одного виджета блока (виджеты из пула получают его при привязке к блоку)
+    def _apply_block_style(self, w):
+        # обрабатываем только реальные блоки контента
+        if isinstance(w, AutoGrowTextEdit):
+            if self._delete_mode:
+                w.setStyleSheet("border: 2px dashed #ff6b6b; padding: 4px;")
+                w.setCursor(Qt.CursorShape.PointingHandCursor)
+                w.set_delete_mode(True)
+            else:
+                w.setStyleSheet("")
+                w.setCursor(Qt.CursorShape.IBeamCursor)
+                w.set_delete_mode(False)
+        elif isinstance(w, QLabel) and hasattr(w, "img_path"):
+            # обрабатываем только QLabel с изображениями, не сообщения об ошибках
+            if self._delete_mode:
+                w.setStyleSheet("border: 2px dashed #ff6b6b; padding: 4px;")
+                w.setCursor(Qt.CursorShape.PointingHandCursor)
+            else:
+                w.setStyleSheet("")
+                w.setCursor(Qt.CursorShape.ArrowCursor)
     
     # Обработка событий клика для удаления блоков в режиме удаления
     def eventFilter(self, obj, event):
@@ -429,36 +752,21 @@ class NoteEditor(QWidget):
         if not (isinstance(widget, AutoGrowTextEdit) or (isinstance(widget, QLabel) and hasattr(widget, "img_path"))):
             return
         
-        # проверяем, что виджет ещё существует в layout
-        if self.container_layout.indexOf(widget) == -1:
+        # проверяем, что виджет ещё привязан к блоку заметки
+        b = getattr(widget, "block", None)
+        if b is None or b.widget is not widget:
             return
         
         self._deleting_block = True
         try:
-            # если это изображение, удаляем из списка
-            if isinstance(widget, QLabel) and hasattr(widget, "img_path"):
-                if widget in self._image_labels:
-                    self._image_labels.remove(widget)
-            
-            # удаляем виджет из layout
-            self.container_layout.removeWidget(widget)
-            widget.deleteLater()
-            
-            # проверяем, остались ли ещё блоки
-            has_blocks = False
-            for i in range(self.container_layout.count() - 1):
-                item = self.container_layout.itemAt(i)
-                w = item.widget()
-                if w is not None:
-                    if isinstance(w, AutoGrowTextEdit):
-                        has_blocks = True
-                        break
-                    elif isinstance(w, QLabel) and hasattr(w, "img_path"):
-                        has_blocks = True
-                        break
+            # виджет возвращается в пул, блок убирается из заметки
+            self._release(b)
+            self.blocks.remove(b)
+            self._live.remove(b)
+            self._refresh_window()
             
             # выходим из режима удаления только если блоков не осталось
-            if not has_blocks:
+            if not self._has_blocks():
                 self._delete_mode = False
                 self.btn_delete_block.setText("Удалить блок")
                 self.btn_delete_block.setStyleSheet("")
@@ -466,4 +774,4 @@ class NoteEditor(QWidget):
             self._update_blocks_style()
             QMessageBox.information(self, "Удалено", "Блок удалён")
         finally:
-            self._deleting_block = False
\ No newline at end of file
+            self._deleting_block = False
@@ -1,17 +1,19 @@
 # notes_list.py
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem, QHBoxLayout, QMessageBox
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListView, QHBoxLayout, QMessageBox, QAbstractItemView
+from PyQt6.QtCore import Qt, QModelIndex
 from models import Note
+from ui import db_async
+from ui.list_model import PagedListModel, ID_ROLE
+from ui.search import SearchBox, HtmlItemDelegate, result_html
+from ui.shell import navigate
 
 class NotesList(QWidget):
-    def __init__(self, user, scheduler=None):
+    def __init__(self, user):
         super().__init__()
         self.user = user
-        self.scheduler = scheduler
         self.setWindowTitle('Заметки')
         self._build()
         self.load()
-        self.showMaximized()
 
     # Построение интерфейса списка заметок с кнопками управления
     def _build(self):
@@ -28,76 +30,115 @@ class NotesList(QWidget):
         v.addLayout(top_layout)
         
         self.btn_new = QPushButton('Создать новую заметку')
-        self.listw = QListWidget()
-        self.btn_delete = QPushButton('Удалить выбранную заметку')
+        self.search = SearchBox('Поиск по заметкам...')
+        self.search.search_requested.connect(lambda _: self.load())
+        self.model = PagedListModel(self._fetch_page, 'noteID', self._format_row)
+        self.listw = QListView()
+        self.listw.setModel(self.model)
+        self.listw.setUniformItemSizes(True)
+        self.listw.setItemDelegate(HtmlItemDelegate(self.listw))
+        # выделение нескольких строк (Shift/Ctrl) для удаления одной операцией
+        self.listw.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.btn_delete = QPushButton('Удалить выбранные заметки')
         self.btn_delete.setStyleSheet("QPushButton { background-color: #dc3545; color: white; padding: 8px; }")
         self.btn_delete.clicked.connect(self.delete_note)
         
         v.addWidget(self.btn_new)
+        v.addWidget(self.search)
         v.addWidget(self.listw)
         v.addWidget(self.btn_delete)
         self.setLayout(v)
 
         self.btn_new.clicked.connect(self.create_note)
-        self.listw.itemDoubleClicked.connect(self.open_note)
+        self.listw.doubleClicked.connect(self.open_note)
     
+    # Показ списка в главном окне; saved — заметка, сохранённая в редакторе:
+    # обновляется только её строка, без перезагрузки списка
+    def activate(self, saved=None):
+        if saved is None or saved.noteID is None:
+            return
+        if self.search.text().strip():
+            # порядок результатов поиска зависит от релевантности — перезапрашиваем
+            self.load()
+            return
+        self.model.upsert_row(
+            {'noteID': saved.noteID, 'title': saved.title, 'created': saved.created},
+            lambda it: (it['created'], it['noteID']), descending=True,
+        )
+
     # Возврат в главное меню
     def go_back(self):
-        from ui.main_menu import MainMenu
-        self.main_menu = MainMenu(self.user, self.scheduler)
-        self.main_menu.show()
-        self.close()
+        navigate(self, 'show_menu')
 
-    # Загрузка списка заметок из базы данных и отображение в виджете
+    # Страница списка заметок после строки last (keyset-пагинация по created, noteID)
+    def _fetch_page(self, limit, last):
+        after = (last['created'], last['noteID']) if last else None
+        return self.user.get_notes_list(limit, after)
+
+    # Текст строки списка заметок
+    def _format_row(self, it):
+        return f"{it['title'] or '(Без названия)'} — {it['created']}"
+
+    # Загрузка списка заметок в модель (строки подгружаются страницами при прокрутке);
+    # при непустой строке поиска — результаты полнотекстового поиска со сниппетами
     def load(self):
-        self.listw.clear()
-        items = self.user.get_notes_list()
-        for it in items:
-            lw = QListWidgetItem(f"{it['title'] or '(Без названия)'} — {it['created']}")
-            lw.setData(1000, it['noteID'])
-            self.listw.addItem(lw)
+        query = self.search.text().strip()
+        if query:
+            self.listw.setUniformItemSizes(False)
+            self.model.set_source(
+                lambda limit, last: [] if last else self.user.search_notes(query),
+                lambda it: it['title'] or '(Без названия)',
+                lambda it: result_html(it['title'] or '(Без названия)', it['snippet'], it['created']),
+            )
+        else:
+            self.listw.setUniformItemSizes(True)
+            self.model.set_source(self._fetch_page, self._format_row)
 
     # Создание новой заметки: открытие редактора
     def create_note(self):
-        from ui.note_editor import NoteEditor
-        self.editor = NoteEditor(self.user, scheduler=self.scheduler)
-        self.editor.show()
-        self.close()
+        navigate(self, 'open_note')
 
     # Открытие выбранной заметки для редактирования с проверкой прав доступа
-    def open_note(self, item: QListWidgetItem):
-        note_id = item.data(1000)
-        note = Note.load_by_id(note_id)
+    def open_note(self, index: QModelIndex):
+        db_async.run(Note.load_by_id, index.data(ID_ROLE), on_done=self._on_open_loaded)
+
+    # Запись для открытия загружена (в потоке интерфейса)
+    def _on_open_loaded(self, note):
         if not note or note.userID != self.user.userID:
             QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
             return
-        from ui.note_editor import NoteEditor
-        self.editor = NoteEditor(self.user, note, scheduler=self.scheduler)
-        self.editor.show()
-        self.close()
+        navigate(self, 'open_note', note)
 
-    # Удаление выбранной заметки с подтверждением и проверкой прав доступа
+    # Удаление выбранных заметок одной транзакцией с одним подтверждением;
+    # права доступа проверяет Note.delete_many (чужие записи не удаляются)
     def delete_note(self):
-        current_item = self.listw.currentItem()
-        if not current_item:
+        indexes = self.listw.selectionModel().selectedIndexes()
+        if not indexes:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите заметку для удаления')
             return
-        
-        note_id = current_item.data(1000)
-        note = Note.load_by_id(note_id)
-        if not note or note.userID != self.user.userID:
-            QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
-            return
-        
+        if len(indexes) == 1:
+            question = f'Вы уверены, что хотите удалить заметку "{indexes[0].data()}"?'
+        else:
+            question = f'Вы уверены, что хотите удалить выбранные заметки ({len(indexes)})?'
         reply = QMessageBox.question(
-            self, 
-            'Подтверждение удаления', 
-            f'Вы уверены, что хотите удалить заметку "{current_item.text()}"?',
+            self,
+            'Подтверждение удаления',
+            question,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No
         )
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            note.delete()
-            self.load()
-            QMessageBox.information(self, 'Успех', 'Заметка удалена')
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        ids = [index.data(ID_ROLE) for index in indexes]
+        db_async.run(
+            Note.delete_many, self.user.userID, ids, write=True,
+            on_done=lambda result: self._on_deleted(ids, result[1]),
+        )
+
+    # Записи удалены из БД: выбранные строки убираются из модели без перезагрузки списка, в том числе
+    # строки, которых в БД уже не было (удалены другим экземпляром или предыдущим нажатием).
+    # refused — чужие записи: только об отказе в их удалении выводится предупреждение
+    def _on_deleted(self, requested, refused):
+        self.model.remove_ids(set(requested).difference(refused))
+        if refused:
+            QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
@@ -2,16 +2,16 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QMessageBox, QCalendarWidget, QSpinBox, QLabel
 from datetime import datetime
 from models import Reminder
+from ui import db_async
+from ui.shell import navigate
 
 class ReminderEditor(QWidget):
-    def __init__(self, user, reminder: Reminder = None, scheduler=None):
+    def __init__(self, user, reminder: Reminder = None):
         super().__init__()
         self.user = user
         self.reminder = reminder
-        self.scheduler = scheduler
         self.setWindowTitle('Редактирование напоминания')
         self._build_ui()
-        self.showMaximized()
         if self.reminder:
             self._load_data()
         else:
@@ -100,23 +100,21 @@ class ReminderEditor(QWidget):
             r = self.reminder
             r.text = text
             r.startTime = iso
-        r.save()
+        # запись — в потоке БД; до её завершения повторное сохранение недоступно
+        self.btn_save.setEnabled(False)
+        db_async.run(r.save, write=True, on_done=lambda _: self._on_saved(r), on_error=self._on_save_failed)
+
+    # Напоминание сохранено: возврат к списку напоминаний, в котором обновится только его строка
+    def _on_saved(self, r):
         QMessageBox.information(self, 'OK', 'Сохранено')
+        self.reminder = r
+        navigate(self, 'show_reminders', saved=r)
 
-        try:
-            from ui.reminders_list import RemindersList
-            self.rl = RemindersList(self.user, self.scheduler)
-            self.rl.show()
-        except Exception:
-            pass
-        self.close()
+    # Ошибка записи напоминания в БД
+    def _on_save_failed(self, error):
+        self.btn_save.setEnabled(True)
+        QMessageBox.warning(self, 'Ошибка', f'Не удалось сохранить напоминание: {error}')
 
     # Возврат к списку напоминаний
     def _back(self):
-        try:
-            from ui.reminders_list import RemindersList
-            self.rl = RemindersList(self.user, self.scheduler)
-            self.rl.show()
-        except Exception:
-            pass
-        self.close()
\ No newline at end of file
+        navigate(self, 'show_reminders')
\ No newline at end of file
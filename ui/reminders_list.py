@@ -1,16 +1,18 @@
 # reminders_list.py
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListWidget, QListWidgetItem, QMessageBox, QHBoxLayout
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QListView, QMessageBox, QHBoxLayout, QAbstractItemView
+from PyQt6.QtCore import QModelIndex
 from models import Reminder
+from ui import db_async
+from ui.list_model import PagedListModel, ID_ROLE
+from ui.shell import navigate
 
 class RemindersList(QWidget):
-    def __init__(self, user, scheduler=None):
+    def __init__(self, user):
         super().__init__()
         self.user = user
-        self.scheduler = scheduler
         self.setWindowTitle('Напоминания')
         self._build()
         self.load()
-        self.showMaximized()
 
     # Построение интерфейса списка напоминаний с кнопками управления
     def _build(self):
@@ -27,8 +29,13 @@ class RemindersList(QWidget):
         v.addLayout(top_layout)
         
         self.btn_new = QPushButton('Создать новое напоминание')
-        self.listw = QListWidget()
-        self.btn_delete = QPushButton('Удалить выбранное напоминание')
+        self.model = PagedListModel(self._fetch_page, 'remindID', self._format_row)
+        self.listw = QListView()
+        self.listw.setModel(self.model)
+        self.listw.setUniformItemSizes(True)
+        # выделение нескольких строк (Shift/Ctrl) для удаления одной операцией
+        self.listw.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.btn_delete = QPushButton('Удалить выбранные напоминания')
         self.btn_delete.setStyleSheet("QPushButton { background-color: #dc3545; color: white; padding: 8px; }")
         self.btn_delete.clicked.connect(self.delete_reminder)
         
@@ -38,65 +45,80 @@ class RemindersList(QWidget):
         self.setLayout(v)
 
         self.btn_new.clicked.connect(self.create_reminder)
-        self.listw.itemDoubleClicked.connect(self.open_reminder)
+        self.listw.doubleClicked.connect(self.open_reminder)
     
+    # Показ списка в главном окне; saved — напоминание, сохранённое в редакторе:
+    # его строка вставляется или переносится на место по новому времени без перезагрузки списка
+    def activate(self, saved=None):
+        if saved is None or saved.remindID is None:
+            return
+        self.model.upsert_row(
+            {'remindID': saved.remindID, 'text': saved.text, 'startTime': saved.startTime},
+            lambda it: (it['startTime'], it['remindID']),
+        )
+
     # Возврат в главное меню
     def go_back(self):
-        from ui.main_menu import MainMenu
-        self.main_menu = MainMenu(self.user, self.scheduler)
-        self.main_menu.show()
-        self.close()
+        navigate(self, 'show_menu')
+
+    # Страница списка напоминаний после строки last (keyset-пагинация по startTime, remindID)
+    def _fetch_page(self, limit, last):
+        after = (last['startTime'], last['remindID']) if last else None
+        return self.user.get_reminders_list(limit, after)
 
-    # Загрузка списка напоминаний из базы данных и отображение в виджете
+    # Текст строки списка напоминаний
+    def _format_row(self, it):
+        return f"{it['text']} — {it['startTime']}"
+
+    # Загрузка списка напоминаний в модель (строки подгружаются страницами при прокрутке)
     def load(self):
-        self.listw.clear()
-        items = self.user.get_reminders_list()
-        for it in items:
-            lw = QListWidgetItem(f"{it['text']} — {it['startTime']}")
-            lw.setData(1000, it['remindID'])
-            self.listw.addItem(lw)
+        self.model.reload()
 
     # Создание нового напоминания: открытие редактора
     def create_reminder(self):
-        from ui.reminder_editor import ReminderEditor
-        self.editor = ReminderEditor(self.user, scheduler=self.scheduler)
-        self.editor.show()
-        self.close()
+        navigate(self, 'open_reminder')
 
     # Открытие выбранного напоминания для редактирования с проверкой прав доступа
-    def open_reminder(self, item: QListWidgetItem):
-        remind_id = item.data(1000)
-        rem = Reminder.load_by_id(remind_id)
+    def open_reminder(self, index: QModelIndex):
+        db_async.run(Reminder.load_by_id, index.data(ID_ROLE), on_done=self._on_open_loaded)
+
+    # Запись для открытия загружена (в потоке интерфейса)
+    def _on_open_loaded(self, rem):
         if not rem or rem.userID != self.user.userID:
             QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
             return
-        from ui.reminder_editor import ReminderEditor
-        self.editor = ReminderEditor(self.user, rem, scheduler=self.scheduler)
-        self.editor.show()
-        self.close()
+        navigate(self, 'open_reminder', rem)
 
-    # Удаление выбранного напоминания с подтверждением и проверкой прав доступа
+    # Удаление выбранных напоминаний одной транзакцией с одним подтверждением;
+    # права доступа проверяет Reminder.delete_many (чужие записи не удаляются)
     def delete_reminder(self):
-        current_item = self.listw.currentItem()
-        if not current_item:
+        indexes = self.listw.selectionModel().selectedIndexes()
+        if not indexes:
             QMessageBox.warning(self, 'Предупреждение', 'Выберите напоминание для удаления')
             return
-        
-        remind_id = current_item.data(1000)
-        rem = Reminder.load_by_id(remind_id)
-        if not rem or rem.userID != self.user.userID:
-            QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
-            return
-        
+        if len(indexes) == 1:
+            question = f'Вы уверены, что хотите удалить напоминание "{indexes[0].data()}"?'
+        else:
+            question = f'Вы уверены, что хотите удалить выбранные напоминания ({len(indexes)})?'
         reply = QMessageBox.question(
-            self, 
-            'Подтверждение удаления', 
-            f'Вы уверены, что хотите удалить напоминание "{current_item.text()}"?',
+            self,
+            'Подтверждение удаления',
+            question,
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No
         )
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            rem.delete()
-            self.load()
-            QMessageBox.information(self, 'Успех', 'Напоминание удалено')
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        ids = [index.data(ID_ROLE) for index in indexes]
+        db_async.run(
+            Reminder.delete_many, self.user.userID, ids, write=True,
+            on_done=lambda result: self._on_deleted(ids, result[1]),
+        )
+
+    # Записи удалены из БД: выбранные строки убираются из модели без перезагрузки списка, в том числе
+    # строки, которых в БД уже не было (удалены другим экземпляром или предыдущим нажатием).
+    # refused — чужие записи: только об отказе в их удалении выводится предупреждение
+    def _on_deleted(self, requested, refused):
+        self.model.remove_ids(set(requested).difference(refused))
+        if refused:
+            QMessageBox.warning(self, 'Ошибка', 'Доступ запрещён')
@@ -0,0 +1,77 @@
+# search.py
+import html
+from PyQt6.QtWidgets import QLineEdit, QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication
+from PyQt6.QtCore import QTimer, QPointF, QSize, pyqtSignal
+from PyQt6.QtGui import QTextDocument
+from models import SNIPPET_START, SNIPPET_END
+from ui.list_model import HTML_ROLE
+
+
+# Преобразование сниппета из models в HTML: текст экранируется, совпадения выделяются
+def snippet_to_html(snippet: str) -> str:
+    text = html.escape(snippet or '')
+    return (
+        text.replace(SNIPPET_START, '<b style="background-color: #fff59d;">')
+            .replace(SNIPPET_END, '</b>')
+            .replace('\n', ' ')
+    )
+
+
+# Делегат, рисующий строки модели с HTML_ROLE как форматированный текст (подсветка сниппетов);
+# строки без HTML рисуются стандартно
+class HtmlItemDelegate(QStyledItemDelegate):
+    # HTML-документ строки, свёрстанный под ширину элемента
+    def _document(self, html_text: str, width: int) -> QTextDocument:
+        doc = QTextDocument()
+        doc.setDocumentMargin(4)
+        doc.setHtml(html_text)
+        doc.setTextWidth(width)
+        return doc
+
+    def paint(self, painter, option, index):
+        html_text = index.data(HTML_ROLE)
+        if not html_text:
+            super().paint(painter, option, index)
+            return
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ''
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        # фон и выделение рисует стиль, текст — QTextDocument
+        style.drawControl(QStyle.ControlElement.CE_ItemViewItem, opt, painter, opt.widget)
+        doc = self._document(html_text, opt.rect.width())
+        painter.save()
+        painter.translate(QPointF(opt.rect.topLeft()))
+        doc.drawContents(painter)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        html_text = index.data(HTML_ROLE)
+        if not html_text:
+            return super().sizeHint(option, index)
+        width = option.rect.width() if option.rect.width() > 0 else 600
+        doc = self._document(html_text, width)
+        return QSize(int(doc.idealWidth()), int(doc.size().height()))
+
+
+# HTML строки результата поиска: заголовок, дата и сниппет с подсветкой совпадений
+def result_html(title: str, snippet: str, created: str) -> str:
+    return (
+        f"<b>{html.escape(title)}</b> — {html.escape(created or '')}<br>"
+        f"<span style='color: #555;'>{snippet_to_html(snippet)}</span>"
+    )
+
+
+class SearchBox(QLineEdit):
+    # Сигнал с текстом запроса: испускается после паузы в наборе, а не на каждую клавишу
+    search_requested = pyqtSignal(str)
+
+    def __init__(self, placeholder: str = 'Поиск...', delay_ms: int = 200):
+        super().__init__()
+        self.setPlaceholderText(placeholder)
+        self.setClearButtonEnabled(True)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(lambda: self.search_requested.emit(self.text().strip()))
+        self.textChanged.connect(self._timer.start)
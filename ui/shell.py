@@ -0,0 +1,161 @@
+# shell.py
+# Главное окно приложения — единственное окно верхнего уровня со стеком представлений (QStackedWidget).
+# Разделы (главное меню и списки) создаются при первом переходе и остаются в стеке: возврат к ним
+# не перестраивает интерфейс и не перечитывает БД, а показанный раздел получает activate(**changes)
+# с тем, что изменилось (например, сохранённая запись), и обновляет только это.
+# Окно входа и редакторы — временные: создаются на каждый переход и удаляются при уходе с них,
+# поэтому число живых виджетов не растёт с длительностью сеанса
+from PyQt6.QtGui import QKeySequence, QShortcut
+from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget
+
+
+class MainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.user = None
+        self.scheduler = None
+        self.stack = QStackedWidget()
+        self.setCentralWidget(self.stack)
+        # закэшированные разделы: ключ -> виджет
+        self._views = {}
+        # текущее временное представление (удаляется при переходе с него)
+        self._transient = None
+        # подключены ли сигналы очереди AI-запросов (подключаются при первом входе)
+        self._ai_queue_connected = False
+        # скрытое окно диагностики (профилирование SQL), создаётся при первом открытии
+        self._diagnostics = None
+        QShortcut(QKeySequence('Ctrl+Shift+D'), self, self.show_diagnostics)
+        self.show_login()
+        self.showMaximized()
+
+    # Показ представления widget; временное представление, с которого ушли, удаляется
+    def _show(self, widget, transient: bool = False, **changes):
+        if self.stack.indexOf(widget) < 0:
+            self.stack.addWidget(widget)
+        self.stack.setCurrentWidget(widget)
+        self.setWindowTitle(widget.windowTitle())
+        old, self._transient = self._transient, (widget if transient else None)
+        if old is not None and old is not widget:
+            self.stack.removeWidget(old)
+            old.deleteLater()
+        activate = getattr(widget, 'activate', None)
+        if activate is not None:
+            activate(**changes)
+
+    # Раздел по ключу: создаётся фабрикой при первом обращении
+    def _view(self, key: str, factory):
+        widget = self._views.get(key)
+        if widget is None:
+            widget = factory()
+            self._views[key] = widget
+        return widget
+
+    # Окно входа
+    def show_login(self):
+        from ui.login import LoginWindow
+        self._show(LoginWindow(), transient=True)
+
+    # Вход выполнен: запуск планировщика напоминаний, продолжение невыполненных AI-запросов
+    # пользователя и переход в главное меню
+    def sign_in(self, user):
+        from reminder_watcher import ReminderScheduler
+        self.user = user
+        # Планировщик живёт до выхода из аккаунта независимо от показанного раздела
+        self.scheduler = ReminderScheduler(user)
+        self.scheduler.setParent(QApplication.instance())
+        self.scheduler.reminders_delivered.connect(self._on_reminders_delivered)
+        self._connect_ai_queue()
+        import ai_queue
+        ai_queue.get_queue().resume(user.userID)
+        self.show_menu()
+
+    # Статусы заданий очереди AI-запросов попадают в уже созданный список запросов, даже если он скрыт
+    def _connect_ai_queue(self):
+        if self._ai_queue_connected:
+            return
+        import ai_queue
+        queue = ai_queue.get_queue()
+        queue.job_queued.connect(self._on_ai_job_queued)
+        queue.job_started.connect(lambda request_id: self._on_ai_job_status(request_id, 'running'))
+        queue.job_finished.connect(lambda request_id, status, _: self._on_ai_job_status(request_id, status))
+        self._ai_queue_connected = True
+
+    # Выход из аккаунта: остановка планировщика, удаление разделов пользователя и возврат к окну входа.
+    # Уже поставленные AI-запросы выполняются до конца, новые задания пользователя не подхватываются
+    def logout(self):
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler.deleteLater()
+            self.scheduler = None
+        if self._ai_queue_connected:
+            import ai_queue
+            ai_queue.get_queue().resume(None)
+        self.show_login()
+        for widget in self._views.values():
+            self.stack.removeWidget(widget)
+            widget.deleteLater()
+        self._views.clear()
+        self.user = None
+
+    def show_menu(self):
+        from ui.main_menu import MainMenu
+        self._show(self._view('menu', lambda: MainMenu(self.user)))
+
+    # Список заметок; changes передаются в NotesList.activate (например, saved=Note)
+    def show_notes(self, **changes):
+        from ui.notes_list import NotesList
+        self._show(self._view('notes', lambda: NotesList(self.user)), **changes)
+
+    def show_reminders(self, **changes):
+        from ui.reminders_list import RemindersList
+        self._show(self._view('reminders', lambda: RemindersList(self.user)), **changes)
+
+    def show_ai(self, **changes):
+        from ui.ai_list import AIList
+        self._show(self._view('ai', lambda: AIList(self.user)), **changes)
+
+    # Редактор заметки (note=None — новая заметка)
+    def open_note(self, note=None):
+        from ui.note_editor import NoteEditor
+        self._show(NoteEditor(self.user, note), transient=True)
+
+    def open_reminder(self, reminder=None):
+        from ui.reminder_editor import ReminderEditor
+        self._show(ReminderEditor(self.user, reminder), transient=True)
+
+    def open_ai_request(self, request=None):
+        from ui.ai_request import AIRequestWindow
+        self._show(AIRequestWindow(self.user, request), transient=True)
+
+    # Окно диагностики поверх главного окна; не входит в стек разделов и не прерывает работу
+    def show_diagnostics(self):
+        if self._diagnostics is None:
+            from ui.diagnostics import DiagnosticsDialog
+            self._diagnostics = DiagnosticsDialog(self)
+        self._diagnostics.show()
+        self._diagnostics.raise_()
+        self._diagnostics.activateWindow()
+
+    # Доставленные планировщиком напоминания удаляются из уже созданного списка, даже если он скрыт
+    def _on_reminders_delivered(self, remind_ids):
+        view = self._views.get('reminders')
+        if view is not None:
+            view.model.remove_ids(remind_ids)
+
+    def _on_ai_job_queued(self, request):
+        view = self._views.get('ai')
+        if view is not None and self.user is not None and request.userID == self.user.userID:
+            view.activate(saved=request)
+
+    def _on_ai_job_status(self, request_id: int, status: str):
+        view = self._views.get('ai')
+        if view is not None:
+            view.model.update_row(request_id, {'status': status})
+
+
+# Переход из представления widget: вызов метода главного окна, в котором оно показано.
+# Вне главного окна (представление создано отдельно) переход не выполняется
+def navigate(widget, method: str, *args, **kwargs):
+    shell = widget.window()
+    if isinstance(shell, MainWindow):
+        getattr(shell, method)(*args, **kwargs)